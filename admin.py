@@ -1,21 +1,17 @@
-import sqlite3
+import storage
+from passwords import hash_password
 
-conn = sqlite3.connect("college_data.db")
-cur = conn.cursor()
-
-cur.execute("""
-INSERT INTO users (name, mobile, password, role, course, year)
-VALUES (?, ?, ?, ?, ?, ?)
-""", (
-    "Admin SVU",
-    "9999999999",
-    "admin123",
-    "admin",
-    "ALL",
-    "2"
-))
-
-conn.commit()
-conn.close()
+with storage.connect() as conn:
+    conn.execute("""
+    INSERT INTO users (name, mobile, password, role, course, year)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        "Admin SVU",
+        "9999999999",
+        hash_password("admin123"),
+        "admin",
+        "ALL",
+        "2"
+    ))
 
 print("Admin user created")
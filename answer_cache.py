@@ -0,0 +1,131 @@
+"""
+In-process cache of ask_ai() answers with the knowledge each one was built from.
+
+Every answer records its Dependencies: the (table, id) of each document /
+notice in its prompt (full text or preview), or that the prompt held the
+whole partition (no keyword matched, or a context-cache handle), plus the
+keyword alternatives retrieval searched for. Reverse indexes map each source
+and each partition to the answers that used them, so
+db_utils.sync_knowledge_changes() drops exactly these answers:
+
+- answers whose prompt contained a changed or deleted entry;
+- in the partitions that can see a changed entry, answers built from the
+  whole partition, and answers whose keywords the new title / body
+  keywords match (the entry would now be retrieved for them).
+
+Answers unrelated to a change stay cached. SVU_ANSWER_CACHE_TTL (default
+300 s) still bounds every answer, e.g. for notices that become active or
+expire without a write.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+TTL_SECONDS = float(os.getenv("SVU_ANSWER_CACHE_TTL", "300"))
+MAX_ENTRIES = int(os.getenv("SVU_ANSWER_CACHE_SIZE", "2048"))
+
+
+class Dependencies(NamedTuple):
+    sources: frozenset  # {(table, id), ...} in the prompt; empty when whole_partition
+    words: tuple  # keyword alternatives used for retrieval
+    whole_partition: bool
+
+
+class _Entry(NamedTuple):
+    answer: str
+    partition: tuple
+    deps: Dependencies
+    expires_at: float
+
+
+# (question, recent_context, partition) -> _Entry; most recently used at the end.
+_answers: "OrderedDict[tuple, _Entry]" = OrderedDict()
+_by_source = {}  # (table, id) -> {key, ...}
+_by_partition = {}  # (course, year) -> {key, ...}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidated": 0, "cleared": 0}
+
+
+def _drop(key):
+    entry = _answers.pop(key)
+    for source in entry.deps.sources:
+        keys = _by_source.get(source)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _by_source[source]
+    keys = _by_partition[entry.partition]
+    keys.discard(key)
+    if not keys:
+        del _by_partition[entry.partition]
+
+
+def get(key):
+    """The cached answer for (question, recent_context, partition), or None."""
+    with _lock:
+        entry = _answers.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            _drop(key)
+            entry = None
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _answers.move_to_end(key)
+        _stats["hits"] += 1
+        return entry.answer
+
+
+def put(key, answer, deps):
+    with _lock:
+        if key in _answers:
+            _drop(key)
+        partition = key[2]
+        _answers[key] = _Entry(answer, partition, deps, time.time() + TTL_SECONDS)
+        for source in deps.sources:
+            _by_source.setdefault(source, set()).add(key)
+        _by_partition.setdefault(partition, set()).add(key)
+        while len(_answers) > MAX_ENTRIES:
+            _drop(next(iter(_answers)))
+
+
+def partitions():
+    """Partitions that currently have cached answers."""
+    with _lock:
+        return set(_by_partition)
+
+
+def invalidate(source, partitions, text=None):
+    """
+    Drop the answers that used source (table, id), and in the given partitions
+    those built from the whole partition or whose keywords occur in text (the
+    entry's new title + body keywords, lowercased; None when it was deleted).
+    Returns how many answers were dropped.
+    """
+    with _lock:
+        doomed = set(_by_source.get(source, ()))
+        for partition in partitions:
+            for key in _by_partition.get(partition, ()):
+                deps = _answers[key].deps
+                if deps.whole_partition or (text and any(word in text for word in deps.words)):
+                    doomed.add(key)
+        for key in doomed:
+            _drop(key)
+        _stats["invalidated"] += len(doomed)
+        return len(doomed)
+
+
+def clear():
+    """Drop every cached answer (synonym changes, missed change log entries)."""
+    with _lock:
+        _stats["cleared"] += len(_answers)
+        _answers.clear()
+        _by_source.clear()
+        _by_partition.clear()
+
+
+def cache_stats():
+    """Hit / miss counts, answers dropped by targeted invalidation vs. full clears, current size."""
+    with _lock:
+        return dict(_stats, size=len(_answers), sources=len(_by_source))
@@ -1,26 +1,46 @@
+import csv
+import io
+import logging
+import tempfile
+import time
+from datetime import datetime, timezone
+
 import streamlit as st
-import sqlite3
 
 from auth import login, register_user
 from assistant import ask_ai
+from chat_archive import archived_chat_log, archived_count
 from db_utils import (
     save_chat,
     load_chat_history,
+    load_chat_log,
     get_all_users,
     get_all_documents,
     get_all_notifications,
-    get_user_by_id,
     update_user,
     update_password,
     delete_user,
     add_document,
-    update_document,
+    add_notification,
+    archive_expired_notifications,
     delete_document,
     delete_notification,
+    replace_documents,
+    apply_knowledge_changes,
+    get_descriptions,
+    get_synonyms,
+    replace_synonyms,
 )
-from database import setup_database
-
-from streamlit_cookies_manager import EncryptedCookieManager
+from database import PREVIEW_CHARS, setup_database
+from exports import EXPORTS, UI_MAX_ROWS, count_rows, export_filename, write_export
+from maintenance import TASKS as MAINTENANCE_TASKS
+from maintenance import maintenance_status, run_now
+from maintenance import start as start_maintenance
+from model_router import route_report
+from passwords import LoginBusy
+from profiler import list_profiles, profile_section, sample_rate, set_sample_rate, top_functions
+from session_store import create_session, resolve_session, revoke_session
+from web_cache import web_call_report
 
 
 # ================= INITIAL SETUP =================
@@ -33,14 +53,40 @@ def ensure_database():
 ensure_database()
 
 
+@st.cache_data(ttl=6 * 60 * 60)
+def archive_expired_notices():
+    """Move expired notices out of the live table, at most every 6 hours per process."""
+    archive_expired_notifications()
+    return True
+
+
+archive_expired_notices()
+# Background VACUUM / ANALYZE / orphan cleanup in the low-traffic window (maintenance.py).
+start_maintenance()
+
+
+logger = logging.getLogger(__name__)
+_run_started = time.perf_counter()
+# Shown when passwords.LoginBusy says the hashing pool is full.
+BUSY_MESSAGE = "Many students are signing in right now. Please try again in a moment."
+
+
 # ================= COOKIES =================
-cookies = EncryptedCookieManager(
-    prefix="svu_mca_",
-    password="svu-mca-super-secret-key"
-)
+def _get_cookies():
+    """
+    Create the cookie manager. Only needed while nobody is logged in on this
+    Streamlit session (restore / login); the first call round-trips to the browser.
+    """
+    # Imported here so logged-in reruns and cold starts don't pay for it.
+    from streamlit_cookies_manager import EncryptedCookieManager
 
-if not cookies.ready():
-    st.stop()
+    cookies = EncryptedCookieManager(
+        prefix="svu_mca_",
+        password="svu-mca-super-secret-key"
+    )
+    if not cookies.ready():
+        st.stop()
+    return cookies
 
 
 # ================= PAGE CONFIG =================
@@ -188,13 +234,23 @@ section[data-testid="stSidebar"] div.stButton > button:hover {
 
 # ================= LOGOUT FUNCTION =================
 def logout_user():
-    cookies.clear()
-    cookies.save()
+    # Revoking server-side is enough: a stale cookie no longer restores anything.
+    if st.session_state.get("session_token"):
+        revoke_session(st.session_state.session_token)
     st.session_state.clear()
-    st.query_params["logout"] = "1"  # Signal logout (cookies often fail to delete)
     st.rerun()
 
 
+def _start_session(profile, token):
+    """Copy the user profile into session_state for the rest of this browser session."""
+    st.session_state.session_token = token
+    st.session_state.user_id = profile["id"]
+    st.session_state.name = profile["name"]
+    st.session_state.role = profile["role"]
+    st.session_state.course = profile["course"] or ""
+    st.session_state.year = profile["year"] or ""
+
+
 # ================= STUDENT HOME SECTION =================
 def _render_student_home():
     """Render the student home page with assistant info and how-to, styled like login UI."""
@@ -239,26 +295,25 @@ def _render_student_home():
 # ================= PROFILE SECTION =================
 def _render_profile_section():
     """Render profile form for the logged-in user to update their information."""
-    user = get_user_by_id(st.session_state.user_id)
+    user = resolve_session(st.session_state.session_token)
     if not user:
         st.error("User not found.")
         return
 
-    # user: (id, name, username, mobile, password, role, course, year)
     st.markdown("Update your account information below.")
     st.markdown("---")
 
     with st.form("profile_form", clear_on_submit=False):
-        name = st.text_input("Full Name", value=user[1], key="profile_name")
-        username = st.text_input("Username", value=user[2], placeholder="Used for login", key="profile_username")
-        mobile = st.text_input("Mobile", value=user[3], placeholder="10-digit mobile number", key="profile_mobile")
+        name = st.text_input("Full Name", value=user["name"], key="profile_name")
+        username = st.text_input("Username", value=user["username"], placeholder="Used for login", key="profile_username")
+        mobile = st.text_input("Mobile", value=user["mobile"], placeholder="10-digit mobile number", key="profile_mobile")
 
         if st.session_state.role == "student":
-            course = st.text_input("Course", value=user[6] or "MCA", key="profile_course")
-            year = st.selectbox("Year", ["1st", "2nd"], index=["1st", "2nd"].index(user[7]) if user[7] in ("1st", "2nd") else 0, key="profile_year")
+            course = st.text_input("Course", value=user["course"] or "MCA", key="profile_course")
+            year = st.selectbox("Year", ["1st", "2nd"], index=["1st", "2nd"].index(user["year"]) if user["year"] in ("1st", "2nd") else 0, key="profile_year")
         else:
-            course = user[6] or "ALL"
-            year = user[7] or "N/A"
+            course = user["course"] or "ALL"
+            year = user["year"] or "N/A"
 
         st.markdown("**Change Password** (leave blank to keep current)")
         new_password = st.text_input("New Password", type="password", placeholder="At least 6 characters", key="profile_new_pass")
@@ -277,42 +332,301 @@ def _render_profile_section():
             st.error("Passwords do not match.")
         else:
             if update_user(st.session_state.user_id, name.strip(), username.strip(), mobile.strip(), course, year):
-                if new_password:
-                    update_password(st.session_state.user_id, new_password)
-
-                cookies["user_id"] = str(st.session_state.user_id)
-                cookies["name"] = name.strip()
-                cookies["role"] = st.session_state.role
-                cookies["course"] = course
-                cookies["year"] = year
-                cookies.save()
-
                 st.session_state.name = name.strip()
                 st.session_state.course = course
                 st.session_state.year = year
 
+                if new_password:
+                    try:
+                        update_password(
+                            st.session_state.user_id, new_password,
+                            keep_session=st.session_state.get("session_token"),
+                        )
+                    except LoginBusy:
+                        st.warning("Profile saved, but the password was not changed. " + BUSY_MESSAGE)
+                        st.stop()
+
                 st.success("Profile updated successfully.")
                 st.rerun()
             else:
                 st.error("Username or mobile is already taken by another user.")
 
 
+# ================= BULK DOCUMENTS / NOTICES =================
+# Document / notice lists show this many previews per page.
+LIST_PAGE_SIZE = 20
+
+
+def _end_of_day_utc(day):
+    """
+    expires_at for a notice that should show until the end of day in the
+    server's local time: UTC 'YYYY-MM-DD HH:MM:SS', as ACTIVE_NOTICE_SQL
+    compares it with CURRENT_TIMESTAMP.
+    """
+    end = datetime.combine(day, datetime.max.time()).replace(microsecond=0)
+    return end.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _paged(rows, key):
+    """The slice of rows on the page picked with a pager (shown only when there is more than one page)."""
+    pages = max(1, -(-len(rows) // LIST_PAGE_SIZE))
+    if pages == 1:
+        return rows
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (int(page) - 1) * LIST_PAGE_SIZE
+    return rows[start:start + LIST_PAGE_SIZE]
+
+
+def _render_full_text(table, row, key):
+    """Preview of a document / notice; the full description is loaded only when toggled on."""
+    st.write(row.preview)
+    if (row.body_length or 0) > PREVIEW_CHARS and st.toggle(
+        f"Show full text ({row.body_length:,} characters)", key=key
+    ):
+        st.write(get_descriptions(table, [row.id]).get(row.id, ""))
+
+
+def _render_bulk_knowledge_tools():
+    """Bulk edit, multi-select delete and CSV replace; each applies as one transaction."""
+    import pandas as pd  # admin pages only; kept off every cold start
+    docs = get_all_documents()
+    notices = get_all_notifications()
+    tab_edit, tab_delete, tab_csv, tab_synonyms = st.tabs(
+        ["✏️ Bulk edit", "🗑️ Delete selected", "📥 Replace from CSV", "🔤 Synonyms"]
+    )
+
+    with tab_edit:
+        which = st.radio("Edit", ["Documents", "Notices"], horizontal=True, key="bulk_edit_kind")
+        # Full descriptions are loaded for the rows on the current page only.
+        if which == "Documents":
+            page = _paged(docs, "bulk_edit_page_Documents")
+            bodies = get_descriptions("documents", [d.id for d in page])
+            original = pd.DataFrame(
+                [(d.id, d.title, bodies.get(d.id, ""), d.course, d.year) for d in page],
+                columns=["id", "title", "description", "course", "year"],
+            )
+        else:
+            page = _paged(notices, "bulk_edit_page_Notices")
+            bodies = get_descriptions("notifications", [n.id for n in page])
+            original = pd.DataFrame(
+                [(n.id, n.title, bodies.get(n.id, ""), n.course, n.year, n.expires_at, n.priority) for n in page],
+                columns=["id", "title", "description", "course", "year", "expires_at", "priority"],
+            )
+        page_key = page[0].id if page else 0
+        edited = st.data_editor(
+            original, disabled=["id"], hide_index=True, use_container_width=True,
+            key=f"bulk_editor_{which}_{page_key}",
+        )
+        changed = [
+            row for row, before in zip(edited.to_dict("records"), original.to_dict("records")) if row != before
+        ]
+        if st.button(f"Save {len(changed)} change(s)", disabled=not changed, key="bulk_edit_save"):
+            changes = []
+            for row in changed:
+                args = (row["id"], row["title"], row["description"], row["course"], row["year"])
+                if which == "Documents":
+                    changes.append(("update_document", args, {}))
+                else:
+                    changes.append((
+                        "update_notification", args,
+                        {"expires_at": row["expires_at"] or None, "priority": int(row["priority"] or 0)},
+                    ))
+            apply_knowledge_changes(changes)
+            st.success(f"Saved {len(changed)} change(s).")
+            st.rerun()
+
+    with tab_delete:
+        options = {f"📄 {d.title} (#{d.id})": ("doc", d.id) for d in docs}
+        options.update({f"📢 {n.title} (#{n.id})": ("notice", n.id) for n in notices})
+        selected = st.multiselect("Documents and notices to delete", list(options), key="bulk_delete_sel")
+        if st.button(f"Delete {len(selected)} item(s)", disabled=not selected, key="bulk_delete_btn"):
+            apply_knowledge_changes([
+                ("delete_document" if kind == "doc" else "delete_notification", (item_id,), {})
+                for kind, item_id in (options[label] for label in selected)
+            ])
+            st.success(f"Deleted {len(selected)} item(s).")
+            st.rerun()
+
+    with tab_csv:
+        st.caption("CSV columns: title, description, course (optional), year (optional). Replaces ALL documents.")
+        upload = st.file_uploader("Documents CSV", type="csv", key="bulk_csv")
+        if upload is not None:
+            reader = csv.DictReader(io.StringIO(upload.getvalue().decode("utf-8-sig")))
+            rows = [
+                (r["title"].strip(), r["description"].strip(), r.get("course") or "ALL", r.get("year") or "ALL")
+                for r in reader
+                if (r.get("title") or "").strip() and (r.get("description") or "").strip()
+            ]
+            st.write(f"{len(rows)} valid row(s) found.")
+            if st.button("Replace all documents", type="primary", disabled=not rows, key="bulk_csv_btn"):
+                replace_documents(rows)
+                st.success(f"Replaced documents with {len(rows)} row(s).")
+                st.rerun()
+
+    with tab_synonyms:
+        st.caption(
+            "When a question contains the term, entries containing any expansion also match. "
+            "One word per term; separate expansions with spaces or commas."
+        )
+        original = pd.DataFrame(
+            [(term, " ".join(expansions)) for term, expansions in get_synonyms()], columns=["term", "expansions"]
+        )
+        edited = st.data_editor(
+            original, num_rows="dynamic", hide_index=True, use_container_width=True, key="synonym_editor"
+        )
+        if st.button("Save synonyms", key="synonyms_save"):
+            replace_synonyms(list(edited.fillna("").itertuples(index=False, name=None)))
+            st.success("Synonyms saved.")
+            st.rerun()
+
+
+# ================= EXPORT SECTION =================
+def _render_export_section():
+    """Admin export of chat history, users and documents as CSV / JSON Lines."""
+    st.subheader("⬇️ Export data")
+    table = st.selectbox("Table", list(EXPORTS), key="export_table")
+    fmt = st.radio("Format", ["csv", "jsonl"], horizontal=True, key="export_fmt")
+    compress = st.checkbox("Gzip compress", value=True, key="export_gzip")
+
+    filters = {}
+    if table == "chat_history":
+        users = {"All users": None}
+        users.update({f"{u.name} ({u.username})": u.id for u in get_all_users()})
+        filters["user_id"] = users[st.selectbox("User", list(users), key="export_user")]
+        c1, c2 = st.columns(2)
+        filters["start_date"] = c1.date_input("From", value=None, key="export_from")
+        filters["end_date"] = c2.date_input("To", value=None, key="export_to")
+
+    rows = count_rows(table, **filters)
+    if rows > UI_MAX_ROWS:
+        # Streamlit reads the whole file into memory to serve a download.
+        command = f"python exports.py {table} {fmt}" + (" --gzip" if compress else "")
+        if filters.get("user_id") is not None:
+            command += f" --user-id {filters['user_id']}"
+        if filters.get("start_date"):
+            command += f" --from {filters['start_date']}"
+        if filters.get("end_date"):
+            command += f" --to {filters['end_date']}"
+        st.warning(f"About {rows:,} rows: too large to download here (limit {UI_MAX_ROWS:,}). "
+                   "Run this on the server instead:")
+        st.code(command + f" > {export_filename(table, fmt, compress)}", language="bash")
+        return
+
+    def build_export():
+        # Runs only when the button is clicked; rows stream from the cursor
+        # into a temp file, which Streamlit then reads to serve (at most UI_MAX_ROWS rows).
+        out = tempfile.TemporaryFile()
+        write_export(out, table, fmt, compress, **filters)
+        out.seek(0)
+        return out
+
+    st.download_button(
+        "Download",
+        data=build_export,
+        file_name=export_filename(table, fmt, compress),
+        mime="application/gzip" if compress else ("text/csv" if fmt == "csv" else "application/jsonl"),
+        type="primary",
+    )
+
+
+# ================= PROFILER SECTION =================
+def _render_profiler_section():
+    """Sampling-rate toggle, slowest captured runs and their top functions."""
+    import pandas as pd  # admin pages only; kept off every cold start
+    st.subheader("⏱️ Profiler")
+    st.slider(
+        "Profile this share of page runs (this server process)",
+        0.0, 1.0, sample_rate(), 0.05, key="profile_rate",
+        on_change=lambda: set_sample_rate(st.session_state.profile_rate),
+    )
+    st.caption(f"Currently sampling {sample_rate():.0%} of admin and student page runs.")
+
+    runs = list_profiles()
+    if not runs:
+        st.info("No profiles captured yet.")
+        return
+    st.markdown("**Slowest runs**")
+    st.dataframe(
+        pd.DataFrame(runs, columns=["captured_at", "section", "ms", "file"]),
+        hide_index=True, use_container_width=True,
+    )
+    labels = {r["file"]: f"{r['section']} — {r['ms']} ms ({r['captured_at']})" for r in runs}
+    chosen = st.selectbox("Show top functions for", list(labels), format_func=labels.get, key="profile_file")
+    st.dataframe(
+        pd.DataFrame(top_functions(chosen), columns=["function", "calls", "total s", "cumulative s"]),
+        hide_index=True, use_container_width=True,
+    )
+
+
+# ================= MAINTENANCE SECTION =================
+def _render_maintenance_section():
+    """Last run of each maintenance task, with a button to run one now."""
+    import pandas as pd  # admin pages only; kept off every cold start
+    st.subheader("🧹 Database maintenance")
+    status = maintenance_status()
+    if "maint_requested" in st.session_state:
+        st.info(
+            f"{st.session_state.pop('maint_requested')} requested. "
+            + ("The scheduler runs it now; " if status["scheduler"]
+               else "The maintenance process runs it within a minute; ")
+            + "refresh to see the result below."
+        )
+    st.caption(
+        f"Tasks run in the {status['window']} window (server local time). "
+        + ("The scheduler is running in this server process." if status["scheduler"]
+           else "The scheduler is not running here (SVU_MAINTENANCE=off or a separate process).")
+    )
+    st.dataframe(
+        pd.DataFrame(
+            [
+                (task, state, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(finished)) if finished else "-",
+                 round(ms or 0, 1), detail or "", runner or "")
+                for task, state, finished, ms, detail, runner in status["tasks"]
+            ],
+            columns=["task", "status", "last run", "ms", "result", "runner"],
+        ),
+        hide_index=True, use_container_width=True,
+    )
+    warm = status["warm"]
+    if warm["at"]:
+        st.caption(
+            f"Caches warmed {time.strftime('%H:%M:%S', time.localtime(warm['at']))} "
+            f"in {warm['ms']:.0f} ms ({warm['detail']})."
+        )
+    cols = st.columns(len(MAINTENANCE_TASKS) + 1)
+    for col, task in zip(cols, MAINTENANCE_TASKS):
+        # Handed to the scheduler thread; a run can take up to its budget (60 s).
+        if col.button(f"Run {task.name}", key=f"maint_run_{task.name}"):
+            run_now(task.name)
+            st.session_state.maint_requested = task.name
+            st.rerun()
+    if cols[-1].button("↻ Refresh", key="maint_refresh"):
+        st.rerun()
+
+
 # ================= RESTORE LOGIN FROM COOKIE =================
-# Skip restore if user just logged out (cookie deletion is unreliable in streamlit-cookies-manager)
-just_logged_out = "logout" in st.query_params
-if just_logged_out:
-    del st.query_params["logout"]
-
-if (
-    "role" not in st.session_state
-    and not just_logged_out
-    and cookies.get("user_id")
-):
-    st.session_state.user_id = int(cookies["user_id"])
-    st.session_state.name = cookies["name"]
-    st.session_state.role = cookies["role"]
-    st.session_state.course = cookies.get("course", "")
-    st.session_state.year = cookies.get("year", "")
+# The cookie only holds an opaque session token; once session_state is filled,
+# later reruns skip the cookie manager and only re-check the token, which is
+# an in-memory LRU hit (session_store.REVALIDATE_SECONDS).
+if "role" in st.session_state:
+    if resolve_session(st.session_state.get("session_token")) is None:
+        # Revoked (logout elsewhere, password change, user deleted) or expired.
+        st.session_state.clear()
+if "role" not in st.session_state:
+    cookies = _get_cookies()
+    token = cookies.get("session_token")
+    if token:
+        profile = resolve_session(token)
+        if profile:
+            _start_session(profile, token)
+            logger.info(
+                "Session restored; first paint path took %.1f ms",
+                (time.perf_counter() - _run_started) * 1000,
+            )
+        else:
+            # Expired or revoked (e.g. logged out elsewhere)
+            del cookies["session_token"]
+            cookies.save()
 
 
 # ================= AUTH SCREENS =================
@@ -357,20 +671,17 @@ if "role" not in st.session_state:
             )
             st.markdown("")
             if st.button("Sign in", type="primary", use_container_width=True, key="btn_login"):
-                user = login(login_id, password)
+                try:
+                    user = login(login_id, password)
+                except LoginBusy:
+                    st.warning(BUSY_MESSAGE)
+                    st.stop()
                 if user:
-                    cookies["user_id"] = str(user[0])
-                    cookies["name"] = user[1]
-                    cookies["role"] = user[2]
-                    cookies["course"] = user[3]
-                    cookies["year"] = user[4]
+                    token = create_session(user[0])
+                    cookies["session_token"] = token
                     cookies.save()
 
-                    st.session_state.user_id = user[0]
-                    st.session_state.name = user[1]
-                    st.session_state.role = user[2]
-                    st.session_state.course = user[3]
-                    st.session_state.year = user[4]
+                    _start_session(resolve_session(token), token)
 
                     st.toast(f"Welcome {user[1]} 🎓")
                     st.rerun()
@@ -414,8 +725,12 @@ if "role" not in st.session_state:
                 elif len(mobile.strip()) < 10:
                     st.error("Please enter a valid 10-digit mobile number.")
                 else:
-                    if register_user(name, username, mobile, password, course_val, year_val):
-                        get_all_users.clear()
+                    try:
+                        registered = register_user(name, username, mobile, password, course_val, year_val)
+                    except LoginBusy:
+                        st.warning(BUSY_MESSAGE)
+                        st.stop()
+                    if registered:
                         st.success("Registered successfully. Please log in.")
                     else:
                         st.error("Username or mobile is already registered.")
@@ -444,6 +759,9 @@ else:
             ("Profile", "👤 Profile"),
             ("Users", "👥 Users"),
             ("Documents & Notices", "📄 Documents & Notices"),
+            ("Export", "⬇️ Export"),
+            ("Profiler", "⏱️ Profiler"),
+            ("Maintenance", "🧹 Maintenance"),
             ("Logout", "⏏ Logout"),
         ]
 
@@ -461,102 +779,167 @@ else:
 
         menu = st.session_state.admin_menu
 
-        if menu == "Home":
-            st.subheader("👋 Welcome Admin")
-            st.write("Use the side menu to manage users, documents, and chat history.")
-
-        elif menu == "Profile":
-            _render_profile_section()
-
-        elif menu == "Users":
-            st.subheader("📋 User Management")
-
-            # Show user chat history when History button is clicked
-            if "view_history_user_id" in st.session_state and st.session_state.view_history_user_id:
-                uid = st.session_state.view_history_user_id
-                uname = st.session_state.get("view_history_user_name", "User")
-                if st.button("← Back to users"):
-                    del st.session_state["view_history_user_id"]
-                    if "view_history_user_name" in st.session_state:
-                        del st.session_state["view_history_user_name"]
-                    st.rerun()
-                st.markdown(f"### 💬 Chat history: {uname}")
-                st.markdown("---")
-                conn = sqlite3.connect("college_data.db")
-                cur = conn.cursor()
-                cur.execute(
-                    "SELECT role, message, timestamp FROM chat_history WHERE user_id=? ORDER BY id ASC",
-                    (uid,),
-                )
-                rows = cur.fetchall()
-                conn.close()
-                if not rows:
-                    st.info("No chat history for this user.")
+        with profile_section(f"admin/{menu}"):
+            if menu == "Home":
+                st.subheader("👋 Welcome Admin")
+                st.write("Use the side menu to manage users, documents, and chat history.")
+
+                st.markdown("#### 🌐 Web search usage (last 14 days)")
+                usage = web_call_report(14)
+                if usage:
+                    st.table(
+                        [{"Day": day, "Web calls": calls, "Served from cache": hits} for day, calls, hits in usage]
+                    )
                 else:
-                    for role, message, ts in rows:
-                        label = "User" if role == "user" else "Assistant"
-                        st.markdown(f"**{label}** — {ts or ''}")
-                        st.write(message)
-                        st.markdown("---")
-            else:
-                st.markdown("**Name | Username | Mobile | Role | Course | Year | Actions**")
-                st.markdown("---")
-                for u in get_all_users():
-                    cols = st.columns([3, 2, 2, 2, 2, 2, 1, 1])
-                    cols[0].write(u[1])
-                    cols[1].write(u[2])
-                    cols[2].write(u[3])
-                    cols[3].write(u[5])
-                    cols[4].write(u[6])
-                    cols[5].write(u[7])
-                    if cols[6].button("📜 History", key=f"hist_{u[0]}"):
-                        st.session_state.view_history_user_id = u[0]
-                        st.session_state.view_history_user_name = u[1]
-                        st.rerun()
-                    if cols[7].button("❌ Delete", key=f"del_{u[0]}"):
-                        delete_user(u[0])
+                    st.caption("No web-search fallbacks yet.")
+
+                st.markdown("#### 🧭 Answer routes (last 14 days)")
+                routes = route_report(14)
+                if routes:
+                    st.table([
+                        {"Route": route, "Model": model, "Answers": calls, "Avg ms": round(avg_ms),
+                         "Input tokens": tokens_in, "Output tokens": tokens_out, "Est. cost (USD)": round(cost, 4)}
+                        for route, model, calls, avg_ms, tokens_in, tokens_out, cost in routes
+                    ])
+                else:
+                    st.caption("No answers recorded yet.")
+
+            elif menu == "Profile":
+                _render_profile_section()
+
+            elif menu == "Users":
+                st.subheader("📋 User Management")
+
+                # Show user chat history when History button is clicked
+                if "view_history_user_id" in st.session_state and st.session_state.view_history_user_id:
+                    uid = st.session_state.view_history_user_id
+                    uname = st.session_state.get("view_history_user_name", "User")
+                    if st.button("← Back to users"):
+                        del st.session_state["view_history_user_id"]
+                        if "view_history_user_name" in st.session_state:
+                            del st.session_state["view_history_user_name"]
+                        st.session_state.pop("view_history_archived", None)
                         st.rerun()
-
-        elif menu == "Documents & Notices":
-            st.subheader("📄 Documents / Notices")
-            title = st.text_input("Title")
-            desc = st.text_area("Description")
-
-            if st.button("Add"):
-                if title.strip() and desc.strip():
-                    add_document(title, desc)
-                    st.success("Added")
-                    st.rerun()
+                    st.markdown(f"### 💬 Chat history: {uname}")
+                    archived = archived_count(uid)
+                    if archived and not st.session_state.get("view_history_archived"):
+                        st.caption(f"🗄️ {archived} older messages are archived.")
+                        if st.button("Load archived messages"):
+                            st.session_state.view_history_archived = True
+                            st.rerun()
+                    st.markdown("---")
+                    rows = load_chat_log(uid)
+                    if archived and st.session_state.get("view_history_archived"):
+                        recent = len(rows)
+                        rows = archived_chat_log(uid) + rows
+                        st.caption(f"🗄️ {len(rows) - recent} archived + {recent} recent messages")
+                        rows = _paged(rows, "history_archive")
+                    if not rows:
+                        st.info("No chat history for this user.")
+                    else:
+                        for role, message, ts in rows:
+                            label = "User" if role == "user" else "Assistant"
+                            st.markdown(f"**{label}** — {ts or ''}")
+                            st.write(message)
+                            st.markdown("---")
                 else:
-                    st.error("Title and description are required.")
-
-            st.markdown("---")
-            st.markdown("**Documents**")
-            for d in get_all_documents():
-                c1, c2 = st.columns([6, 1])
-                with c1:
-                    st.markdown(f"**{d[1]}**")
-                    st.write(d[2])
-                with c2:
-                    if st.button("🗑️ Remove", key=f"del_doc_{d[0]}"):
-                        delete_document(d[0])
+                    st.markdown("**Name | Username | Mobile | Role | Course | Year | Actions**")
+                    st.markdown("---")
+                    for u in get_all_users():
+                        cols = st.columns([3, 2, 2, 2, 2, 2, 1, 1])
+                        cols[0].write(u.name)
+                        cols[1].write(u.username)
+                        cols[2].write(u.mobile)
+                        cols[3].write(u.role)
+                        cols[4].write(u.course)
+                        cols[5].write(u.year)
+                        if cols[6].button("📜 History", key=f"hist_{u.id}"):
+                            st.session_state.view_history_user_id = u.id
+                            st.session_state.view_history_user_name = u.name
+                            st.rerun()
+                        if cols[7].button("❌ Delete", key=f"del_{u.id}"):
+                            delete_user(u.id)
+                            st.rerun()
+
+            elif menu == "Documents & Notices":
+                st.subheader("📄 Documents / Notices")
+                kind = st.radio("Type", ["Document", "Notice"], horizontal=True, key="add_kind")
+                title = st.text_input("Title")
+                desc = st.text_area("Description")
+                aud_course, aud_year = st.columns(2)
+                with aud_course:
+                    doc_course = st.text_input("Audience course", value="ALL", help="ALL = every course", key="doc_course")
+                with aud_year:
+                    doc_year = st.selectbox("Audience year", ["ALL", "1st", "2nd"], key="doc_year")
+                if kind == "Notice":
+                    n_prio, n_expiry = st.columns(2)
+                    with n_prio:
+                        notice_priority = st.number_input("Priority", value=0, step=1, help="Higher shows first", key="notice_priority")
+                    with n_expiry:
+                        notice_expiry = st.date_input("Expires on", value=None, help="Leave empty to never expire", key="notice_expiry")
+
+                if st.button("Add"):
+                    if title.strip() and desc.strip():
+                        if kind == "Notice":
+                            add_notification(
+                                title,
+                                desc,
+                                doc_course,
+                                doc_year,
+                                expires_at=_end_of_day_utc(notice_expiry) if notice_expiry else None,
+                                priority=int(notice_priority),
+                            )
+                        else:
+                            add_document(title, desc, doc_course, doc_year)
+                        st.success("Added")
                         st.rerun()
+                    else:
+                        st.error("Title and description are required.")
+
                 st.markdown("---")
+                _render_bulk_knowledge_tools()
 
-            st.markdown("**Notices**")
-            for n in get_all_notifications():
-                c1, c2 = st.columns([6, 1])
-                with c1:
-                    st.markdown(f"**{n[1]}**")
-                    st.write(n[2])
-                with c2:
-                    if st.button("🗑️ Remove", key=f"del_notif_{n[0]}"):
-                        delete_notification(n[0])
-                        st.rerun()
                 st.markdown("---")
+                st.markdown("**Documents**")
+                for d in _paged(get_all_documents(), "doc_list_page"):
+                    c1, c2 = st.columns([6, 1])
+                    with c1:
+                        st.markdown(f"**{d.title}**")
+                        st.caption(f"Audience: {d.course} / {d.year}")
+                        _render_full_text("documents", d, f"doc_full_{d.id}")
+                    with c2:
+                        if st.button("🗑️ Remove", key=f"del_doc_{d.id}"):
+                            delete_document(d.id)
+                            st.rerun()
+                    st.markdown("---")
+
+                st.markdown("**Notices**")
+                for n in _paged(get_all_notifications(), "notice_list_page"):
+                    c1, c2 = st.columns([6, 1])
+                    with c1:
+                        st.markdown(f"**{n.title}**")
+                        st.caption(
+                            f"Audience: {n.course} / {n.year} · Priority {n.priority or 0} · "
+                            f"Published {n.published_at or '-'} · Expires {n.expires_at or 'never'}"
+                        )
+                        _render_full_text("notifications", n, f"notice_full_{n.id}")
+                    with c2:
+                        if st.button("🗑️ Remove", key=f"del_notif_{n.id}"):
+                            delete_notification(n.id)
+                            st.rerun()
+                    st.markdown("---")
 
-        elif menu == "Logout":
-            logout_user()
+            elif menu == "Export":
+                _render_export_section()
+
+            elif menu == "Profiler":
+                _render_profiler_section()
+
+            elif menu == "Maintenance":
+                _render_maintenance_section()
+
+            elif menu == "Logout":
+                logout_user()
 
     # ---------- STUDENT ----------
     else:
@@ -579,61 +962,55 @@ else:
         st.sidebar.markdown("---")
         st.sidebar.button("Logout", on_click=logout_user)
 
-        if st.session_state.student_view == "Home":
-            _render_student_home()
-        elif st.session_state.student_view == "Profile":
-            st.markdown("### 👤 Profile")
-            _render_profile_section()
-        elif st.session_state.student_view == "Chat History":
-            st.subheader("📜 Chat History")
-            conn = sqlite3.connect("college_data.db")
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT role, message, timestamp
-                FROM chat_history
-                WHERE user_id = ?
-                ORDER BY id ASC
-                """,
-                (st.session_state.user_id,),
-            )
-            rows = cur.fetchall()
-            conn.close()
-            if not rows:
-                st.info("No chat history yet. Start a conversation in **Chat**.")
-            else:
-                for role, message, ts in rows:
-                    label = "You" if role == "user" else "Assistant"
-                    st.markdown(f"**{label}** — {ts or ''}")
-                    st.write(message)
-                    st.markdown("---")
-        elif st.session_state.student_view == "Chat":
-            st.markdown("### 👋 Welcome back")
-            st.markdown(
-                f"**{st.session_state.name}**, ask any MCA or university-related question below."
-            )
-            st.markdown("---")
+        with profile_section(f"student/{st.session_state.student_view}"):
+            if st.session_state.student_view == "Home":
+                _render_student_home()
+            elif st.session_state.student_view == "Profile":
+                st.markdown("### 👤 Profile")
+                _render_profile_section()
+            elif st.session_state.student_view == "Chat History":
+                st.subheader("📜 Chat History")
+                rows = load_chat_log(st.session_state.user_id)
+                if not rows:
+                    st.info("No chat history yet. Start a conversation in **Chat**.")
+                else:
+                    for role, message, ts in rows:
+                        label = "You" if role == "user" else "Assistant"
+                        st.markdown(f"**{label}** — {ts or ''}")
+                        st.write(message)
+                        st.markdown("---")
+            elif st.session_state.student_view == "Chat":
+                st.markdown("### 👋 Welcome back")
+                st.markdown(
+                    f"**{st.session_state.name}**, ask any MCA or university-related question below."
+                )
+                st.markdown("---")
 
-            # Load and display previous chat from DB for context
-            history = load_chat_history(st.session_state.user_id)
-            recent_chat = "\n".join(
-                f"{'User' if r == 'user' else 'Assistant'}: {m}" for r, m in history[-6:]
-            )
-            for role, message in history:
-                with st.chat_message("assistant" if role == "assistant" else "user"):
-                    st.write(message)
+                # Load and display previous chat from DB for context
+                history = load_chat_history(st.session_state.user_id)
+                recent_chat = "\n".join(
+                    f"{'User' if r == 'user' else 'Assistant'}: {m}" for r, m in history[-6:]
+                )
+                for role, message in history:
+                    with st.chat_message("assistant" if role == "assistant" else "user"):
+                        st.write(message)
 
-            q = st.chat_input("Ask your question...")
+                q = st.chat_input("Ask your question...")
 
-            if q:
-                with st.chat_message("user"):
-                    st.write(q)
+                if q:
+                    with st.chat_message("user"):
+                        st.write(q)
 
-                ans = ask_ai(q, recent_context=recent_chat)
+                    ans = ask_ai(
+                        q,
+                        recent_context=recent_chat,
+                        course=st.session_state.course,
+                        year=st.session_state.year,
+                    )
 
-                with st.chat_message("assistant"):
-                    st.write(ans)
+                    with st.chat_message("assistant"):
+                        st.write(ans)
 
-                # Always save chat for logged-in users
-                save_chat(st.session_state.user_id, "user", q)
-                save_chat(st.session_state.user_id, "assistant", ans)
+                    # Always save chat for logged-in users
+                    save_chat(st.session_state.user_id, "user", q)
+                    save_chat(st.session_state.user_id, "assistant", ans)
@@ -1,30 +1,67 @@
 import os
 import re
+import threading
+import time
+from typing import Sequence
 
 import streamlit as st
-from dotenv import load_dotenv
-from google import genai
 
-try:
-    from google.genai import types
-    _HAS_GOOGLE_SEARCH = hasattr(types, "Tool") and hasattr(types, "GoogleSearch")
-except (ImportError, AttributeError):
-    types = None  # type: ignore[misc, assignment]
-    _HAS_GOOGLE_SEARCH = False
+import answer_cache
+import context_cache
+import model_router
+import query_expansion
+import web_cache
+from db_utils import (
+    ALL_AUDIENCE, audience_partition, get_descriptions, knowledge_seq, load_knowledge_index, sync_knowledge_changes,
+)
+from read_models import KnowledgeEntry
+
+# The Gemini SDK and dotenv are slow to import, so they are loaded on the
+# first question instead of when the app starts (see _get_client()).
+_client = None
+_client_ready = False
+_client_lock = threading.Lock()
+_types = None
+
+
+def _get_api_key():
+    """Prefer Streamlit secrets in production, fall back to env var / .env locally."""
+    try:
+        return st.secrets["GOOGLE_API_KEY"]  # type: ignore[index]
+    except Exception:
+        from dotenv import load_dotenv
 
-from db_utils import load_knowledge
+        load_dotenv()
+        return os.getenv("GOOGLE_API_KEY")
 
 
-# Load environment variables from a local .env file
-load_dotenv()
+def _get_client():
+    """Build the Gemini client once per process, on first use. Returns None without an API key."""
+    global _client, _client_ready
+    if _client_ready:
+        return _client
+    with _client_lock:
+        if not _client_ready:
+            api_key = _get_api_key()
+            if api_key:
+                from google import genai
 
-# Prefer Streamlit secrets in production, fall back to env var locally.
-try:
-    api_key = st.secrets["GOOGLE_API_KEY"]  # type: ignore[index]
-except Exception:
-    api_key = os.getenv("GOOGLE_API_KEY")
+                _client = genai.Client(api_key=api_key)
+            _client_ready = True
+    return _client
 
-client = genai.Client(api_key=api_key) if api_key else None
+
+def _get_types():
+    """Return google.genai.types if it supports Google Search grounding, else None."""
+    global _types
+    if _types is None:
+        try:
+            from google.genai import types
+
+            _types = types if hasattr(types, "Tool") and hasattr(types, "GoogleSearch") else False
+        except (ImportError, AttributeError):
+            _types = False
+    return _types or None
 
 # Stopwords for relevance filtering
 STOPWORDS = {
@@ -35,6 +72,12 @@ STOPWORDS = {
 
 SEARCH_WEB_MARKER = "[NEED_WEB_SEARCH]"
 
+MODEL = model_router.FULL_MODEL
+
+# Retrieval ranks on titles and body keywords; only this many best matches are
+# sent with their full description, the rest with their preview.
+RETRIEVAL_TOP_K = int(os.getenv("SVU_RETRIEVAL_TOP_K", "8"))
+
 DB_ONLY_PROMPT = (
     "You are SVU-MCA Assistant for MCA students of Samrat Vikramaditya University, Ujjain. "
     "Answer ONLY using the university data provided below. "
@@ -57,83 +100,246 @@ def _extract_keywords(question: str) -> set:
     return {w for w in words if w not in STOPWORDS}
 
 
-def get_relevant_knowledge(question: str) -> list[dict]:
+def _keyword_hits(index, groups) -> dict:
     """
-    Retrieve documents/notifications from DB relevant to the question.
-    Uses keyword overlap. Returns all knowledge if no keywords match.
+    {entry position: set of question keywords it contains}. groups maps each
+    keyword to its alternatives (query_expansion.expand_keywords); any
+    alternative that is a substring of a word in the partition's vocabulary counts.
     """
-    knowledge = load_knowledge()
+    hits = {}
+    for word, ids in index.postings.items():
+        matched = [kw for kw, alternatives in groups.items() if any(alt in word for alt in alternatives)]
+        if matched:
+            for i in ids:
+                hits.setdefault(i, set()).update(matched)
+    return hits
+
+
+def get_relevant_knowledge(
+    question: str, course: str = ALL_AUDIENCE, year: str = ALL_AUDIENCE
+) -> Sequence[KnowledgeEntry]:
+    """
+    Retrieve documents/notifications relevant to the question from the
+    student's course/year partition (plus content for everyone).
+    Uses keyword overlap with titles and bodies (the keywords column, so
+    words past the preview count too), after spelling correction
+    and synonyms; entries matching more keywords come first.
+    Returns the whole partition if no keywords match.
+    """
+    index = load_knowledge_index(course, year)
+    knowledge = index.entries
     keywords = _extract_keywords(question)
     if not keywords:
         return knowledge
 
-    relevant = []
-    for k in knowledge:
-        text = (k["title"] + " " + k["description"]).lower()
-        if any(kw in text for kw in keywords):
-            relevant.append(k)
-
+    hits = _keyword_hits(index, query_expansion.expand_keywords(keywords))
+    relevant = [knowledge[i] for i in sorted(hits, key=lambda i: (-len(hits[i]), i))]
     return relevant if relevant else knowledge
 
 
-def _answer_from_db(question: str, knowledge_text: str, recent_context: str) -> str:
-    """Try to answer using only DB knowledge."""
-    full_prompt = (
-        DB_ONLY_PROMPT
-        + knowledge_text
-        + ("\n\nRecent chat:\n" + recent_context if recent_context else "")
+def rank_knowledge(
+    question: str, course: str = ALL_AUDIENCE, year: str = ALL_AUDIENCE
+) -> tuple[int, list[model_router.Match]]:
+    """(number of keywords, [Match, ...] best first) for model routing."""
+    index = load_knowledge_index(course, year)
+    groups = query_expansion.expand_keywords(_extract_keywords(question))
+    matches = []
+    for i, matched in _keyword_hits(index, groups).items():
+        entry = index.entries[i]
+        title_words = re.findall(r"\b\w{2,}\b", entry.title.lower())
+        in_title = sum(1 for kw in matched if any(alt in w for alt in groups[kw] for w in title_words))
+        matches.append(model_router.Match(entry, len(matched), in_title))
+    matches.sort(key=lambda m: (m.matched, m.title_matched), reverse=True)
+    return len(groups), matches
+
+
+def _descriptions(entries: Sequence[KnowledgeEntry]) -> dict:
+    """{(table, id): full description}, one query per table."""
+    found = {}
+    for table in {k.table for k in entries}:
+        ids = [k.id for k in entries if k.table == table]
+        found.update(((table, i), text) for i, text in get_descriptions(table, ids).items())
+    return found
+
+
+def _knowledge_text(entries: Sequence[KnowledgeEntry], top_k: int | None = RETRIEVAL_TOP_K) -> str:
+    """Full descriptions of the first top_k entries (all if None), previews of the rest."""
+    bodies = _descriptions(entries if top_k is None else entries[:top_k])
+    return "\n".join(k.title + ": " + (bodies.get((k.table, k.id)) or k.preview or "") for k in entries)
+
+
+def _answer_from_db(
+    question: str, knowledge_text: str, recent_context: str, cache_name: str | None = None,
+    route: str = model_router.FULL, model: str = MODEL,
+) -> str:
+    """
+    Try to answer using only DB knowledge. With a context-cache handle the
+    prompt + knowledge prefix is referenced instead of sent again.
+    """
+    question_part = (
+        ("\n\nRecent chat:\n" + recent_context if recent_context else "")
         + "\n\n---\n\nQuestion: "
         + question
     )
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=full_prompt,
-    )
+    start = time.perf_counter()
+    if cache_name:
+        from google.genai import types
+
+        response = _get_client().models.generate_content(
+            model=model,
+            contents=question_part.lstrip(),
+            config=types.GenerateContentConfig(cached_content=cache_name),
+        )
+    else:
+        response = _get_client().models.generate_content(
+            model=model,
+            contents=DB_ONLY_PROMPT + knowledge_text + question_part,
+        )
+    model_router.record(route, model, (time.perf_counter() - start) * 1000, response)
+    context_cache.record_usage(response)
     return response.text
 
 
-def _answer_with_web_search(question: str) -> str:
-    """Answer using Google Search when DB doesn't have the info."""
-    if not _HAS_GOOGLE_SEARCH:
+def _answer_with_web_search(question: str, kb_version: int, audience: str) -> str:
+    """Answer using Google Search when DB doesn't have the info, and keep it in web_cache."""
+    types = _get_types()
+    if types is None:
         return (
             "This information is not in our university database. "
             "Web search is not available in this setup. Please check the official university website or contact the administration."
         )
     grounding_tool = types.Tool(google_search=types.GoogleSearch())
     config = types.GenerateContentConfig(tools=[grounding_tool])
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
+    start = time.perf_counter()
+    response = _get_client().models.generate_content(
+        model=MODEL,
         contents=WEB_FALLBACK_PROMPT + "\n\nQuestion: " + question,
         config=config,
     )
+    model_router.record(model_router.WEB, MODEL, (time.perf_counter() - start) * 1000, response)
+    web_cache.record_web_call()
+    web_cache.store_answer(
+        question, response.text, web_cache.grounding_sources(response), kb_version, audience
+    )
     return response.text
 
 
-@st.cache_data(ttl=300)
-def ask_ai(question, recent_context: str = "") -> str:
+def ask_ai(
+    question, recent_context: str = "", course: str = ALL_AUDIENCE, year: str = ALL_AUDIENCE
+) -> str:
     """
     Answer using DB (college_data) first. If info is not in DB, retrieve from internet.
+    Only documents/notices for the student's course and year (or everyone) are used.
+    Answers are kept in answer_cache with the entries they were built from, so
+    knowledge changes only drop the answers they affect.
     """
-    if client is None:
+    if _get_client() is None:
         return (
             "⚠️ Google Gemini API key is not configured.\n"
             "Set `GOOGLE_API_KEY` in Streamlit secrets or as an environment variable."
         )
 
-    # 1. Retrieve related info from DB
-    relevant = get_relevant_knowledge(question)
-    knowledge_text = "\n".join(
-        k["title"] + ": " + k["description"] for k in relevant
-    )
+    sync_knowledge_changes()
+    key = (question, recent_context, audience_partition(course, year))
+    answer = answer_cache.get(key)
+    if answer is not None:
+        return answer
+    seq = knowledge_seq()
+    answer, deps = _ask(question, recent_context, course, year)
+    # Not cached on errors, or if a change was applied while answering (deps may predate it).
+    if deps is not None and knowledge_seq() == seq:
+        answer_cache.put(key, answer, deps)
+    return answer
+
+
+def _ask(question, recent_context, course, year):
+    """(answer, answer_cache.Dependencies or None when the answer must not be cached)."""
+    words = tuple(sorted({
+        alt for alternatives in query_expansion.expand_keywords(_extract_keywords(question)).values()
+        for alt in alternatives
+    }))
+    used = set()
+    whole_partition = False
+
+    def deps():
+        sources = frozenset() if whole_partition else frozenset((k.table, k.id) for k in used)
+        return answer_cache.Dependencies(sources, words, whole_partition)
+
+    def relevant():
+        nonlocal whole_partition
+        entries = get_relevant_knowledge(question, course, year)
+        if entries is load_knowledge_index(course, year).entries:
+            whole_partition = True
+        used.update(entries)
+        return entries
+
+    # 0. A cached web answer can be served directly if the DB-only path already
+    #    failed on this exact knowledge base for this audience.
+    audience = "/".join(audience_partition(course, year))
+    kb_version = web_cache.knowledge_version()
+    cached = web_cache.get_cached_answer(question, audience)
+    if cached and cached["knowledge_version"] == kb_version:
+        web_cache.record_cache_hit()
+        return cached["answer"].strip(), deps()
+
+    # 1. Route by retrieval confidence, length and history: an exact FAQ hit is
+    #    answered from its entry, easy questions go to the fast model tier.
+    start = time.perf_counter()
+    n_keywords, matches = rank_knowledge(question, course, year)
+    route = model_router.choose_route(question, n_keywords, matches, recent_context)
+    if route.name == model_router.FAQ:
+        model_router.record(route.name, None, (time.perf_counter() - start) * 1000)
+        if cached:
+            web_cache.forget_answer(question, audience)
+        entry = route.faq_entry
+        used.add(entry)
+        answer = model_router.faq_answer(entry, _descriptions([entry]).get((entry.table, entry.id)) or entry.preview)
+        return answer, deps()
 
     try:
         # 2. Try answering from DB only
-        answer = _answer_from_db(question, knowledge_text, recent_context)
+        answer = None
+        if route.name == model_router.FAST:
+            knowledge_text = _knowledge_text(relevant())
+            answer = _answer_from_db(question, knowledge_text, recent_context, None, route.name, route.model)
+            if SEARCH_WEB_MARKER in answer:
+                answer = None  # the fast tier gave up; let the full model try before the web
+
+        if answer is None:
+            # With context caching on, the whole partition is registered once per
+            # knowledge version instead of sending the retrieved entries.
+            cache_name = context_cache.get_handle(
+                _get_client(),
+                MODEL,
+                audience,
+                kb_version,
+                lambda: DB_ONLY_PROMPT + _knowledge_text(load_knowledge_index(course, year).entries, None),
+            )
+            if cache_name:
+                whole_partition = True
+            knowledge_text = "" if cache_name else _knowledge_text(relevant())
+            try:
+                answer = _answer_from_db(question, knowledge_text, recent_context, cache_name)
+            except Exception:
+                if not cache_name:
+                    raise
+                # Handle expired or evicted on the provider side: forget it, send the full prompt.
+                context_cache.drop_handle(MODEL, audience)
+                knowledge_text = _knowledge_text(relevant())
+                answer = _answer_from_db(question, knowledge_text, recent_context)
 
-        # 3. If DB doesn't have the info, fallback to web search
+        # 3. If DB doesn't have the info, fallback to web search (cached long-term)
         if SEARCH_WEB_MARKER in answer:
-            answer = _answer_with_web_search(question)
+            if cached:
+                web_cache.record_cache_hit()
+                web_cache.confirm_still_needed(question, kb_version, audience)
+                answer = cached["answer"]
+            else:
+                answer = _answer_with_web_search(question, kb_version, audience)
+        elif cached:
+            # The knowledge base now covers this question; stop serving the web answer.
+            web_cache.forget_answer(question, audience)
 
-        return answer.strip()
+        return answer.strip(), deps()
     except Exception as e:
-        return f"⚠️ Error: {str(e)}\nYou may have exceeded your API quota or there was a network issue."
+        return f"⚠️ Error: {str(e)}\nYou may have exceeded your API quota or there was a network issue.", None
@@ -1,29 +1,67 @@
-import sqlite3
+import storage
+from data_service import remote
+from db_utils import get_all_users
+from passwords import LoginBusy, hash_password, verify_password
+from read_replica import invalidate as invalidate_replica
+from storage import read_connection
 
+@remote
 def login(username_or_mobile, password):
-    """Login with username or mobile number."""
-    conn = sqlite3.connect("college_data.db")
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name, role, course, year FROM users WHERE (username=? OR mobile=?) AND password=?",
-        (username_or_mobile, username_or_mobile, password),
-    )
-    user = cur.fetchone()
-    conn.close()
-    return user
+    """
+    Login with username or mobile number (case-insensitive): one lookup in
+    login_names, then the password check on the passwords.py pool. Returns
+    (id, name, role, course, year) or None. Raises LoginBusy when too many
+    logins are already waiting. Passwords stored in plain text or with old
+    parameters are rehashed on the first successful login.
+    """
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT u.id, u.name, u.role, u.course, u.year, u.password FROM login_names l"
+            " JOIN users u ON u.id = l.user_id WHERE l.login = lower(trim(?))",
+            (username_or_mobile or "",),
+        )
+        row = cur.fetchone()
+    matches, needs_rehash = verify_password(password, row[5] if row else None)
+    if not matches:
+        return None
+    if needs_rehash:
+        _rehash(row[0], row[5], password)
+    return tuple(row[:5])
+
+
+def _rehash(user_id, stored, password):
+    # Best effort: the login already succeeded. With the hashing pool full the
+    # rehash is skipped and happens on a later login instead.
+    try:
+        new_hash = hash_password(password, wait=False)
+    except LoginBusy:
+        return
+    # Only replaces the value that was verified, so a concurrent password change wins.
+    with storage.connect() as conn:
+        conn.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?", (new_hash, user_id, stored))
+    invalidate_replica()
 
 
 def register_user(name, username, mobile, password, course, year):
-    conn = sqlite3.connect("college_data.db")
-    cur = conn.cursor()
+    """
+    Register a student. Returns False if the username or mobile is taken.
+    The password is hashed here, in the caller, so with the data service only
+    the INSERT runs on its single writer thread. Raises LoginBusy like login().
+    """
+    return _insert_student(name, username, mobile, hash_password(password), course, year)
+
+
+@remote(write=True, after=get_all_users.clear)
+def _insert_student(name, username, mobile, password, course, year):
     try:
-        cur.execute("""
-        INSERT INTO users (name, username, mobile, password, role, course, year)
-        VALUES (?, ?, ?, ?, 'student', ?, ?)
-        """, (name, username, mobile, password, course, year))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
+        with storage.connect() as conn:
+            conn.execute("""
+            INSERT INTO users (name, username, mobile, password, role, course, year)
+            VALUES (?, ?, ?, ?, 'student', ?, ?)
+            """, (name, username, mobile, password, course, year))
+    except storage.IntegrityError:
         return False
-    finally:
-        conn.close()
+    get_all_users.clear()
+    invalidate_replica()
+    return True
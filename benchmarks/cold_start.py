@@ -0,0 +1,93 @@
+"""
+Cold-start profile of the app entry point.
+
+Runs `python -X importtime` in a fresh interpreter for the modules app.py
+imports at startup, and for the SDKs that are now deferred to first use,
+then reports import time per top-level package plus setup_database() cost
+on a new DB vs. an up-to-date one.
+
+Run from the project root:  python -m benchmarks.cold_start [--json]
+Use --json to record the numbers as a regression metric.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+STARTUP_MODULES = ["streamlit", "auth", "db_utils", "database", "session_store", "assistant"]
+DEFERRED_MODULES = ["google.genai", "dotenv", "streamlit_cookies_manager"]
+
+
+def import_profile(modules):
+    """Return ({top-level package: self time ms}, total wall ms) for importing modules."""
+    code = "\n".join(
+        f"try:\n    import {m}\nexcept Exception:\n    pass" for m in modules
+    )
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    per_package = defaultdict(float)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        per_package[name.split(".")[0]] += int(self_us) / 1000
+    return dict(per_package), wall_ms
+
+
+def setup_profile():
+    """Time setup_database() on a new DB and again once the schema is current."""
+    import database
+    import storage
+
+    database.DB_FILE = storage.DB_FILE = os.path.join(tempfile.mkdtemp(), "cold_start.db")
+    start = time.perf_counter()
+    database.setup_database()
+    fresh_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    database.setup_database()
+    current_ms = (time.perf_counter() - start) * 1000
+    return fresh_ms, current_ms
+
+
+def main():
+    startup, startup_wall = import_profile(STARTUP_MODULES)
+    deferred, deferred_wall = import_profile(DEFERRED_MODULES)
+    fresh_ms, current_ms = setup_profile()
+
+    report = {
+        "startup_import_ms": round(sum(startup.values()), 1),
+        "startup_process_ms": round(startup_wall, 1),
+        "deferred_import_ms": round(sum(deferred.values()), 1),
+        "deferred_process_ms": round(deferred_wall, 1),
+        "setup_database_new_db_ms": round(fresh_ms, 2),
+        "setup_database_current_ms": round(current_ms, 2),
+        "startup_by_package_ms": {
+            name: round(ms, 1) for name, ms in sorted(startup.items(), key=lambda kv: -kv[1])
+        },
+    }
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Startup imports      : {report['startup_import_ms']:8.1f} ms "
+          f"(process {report['startup_process_ms']:.1f} ms)")
+    print(f"Deferred to first use: {report['deferred_import_ms']:8.1f} ms "
+          f"(process {report['deferred_process_ms']:.1f} ms)")
+    print(f"setup_database       : {fresh_ms:8.2f} ms new DB, {current_ms:.2f} ms when current")
+    print("\nTop startup packages (self time):")
+    for name, ms in list(report["startup_by_package_ms"].items())[:15]:
+        print(f"  {name:<30} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
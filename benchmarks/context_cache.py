@@ -0,0 +1,92 @@
+"""
+Prompt tokens sent with and without provider-side context caching.
+
+Runs ask_ai over a set of questions against a local stub Gemini client that
+implements caches.create/delete and reports cached_content_token_count the
+same way the API does (tokens approximated as characters / 4). Runs in a
+temporary directory with a freshly seeded college_data.db.
+
+Run from the project root:  python -m benchmarks.context_cache [questions]
+"""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "When are the semester exams held?",
+    "When are admit cards released?",
+    "What subjects are in the MCA syllabus?",
+    "What is the admission eligibility for MCA?",
+    "How do I contact the university?",
+    "What programs does the Institute of Computer Science offer?",
+]
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class StubClient:
+    """Records what the app sends; no network."""
+
+    def __init__(self, min_cache_tokens=0):
+        self.min_cache_tokens = min_cache_tokens
+        self.store = {}
+        self.caches = SimpleNamespace(create=self._create, delete=self._delete)
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _create(self, model, config):
+        prefix = config.system_instruction
+        if _tokens(prefix) < self.min_cache_tokens:
+            raise ValueError("Cached content is too small")
+        name = f"cachedContents/{len(self.store) + 1}"
+        self.store[name] = prefix
+        return SimpleNamespace(name=name)
+
+    def _delete(self, name):
+        self.store.pop(name, None)
+
+    def _generate(self, model, contents, config=None):
+        cached = 0
+        name = getattr(config, "cached_content", None)
+        if name:
+            cached = _tokens(self.store[name])
+        usage = SimpleNamespace(
+            prompt_token_count=cached + _tokens(contents),
+            cached_content_token_count=cached,
+        )
+        return SimpleNamespace(text="Stub answer.", usage_metadata=usage, candidates=[])
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    sys.path.insert(0, APP_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="svu_ctx_"))
+
+    import answer_cache
+    import assistant
+    import context_cache
+    from database import setup_database
+
+    setup_database()
+    assistant._client = StubClient()
+    assistant._client_ready = True
+
+    for enabled in (False, True):
+        context_cache.ENABLED = enabled
+        context_cache._stats.update(created=0, failed=0, requests=0, prompt_tokens=0, cached_tokens=0)
+        answer_cache.clear()
+        for i in range(rounds):
+            assistant.ask_ai(f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})", "", "MCA", "1st")
+        stats = context_cache.cache_stats()
+        billed = stats["prompt_tokens"] - stats["cached_tokens"]
+        print(f"caching {'on ' if enabled else 'off'}: {stats['requests']} requests, "
+              f"{stats['prompt_tokens']:,} prompt tokens, {stats['cached_tokens']:,} from cache, "
+              f"{billed:,} uncached, {stats['created']} cache(s) created")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Throughput of several app processes sharing college_data.db: every process
+opening the file directly vs. all of them going through data_service.py.
+
+Each worker process plays one replica: per iteration it saves a question and
+an answer, reloads the chat history and logs in once.
+
+Run from the project root:  python -m benchmarks.data_service [processes] [iterations]
+"""
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker(workdir, socket_path, user_id, iterations):
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    import data_service
+
+    data_service.SOCKET_PATH = socket_path
+    from auth import login
+    from db_utils import load_chat_history, save_chat
+
+    ops = errors = 0
+    for i in range(iterations):
+        try:
+            save_chat(user_id, "user", f"question {i}")
+            save_chat(user_id, "assistant", f"answer {i} " + "lorem ipsum " * 20)
+            load_chat_history(user_id)
+            login("student", "student123")
+            ops += 4
+        except sqlite3.OperationalError:
+            errors += 1
+    return ops, errors
+
+
+def _run(workdir, socket_path, processes, iterations):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes) as pool:
+        start = time.perf_counter()
+        results = pool.starmap(
+            _worker, [(workdir, socket_path, 1000 + p, iterations) for p in range(processes)]
+        )
+        elapsed = time.perf_counter() - start
+    ops = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return ops / elapsed, errors
+
+
+def _start_service(workdir, socket_path):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "data_service.py"), "--socket", socket_path],
+        cwd=workdir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while not os.path.exists(socket_path):
+        if time.time() > deadline or proc.poll() is not None:
+            proc.kill()
+            raise RuntimeError("data service did not start")
+        time.sleep(0.05)
+    return proc
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    import data_service
+    import database
+
+    database.setup_database()
+
+    direct_ops, direct_errors = _run(workdir, None, processes, iterations)
+
+    socket_path = os.path.join(workdir, "svu-data.sock")
+    service = _start_service(workdir, socket_path)
+    try:
+        service_ops, service_errors = _run(workdir, socket_path, processes, iterations)
+        data_service.SOCKET_PATH = socket_path
+        stats = data_service.service_stats()
+    finally:
+        service.terminate()
+        service.wait()
+
+    print(f"{processes} processes x {iterations} iterations (2 writes + 2 reads each)")
+    print(f"direct sqlite : {direct_ops:9.1f} ops/s, {direct_errors} lock errors")
+    print(f"data service  : {service_ops:9.1f} ops/s, {service_errors} lock errors")
+    print(f"service saw {stats['reads']} reads, {stats['writes']} other writes, "
+          f"{stats['chats']} chat saves in {stats['chat_batches']} transactions")
+
+
+if __name__ == "__main__":
+    main()
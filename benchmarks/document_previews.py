@@ -0,0 +1,142 @@
+"""
+Listing and retrieving very large documents: full descriptions vs. previews.
+
+For N documents of SIZE characters each it measures:
+
+- one list page (LIST_PAGE_SIZE rows): rows with the full description, rows with
+  preview + body_length from the old column order (description in the middle,
+  so SQLite walks its overflow pages), and from the current layout (description
+  last);
+- the cached knowledge read model's size and build time with full text vs.
+  previews;
+- the knowledge text of one question's prompt: every matching entry in full
+  vs. the best RETRIEVAL_TOP_K in full and previews for the rest.
+
+Run from the project root:  python -m benchmarks.document_previews [documents] [characters each]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import assistant
+import database
+import db_utils
+import read_replica
+import storage
+
+LIST_PAGE_SIZE = 20  # app.LIST_PAGE_SIZE
+
+OLD_LAYOUT = """
+    CREATE TABLE documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        description TEXT,
+        audience_course TEXT DEFAULT 'ALL',
+        audience_year TEXT DEFAULT 'ALL',
+        preview TEXT,
+        body_length INTEGER
+    )
+"""
+
+
+def _body(i, size):
+    words = f"Section {i} of the examination regulations covers hostel, library and fee rules. "
+    return (words * (size // len(words) + 1))[:size]
+
+
+def _populate(path, create_sql, n, size):
+    conn = sqlite3.connect(path)
+    if create_sql:
+        conn.execute(create_sql)
+    conn.executemany(
+        "INSERT INTO documents (title, description, preview, body_length) VALUES (?, ?, ?, ?)",
+        (
+            (f"Regulation {i}", body, body[:database.PREVIEW_CHARS] + "…", len(body))
+            for i, body in ((i, _body(i, size)) for i in range(n))
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _timed(path, sql, repeat=5):
+    """(best ms, bytes of text returned) for one query on a cold connection."""
+    best, size = None, 0
+    for _ in range(repeat):
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        rows = conn.execute(sql).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        conn.close()
+        best = elapsed if best is None else min(best, elapsed)
+        size = sum(len(v) for row in rows for v in row if isinstance(v, str))
+    return best, size
+
+
+def _resident(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = (time.perf_counter() - start) * 1000
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size, elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    tmp = tempfile.mkdtemp()
+    old_path = os.path.join(tmp, "old_layout.db")
+    new_path = os.path.join(tmp, "college_data.db")
+    database.DB_FILE = storage.DB_FILE = read_replica.DB_FILE = new_path
+    database.init_db()
+    sqlite3.connect(new_path).execute("DELETE FROM documents").connection.commit()
+    _populate(old_path, OLD_LAYOUT, n, size)
+    _populate(new_path, None, n, size)
+
+    page = f"LIMIT {LIST_PAGE_SIZE}"
+    print(f"{n} documents x {size:,} characters, list page of {LIST_PAGE_SIZE}")
+    print(f"{'':44} {'ms':>8} {'text KB':>9}")
+    for label, path, sql in (
+        ("page with full descriptions", new_path, f"SELECT id, title, description FROM documents {page}"),
+        ("page of previews, description mid-row", old_path,
+         f"SELECT id, title, preview, body_length, audience_course FROM documents {page}"),
+        ("page of previews, description last", new_path,
+         f"SELECT id, title, preview, body_length, audience_course FROM documents {page}"),
+        ("all previews, description mid-row", old_path,
+         "SELECT id, title, preview, body_length, audience_course FROM documents"),
+        ("all previews, description last", new_path,
+         "SELECT id, title, preview, body_length, audience_course FROM documents"),
+    ):
+        ms, text = _timed(path, sql)
+        print(f"{label:44} {ms:8.2f} {text / 1e3:9.1f}")
+
+    def full_text():
+        rows = sqlite3.connect(new_path).execute("SELECT title, description FROM documents").fetchall()
+        return tuple(rows)
+
+    def previews():
+        db_utils._partition_knowledge.clear()
+        return db_utils.load_knowledge()
+
+    print()
+    for label, build in (("knowledge model, full text", full_text), ("knowledge model, previews", previews)):
+        resident, ms = _resident(build)
+        print(f"{label:44} {ms:8.2f} {resident / 1e6:8.1f} MB")
+
+    question = "hostel fee rules for regulation 7"
+    entries = assistant.get_relevant_knowledge(question)
+    everything = sum(len(e.title) + 2 + size for e in entries)
+    top_k = len(assistant._knowledge_text(entries))
+    print()
+    print(f"prompt knowledge for {len(entries)} matching entries: all in full {everything / 1e3:,.0f} KB, "
+          f"top {assistant.RETRIEVAL_TOP_K} in full {top_k / 1e3:,.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Export throughput and peak memory for chat_history.
+
+Builds a temporary DB with N chat rows (default 10,000,000) and streams it
+through exports.write_export for each format, with and without gzip.
+
+Run from the project root:  python -m benchmarks.export_throughput [rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import database
+import exports
+import storage
+
+
+def _populate(rows):
+    conn = sqlite3.connect(database.DB_FILE)
+    batch = 100_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, role, message) VALUES (?, ?, ?)",
+            (
+                (i % 5000, "user" if i % 2 == 0 else "assistant",
+                 "When are the semester exams held and when are admit cards released?")
+                for i in range(start, min(start + batch, rows))
+            ),
+        )
+        conn.commit()
+    conn.close()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    tmp = tempfile.mkdtemp()
+    database.DB_FILE = storage.DB_FILE = os.path.join(tmp, "export.db")
+    database.init_db()
+    _populate(rows)
+
+    print(f"chat_history rows: {rows:,}")
+    for fmt in ("csv", "jsonl"):
+        for compress in (False, True):
+            path = os.path.join(tmp, exports.export_filename("chat_history", fmt, compress))
+            start = time.perf_counter()
+            with open(path, "wb") as out:
+                size = exports.write_export(out, "chat_history", fmt, compress)
+            elapsed = time.perf_counter() - start
+            print(f"{fmt:5} gzip={compress!s:5}  {rows / elapsed:12,.0f} rows/s  {size / 1e6:9.1f} MB")
+            os.remove(path)
+
+    # Separate pass: tracemalloc slows Python down too much to time with it on.
+    tracemalloc.start()
+    with open(os.devnull, "wb") as out:
+        exports.write_export(out, "chat_history", "jsonl", True)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"peak Python memory during export: {peak / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
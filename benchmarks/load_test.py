@@ -0,0 +1,271 @@
+"""
+Concurrent multi-session load test for app.py using streamlit.testing AppTest.
+
+Each simulated student signs in through the Sign in form, opens Chat,
+asks questions and opens Chat History. The LLM is replaced by a stub client
+with a fixed latency, and the browser's cookie jar (AppTest runs no
+components) by an in-memory one.
+Concurrency is ramped up step by step. For each level the tool reports
+sessions/s, rerun latency percentiles, SQLite lock waits and memory per
+session, then the first few session failures with their exception.
+
+Everything runs in a temporary directory with its own college_data.db.
+AppTest swaps a process-global Runtime singleton on every run, so parallel
+sessions are driven from separate worker processes (one per concurrent
+session). They share the DB, as N server threads or replicas would.
+
+Run from the project root:
+    python -m benchmarks.load_test [--levels 1,2,4,8,16] [--sessions 16]
+                                   [--questions 3] [--llm-latency 0.2]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(APP_DIR, "app.py")
+
+PASSWORD = "password123"
+# Session failures printed per level (type and message); the rest are only counted.
+ERRORS_SHOWN = 5
+
+QUESTIONS = [
+    "When are the semester exams held?",
+    "When are admit cards released?",
+    "What is the MCA syllabus?",
+    "What is the admission eligibility for MCA?",
+    "How do I contact the university?",
+]
+
+
+# ------------------ SQLITE INSTRUMENTATION ------------------
+_lock_stats = {"waits": 0, "wait_seconds": 0.0, "errors": 0}
+_lock_stats_lock = threading.Lock()
+_original_connect = sqlite3.connect
+
+
+class _TimedConnection(sqlite3.Connection):
+    """Counts commits that had to wait for SQLite's write lock."""
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.OperationalError:
+            with _lock_stats_lock:
+                _lock_stats["errors"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            if waited > 0.005:
+                with _lock_stats_lock:
+                    _lock_stats["waits"] += 1
+                    _lock_stats["wait_seconds"] += waited
+
+
+def _timed_connect(*args, **kwargs):
+    kwargs.setdefault("factory", _TimedConnection)
+    return _original_connect(*args, **kwargs)
+
+
+# ------------------ STUB LLM ------------------
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StubModels:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self.latency)
+        return _StubResponse(f"Stub answer ({model}, {len(contents)} prompt chars).")
+
+
+class StubClient:
+    def __init__(self, latency):
+        self.models = _StubModels(latency)
+
+
+# ------------------ STUB COOKIES ------------------
+class BrowserCookies(dict):
+    """
+    Stands in for EncryptedCookieManager: its component never answers under
+    AppTest, so the real one is never ready(). Cookies live in session_state.
+    """
+
+    def __init__(self, prefix="", password=None):
+        import streamlit as st
+
+        super().__init__(st.session_state.get("load_test.cookies", {}))
+
+    def ready(self):
+        return True
+
+    def save(self):
+        import streamlit as st
+
+        st.session_state["load_test.cookies"] = dict(self)
+
+
+# ------------------ SESSION SCRIPT ------------------
+def _timed_run(at, latencies):
+    start = time.perf_counter()
+    at.run()
+    latencies.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def run_session(username, questions):
+    """Drive one student session; returns (rerun latencies, AppTest)."""
+    from streamlit.testing.v1 import AppTest
+
+    latencies = []
+    at = AppTest.from_file(APP_FILE, default_timeout=60)
+    _timed_run(at, latencies)
+    at.text_input(key="login_id").input(username)
+    at.text_input(key="login_pass").input(PASSWORD)
+    at.button(key="btn_login").click()
+    _timed_run(at, latencies)
+    if "role" not in at.session_state:
+        shown = [e.value for e in (*at.error, *at.warning)]
+        raise RuntimeError(f"sign in failed: {'; '.join(shown) or 'no message shown'}")
+
+    at.button(key="student_chat_btn").click()
+    _timed_run(at, latencies)
+    for i in range(questions):
+        at.chat_input[0].set_value(f"{QUESTIONS[i % len(QUESTIONS)]} ({username} #{i})")
+        _timed_run(at, latencies)
+
+    at.button(key="student_chat_history_btn").click()
+    _timed_run(at, latencies)
+    return latencies, at
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _init_worker(workdir, llm_latency):
+    """Per-process setup: shared temp DB, instrumented sqlite3, the stub LLM and cookies."""
+    sys.path.insert(0, APP_DIR)
+    os.chdir(workdir)
+    sqlite3.connect = _timed_connect
+
+    import assistant
+    import streamlit.testing.v1  # noqa: F401  (import cost is not session latency)
+    import streamlit_cookies_manager
+
+    streamlit_cookies_manager.EncryptedCookieManager = BrowserCookies
+
+    assistant._client = StubClient(llm_latency)
+    assistant._client_ready = True
+
+
+def _run_batch(usernames, questions):
+    """
+    Run sessions back to back in one worker; keeps their AppTests alive to weigh
+    them. Failed sessions are counted and the first ERRORS_SHOWN described.
+    """
+    with _lock_stats_lock:
+        _lock_stats.update(waits=0, wait_seconds=0.0, errors=0)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    latencies, alive, failures, errors = [], [], 0, []
+    for username in usernames:
+        try:
+            lats, at = run_session(username, questions)
+            latencies.extend(lats)
+            alive.append(at)
+        except Exception as exc:
+            failures += 1
+            if len(errors) < ERRORS_SHOWN:
+                errors.append(f"{username}: {type(exc).__name__}: {exc}")
+    grown = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return latencies, len(alive), failures, dict(_lock_stats), grown / max(1, len(alive)), errors
+
+
+def run_level(pool, concurrency, sessions, questions):
+    batches = [[f"loaduser{i}" for i in range(w, sessions, concurrency)] for w in range(concurrency)]
+    start = time.perf_counter()
+    results = list(pool.map(_run_batch, batches, [questions] * concurrency))
+    elapsed = time.perf_counter() - start
+
+    latencies = [lat for r in results for lat in r[0]]
+    completed = sum(r[1] for r in results)
+    return {
+        "concurrency": concurrency,
+        "sessions_per_s": completed / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000 if latencies else 0,
+        "p95_ms": _percentile(latencies, 95) * 1000 if latencies else 0,
+        "p99_ms": _percentile(latencies, 99) * 1000 if latencies else 0,
+        "lock_waits": sum(r[3]["waits"] for r in results),
+        "lock_wait_s": sum(r[3]["wait_seconds"] for r in results),
+        "failures": sum(r[2] + r[3]["errors"] for r in results),
+        "kb_per_session": statistics.mean(r[4] for r in results) / 1024,
+        "errors": [error for r in results for error in r[5]][:ERRORS_SHOWN],
+    }
+
+
+def _prepare_workdir(users):
+    """Fresh DB + load-test users in a temp dir that mirrors the app's relative paths."""
+    workdir = tempfile.mkdtemp(prefix="svu_load_")
+    os.symlink(os.path.join(APP_DIR, "images"), os.path.join(workdir, "images"))
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+
+    from auth import register_user
+    from database import setup_database
+
+    setup_database()
+    for i in range(users):
+        register_user(f"Load User {i}", f"loaduser{i}", f"7{i:09d}", PASSWORD, "MCA", "1st")
+    os.chdir(APP_DIR)
+    return workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    parser.add_argument("--sessions", type=int, default=16, help="sessions per level")
+    parser.add_argument("--questions", type=int, default=3, help="questions per session")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM seconds per call")
+    args = parser.parse_args()
+
+    workdir = _prepare_workdir(args.sessions)
+
+    print(f"{'conc':>4} {'sess/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'lock waits':>10} {'wait s':>7} {'fail':>5} {'KB/sess':>8}")
+    try:
+        for level in (int(x) for x in args.levels.split(",")):
+            with ProcessPoolExecutor(
+                max_workers=level,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(workdir, args.llm_latency),
+            ) as pool:
+                r = run_level(pool, level, args.sessions, args.questions)
+            print(f"{r['concurrency']:>4} {r['sessions_per_s']:>8.2f} {r['p50_ms']:>8.1f} "
+                  f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['lock_waits']:>10} "
+                  f"{r['lock_wait_s']:>7.2f} {r['failures']:>5} {r['kb_per_session']:>8.0f}")
+            for error in r["errors"]:
+                print(f"     ! {error}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
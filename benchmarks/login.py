@@ -0,0 +1,101 @@
+"""
+Logins per second with hashed passwords.
+
+1. Lookup only: the old `(username=? OR mobile=?) AND password=?` query vs the
+   login_names primary-key lookup auth.login() uses, on N users.
+2. auth.login() end to end (lookup + scrypt on the passwords.py pool) from
+   1..64 concurrent callers, as Streamlit script threads would call it at
+   exam-result time: logins/s, latency p50/p95 and LoginBusy rejections.
+
+Set SVU_AUTH_WORKERS / SVU_AUTH_MAX_PENDING / SVU_SCRYPT_N to compare settings.
+
+Run from the project root:  python -m benchmarks.login [users] [logins per level]
+"""
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import auth
+import database
+import passwords
+import read_replica
+import storage
+
+LEVELS = (1, 4, 16, 64)
+
+
+def _setup(n_users):
+    tmp = tempfile.mkdtemp(prefix="svu_login_")
+    database.DB_FILE = storage.DB_FILE = read_replica.DB_FILE = os.path.join(tmp, "bench.db")
+    database.init_db()
+    stored = passwords.hash_password("password123")  # one hash for everyone; verifying costs the same
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany(
+        "INSERT INTO users (name, username, mobile, password, role, course, year) VALUES (?,?,?,?,?,?,?)",
+        ((f"User {i}", f"user{i}", f"7{i:09d}", stored, "student", "MCA", "1st") for i in range(n_users)),
+    )
+    conn.commit()
+    conn.close()
+    return stored
+
+
+def _lookups(n_users, stored, repeat=20000):
+    conn = sqlite3.connect(database.DB_FILE)
+    old = "SELECT id, name, role, course, year FROM users WHERE (username=? OR mobile=?) AND password=?"
+    new = ("SELECT u.id, u.name, u.role, u.course, u.year, u.password FROM login_names l"
+           " JOIN users u ON u.id = l.user_id WHERE l.login = lower(trim(?))")
+    for label, run in (
+        ("old OR query", lambda name: conn.execute(old, (name, name, stored)).fetchone()),
+        ("login_names lookup", lambda name: conn.execute(new, (name,)).fetchone()),
+    ):
+        names = [f"user{(i * 7919) % n_users}" if i % 2 else f"7{(i * 7919) % n_users:09d}" for i in range(repeat)]
+        start = time.perf_counter()
+        for name in names:
+            assert run(name) is not None
+        print(f"{label:22} {(time.perf_counter() - start) / repeat * 1e6:8.1f} µs")
+    conn.close()
+
+
+def _logins(n_users, per_level):
+    for callers in LEVELS:
+        latencies, busy = [], 0
+
+        def one(i):
+            start = time.perf_counter()
+            try:
+                user = auth.login(f"user{(i * 7919) % n_users}", "password123")
+            except passwords.LoginBusy:
+                return None
+            assert user is not None
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=callers) as pool:
+            for ms in pool.map(one, range(per_level)):
+                if ms is None:
+                    busy += 1
+                else:
+                    latencies.append(ms * 1000)
+        elapsed = time.perf_counter() - start
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{callers:>3} callers  {len(latencies) / elapsed:8.1f} logins/s  "
+              f"p50 {statistics.median(latencies):7.1f} ms  p95 {p95:7.1f} ms  busy {busy}")
+
+
+def main():
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    per_level = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    stored = _setup(n_users)
+    print(f"{n_users:,} users, {passwords.ALGORITHM} (n={passwords.SCRYPT_N}), "
+          f"{passwords.WORKERS} hashing threads, {passwords.MAX_PENDING} pending max, {os.cpu_count()} CPUs")
+    _lookups(n_users, stored)
+    print()
+    _logins(n_users, per_level)
+
+
+if __name__ == "__main__":
+    main()
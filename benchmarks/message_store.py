@@ -0,0 +1,100 @@
+"""
+Space saved and read/write overhead of the content-addressed chat store.
+
+Builds a legacy-style chat_history (answers inline) where assistant answers
+come from a pool of popular long answers, migrates it to message_blobs and
+compares file size and per-message write / per-history read cost.
+
+Run from the project root:  python -m benchmarks.message_store [rows] [distinct answers]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+import message_store
+import storage
+
+
+def _file_mb(conn):
+    conn.execute("VACUUM")
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return pages * size / 1e6
+
+
+def _answers(distinct):
+    rnd = random.Random(7)
+    words = "exam admit card semester syllabus result university MCA notice schedule".split()
+    return [" ".join(rnd.choice(words) for _ in range(rnd.randint(150, 400))) for _ in range(distinct)]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    database.DB_FILE = storage.DB_FILE = os.path.join(tempfile.mkdtemp(), "messages.db")
+    database.init_db()
+    answers = _answers(distinct)
+    rnd = random.Random(1)
+
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany(
+        "INSERT INTO chat_history (user_id, role, message) VALUES (?, ?, ?)",
+        (
+            (i // 50, "user", f"question {i}") if i % 2 == 0
+            else (i // 50, "assistant", answers[min(int(rnd.paretovariate(1.2)) - 1, distinct - 1)])
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    before_mb = _file_mb(conn)
+
+    def read_history(user_id):
+        cur = conn.execute(
+            "SELECT role, message, blob_hash FROM chat_history WHERE user_id=? ORDER BY id", (user_id,)
+        )
+        return message_store.resolve_messages(conn, cur.fetchall(), 1, 2)
+
+    users = rows // 50
+    start = time.perf_counter()
+    for u in range(0, users, max(1, users // 500)):
+        read_history(u)
+    read_before = (time.perf_counter() - start) / min(users, 500) * 1000
+
+    start = time.perf_counter()
+    migrated = message_store.migrate_chat_history(conn)
+    migrate_s = time.perf_counter() - start
+    after_mb = _file_mb(conn)
+
+    message_store._decoded.clear()
+    start = time.perf_counter()
+    for u in range(0, users, max(1, users // 500)):
+        read_history(u)
+    read_after = (time.perf_counter() - start) / min(users, 500) * 1000
+
+    cur = conn.cursor()
+    start = time.perf_counter()
+    for i in range(2000):
+        cur.execute("INSERT INTO chat_history (user_id, role, message) VALUES (0, 'assistant', ?)",
+                    (answers[i % distinct],))
+    write_inline = (time.perf_counter() - start) / 2000 * 1e6
+    start = time.perf_counter()
+    for i in range(2000):
+        message, blob_hash = message_store.put_message(cur, answers[i % distinct])
+        cur.execute("INSERT INTO chat_history (user_id, role, message, blob_hash) VALUES (0, 'assistant', ?, ?)",
+                    (message, blob_hash))
+    write_blob = (time.perf_counter() - start) / 2000 * 1e6
+    conn.rollback()
+    conn.close()
+
+    print(f"{rows:,} rows, {distinct} distinct long answers; migrated {migrated:,} rows in {migrate_s:.1f} s")
+    print(f"DB size      : {before_mb:8.1f} MB -> {after_mb:8.1f} MB ({100 * (1 - after_mb / before_mb):.0f}% saved)")
+    print(f"write/message: {write_inline:8.1f} us -> {write_blob:8.1f} us (hash + compress)")
+    print(f"read/history : {read_before:8.3f} ms -> {read_after:8.3f} ms (blob lookup + decode, cold cache)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Retrieval misses with and without query expansion (spelling + synonyms).
+
+A question "misses" when retrieval finds no entry at all (the whole partition
+is sent, which in practice ends in a web search) or when the entry that
+answers it is not among the best-ranked matches (rank_knowledge()). Both lead
+to web fallbacks, so the miss count is the number of web fallbacks expansion
+can save.
+
+It also prints the mean share of a question's keywords the best entry
+covers (what model routing calls confidence) and how many questions tie
+several entries at the top, plus expansion cost per question and how long a
+full vs. incremental spelling-index rebuild takes with extra synthetic
+documents.
+
+Run from the project root:  python -m benchmarks.query_expansion [extra documents]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+import db_utils
+import query_expansion
+import read_replica
+import storage
+from assistant import _extract_keywords, rank_knowledge
+
+# (question, title of the entry that answers it)
+QUESTIONS = [
+    ("When is the examination schedule?", "Examination Schedule 2024-25"),
+    ("When is the examinaton schedule?", "Examination Schedule 2024-25"),
+    ("when are finals held", "Examination Schedule 2024-25"),
+    ("When is the test for odd semster", "Examination Schedule 2024-25"),
+    ("hallticket release date", "Examination Schedule 2024-25"),
+    ("when do admit crads come", "Examination Schedule 2024-25"),
+    ("MCA syllabus subjects", "MCA Syllabus Overview"),
+    ("mca sylabus", "MCA Syllabus Overview"),
+    ("what is in the curiculum", "MCA Syllabus Overview"),
+    ("admission eligibility", "Admission Guidelines"),
+    ("admision eligiblity criteria", "Admission Guidelines"),
+    ("entrence exam for mca", "Admission Guidelines"),
+    ("university phone number", "University Contact Information"),
+    ("universty adress", "University Contact Information"),
+    ("library hours", "Library Hours"),
+    ("libary timings", "Library Hours"),
+    ("exam timetable release", "Exam Time Table Release"),
+    ("datesheet for odd semester", "Exam Time Table Release"),
+    ("placement with TCS", "MoU with TCS"),
+    ("university renamed", "Change of University Name"),
+    ("univeristy new name", "Change of University Name"),
+    ("computer science institute labs", "Institute of Computer Science"),
+    ("compter sciense labs", "Institute of Computer Science"),
+    ("digital resurces vpn", "Library Hours"),
+]
+
+
+def _misses():
+    no_match = missed = ties = 0
+    coverage = 0.0
+    for question, title in QUESTIONS:
+        n_keywords, matches = rank_knowledge(question)
+        if not matches:
+            no_match += 1
+            continue
+        top = [m.entry.title for m in matches if m.matched == matches[0].matched]
+        missed += title not in top
+        ties += len(top) > 1
+        coverage += matches[0].matched / n_keywords
+    return no_match, missed, ties, coverage / len(QUESTIONS)
+
+
+def _add_synthetic(n):
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany(
+        "INSERT INTO documents (title, description) VALUES (?, ?)",
+        ((f"Circular {i}", f"Notice number{i} about department{i % 97} activity{i % 31} for batch{i % 13}.")
+         for i in range(n)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    extra = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    database.DB_FILE = storage.DB_FILE = read_replica.DB_FILE = os.path.join(tmp, "college_data.db")
+    database.setup_database()
+
+    query_expansion.ENABLED = False
+    plain = _misses()
+    query_expansion.ENABLED = True
+    expanded = _misses()
+
+    keyword_sets = [_extract_keywords(q) for q, _ in QUESTIONS]
+    start = time.perf_counter()
+    for _ in range(100):
+        for keywords in keyword_sets:
+            query_expansion.expand_keywords(keywords)
+    per_question_us = (time.perf_counter() - start) / (100 * len(keyword_sets)) * 1e6
+
+    _add_synthetic(extra)
+    db_utils._knowledge_changed()
+    vocabulary = {w: len(ids) for w, ids in db_utils.load_knowledge_index().postings.items()}
+    start = time.perf_counter()
+    query_expansion.SpellingCorrector().update(vocabulary)
+    full_ms = (time.perf_counter() - start) * 1000
+    speller = query_expansion.SpellingCorrector()
+    speller.update(vocabulary)
+    vocabulary["hostel"] = 1
+    start = time.perf_counter()
+    speller.update(vocabulary)
+    incremental_ms = (time.perf_counter() - start) * 1000
+
+    n = len(QUESTIONS)
+    print(f"{n} questions (typos, synonyms and plain wording) against the seed knowledge base")
+    print(f"{'':18} {'no match':>9} {'not top-ranked':>15} {'would use web':>14} {'top ties':>9} {'coverage':>9}")
+    for label, (none, wrong, ties, coverage) in (("literal keywords", plain), ("expanded", expanded)):
+        print(f"{label:18} {none:9} {wrong:15} {none + wrong:14} {ties:9} {coverage:9.0%}")
+    print(f"expansion cost     : {per_question_us:.1f} us per question")
+    print(f"spelling index with {len(vocabulary)} words: full build {full_ms:.1f} ms, "
+          f"one new word {incremental_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
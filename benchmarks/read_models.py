@@ -0,0 +1,128 @@
+"""
+Memory and cache-hit latency of the cached read models: the old
+st.cache_data lists (SELECT * tuples / per-row dicts, copied on every hit)
+vs. the shared read_models tuples behind st.cache_resource.
+
+"Per session" is what one cache hit allocates: st.cache_data unpickles a
+fresh copy for every caller, st.cache_resource hands out the same object.
+
+Run from the project root:  python -m benchmarks.read_models [users] [documents]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import streamlit as st
+
+import database
+import read_models
+import storage
+
+COURSES = ("MCA", "MBA", "BCA", "MSC")
+YEARS = ("1st", "2nd")
+KNOWLEDGE_SQL = "SELECT 'documents', id, title, preview, body_length FROM documents"
+
+
+def _populate(n_users, n_docs):
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany(
+        "INSERT INTO users (name, username, mobile, password, role, course, year) VALUES (?,?,?,?,?,?,?)",
+        (
+            (f"Student {i}", f"user{i}", f"9{i:09d}", "secret123", "student", COURSES[i % 4], YEARS[i % 2])
+            for i in range(n_users)
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO documents (title, description, audience_course, audience_year) VALUES (?,?,?,?)",
+        (
+            (f"Document {i}", f"Details about topic {i}. " * 8, COURSES[i % 4], YEARS[i % 2])
+            for i in range(n_docs)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _query(sql):
+    conn = sqlite3.connect(database.DB_FILE)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+
+@st.cache_data
+def old_users():
+    return _query("SELECT * FROM users")
+
+
+@st.cache_data
+def old_knowledge():
+    return [{"title": t, "description": d} for t, d in _query("SELECT title, description FROM documents")]
+
+
+@st.cache_resource
+def new_users():
+    return read_models.users(_query(f"SELECT {read_models.USER_COLUMNS} FROM users"))
+
+
+@st.cache_resource
+def new_knowledge():
+    return read_models.knowledge(_query(KNOWLEDGE_SQL))
+
+
+def _measure(fn, repeat=20):
+    fn()  # fill the cache
+    tracemalloc.start()
+    value = fn()
+    per_hit = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return per_hit, (time.perf_counter() - start) / repeat * 1000
+
+
+def _resident(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def main():
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_docs = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    database.DB_FILE = storage.DB_FILE = os.path.join(tempfile.mkdtemp(), "read_models.db")
+    database.setup_database()
+    _populate(n_users, n_docs)
+
+    rows = {
+        "users": (
+            lambda: _query("SELECT * FROM users"),
+            lambda: read_models.users(_query(f"SELECT {read_models.USER_COLUMNS} FROM users")),
+            old_users,
+            new_users,
+        ),
+        "knowledge": (
+            lambda: [{"title": t, "description": d} for t, d in _query("SELECT title, description FROM documents")],
+            lambda: read_models.knowledge(_query(KNOWLEDGE_SQL)),
+            old_knowledge,
+            new_knowledge,
+        ),
+    }
+    print(f"{n_users} users, {n_docs} documents")
+    print(f"{'':10} {'':6} {'resident MB':>12} {'per hit MB':>11} {'hit ms':>9}")
+    for name, (build_old, build_new, cached_old, cached_new) in rows.items():
+        for label, build, cached in (("old", build_old, cached_old), ("new", build_new, cached_new)):
+            per_hit, hit_ms = _measure(cached)
+            print(f"{name:10} {label:6} {_resident(build) / 1e6:12.1f} {per_hit / 1e6:11.2f} {hit_ms:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Read latency of the static tables: on-disk DB vs. the in-memory snapshot,
+while another thread keeps writing chat_history rows.
+
+Run from the project root:  python -m benchmarks.read_replica [documents]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import database
+import read_replica
+import storage
+
+
+def _populate(n_docs):
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany(
+        "INSERT INTO documents (title, description) VALUES (?, ?)",
+        ((f"Document {i}", "Lorem ipsum dolor sit amet. " * 20) for i in range(n_docs)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _chat_writer(stop):
+    conn = sqlite3.connect(database.DB_FILE, timeout=30)
+    while not stop.is_set():
+        conn.execute("INSERT INTO chat_history (user_id, role, message) VALUES (1, 'user', 'hi')")
+        conn.commit()
+        time.sleep(0.001)
+    conn.close()
+
+
+def _read_all(repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with read_replica.read_connection() as conn:
+            conn.execute("SELECT title, description FROM documents").fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    database.DB_FILE = storage.DB_FILE = read_replica.DB_FILE = os.path.join(tempfile.mkdtemp(), "replica.db")
+    database.setup_database()
+    _populate(n_docs)
+
+    stop = threading.Event()
+    writer = threading.Thread(target=_chat_writer, args=(stop,))
+    writer.start()
+    try:
+        read_replica.ENABLED = False
+        disk_ms = _read_all(200)
+        read_replica.ENABLED = True
+        replica_ms = _read_all(200)
+        # A write to a versioned table forces one refresh on the next stale check.
+        conn = sqlite3.connect(database.DB_FILE, timeout=30)
+        conn.execute("INSERT INTO documents (title, description) VALUES ('new', 'doc')")
+        conn.commit()
+        conn.close()
+        read_replica.invalidate()
+        _read_all(1)
+    finally:
+        stop.set()
+        writer.join()
+
+    stats = read_replica.replica_stats()
+    print(f"{n_docs} documents, concurrent chat_history writer")
+    print(f"on-disk read : {disk_ms:8.3f} ms")
+    print(f"snapshot read: {replica_ms:8.3f} ms")
+    print(f"refreshes    : {stats['refreshes']} (last {stats['last_refresh_ms']:.2f} ms, "
+          f"total {stats['total_refresh_ms']:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Replay real student questions from chat_history against retrieval and the answer caches.
+
+    # 1. Anonymized questions from a production DB copy (names, usernames,
+    #    mobiles, e-mails and long numbers are masked; only course/year kept)
+    python -m benchmarks.replay extract --db prod_copy.db --out questions.jsonl
+
+    # 2. Replay them against a knowledge-base snapshot with this version of the code
+    python -m benchmarks.replay run --questions questions.jsonl --db prod_copy.db --out before.json
+
+    # 3. ...change the code or use another snapshot, replay again, compare
+    python -m benchmarks.replay diff before.json after.json
+
+Each question goes through the same steps as ask_ai(): the web-answer cache
+check, rank_knowledge() + model_router.choose_route(), get_relevant_knowledge()
+and the DB-only prompt. Repeats of the same question and audience count as
+answer_cache hits (see ask_ai). Whether the DB-only answer would fail comes
+from one of three LLMs (--llm):
+
+- stub (default): fails when no entry matches at least STUB_MIN_COVERAGE of
+  the question's keywords. No network; a proxy for retrieval misses.
+- live: asks the real model with the DB-only prompt (GOOGLE_API_KEY), and
+  with --record FILE saves each verdict for later runs.
+- recorded: reuses the verdicts of a live run (--recorded FILE), so two code
+  versions can be compared on the same model answers.
+
+The snapshot is copied to a temporary directory (and migrated there), so it
+is never modified. Results are one JSON file: a summary (retrieval latency
+percentiles, match rate, cache hit rates, prompt-size distribution, DB-only
+failure rate) and one line per question with only deterministic fields, so
+two result files can be compared with `diff` or any text diff tool.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# stub LLM: the DB-only answer "succeeds" when the best entry covers this share of the keywords.
+STUB_MIN_COVERAGE = 0.5
+# Prompt-size histogram buckets (characters of DB_ONLY_PROMPT + knowledge + question).
+PROMPT_BUCKETS = (1_000, 4_000, 16_000, 64_000)
+# Name tokens that are also ordinary words in questions, never masked.
+_COMMON_WORDS = {"admin", "student", "user", "demo", "test", "teacher", "staff"}
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+_NUMBER_RE = re.compile(r"(?<!\w)\+?\d[\d\s-]{4,}\d(?!\w)")
+
+
+# ------------------ EXTRACT ------------------
+def _name_pattern(values):
+    """One case-insensitive regex for the given names / usernames, longest first."""
+    values = sorted({v for v in values if v and len(v) >= 3 and v.lower() not in _COMMON_WORDS}, key=len, reverse=True)
+    if not values:
+        return None
+    return re.compile(r"(?<!\w)(" + "|".join(re.escape(v) for v in values) + r")(?!\w)", re.IGNORECASE)
+
+
+def anonymize(text, names):
+    text = _EMAIL_RE.sub("<email>", text)
+    text = _NUMBER_RE.sub("<number>", text)
+    if names is not None:
+        text = names.sub("<name>", text)
+    return text.strip()
+
+
+def extract(db_path, out_path, limit=None):
+    """Write the user questions of db_path to out_path as JSON Lines, oldest first. Returns the count."""
+    from message_store import resolve_messages
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    users = conn.execute("SELECT id, name, username, mobile, course, year FROM users").fetchall()
+    names = _name_pattern(
+        [value for _, name, username, mobile, _, _ in users for value in (name, username, mobile)]
+        + [token for _, name, _, _, _, _ in users for token in (name or "").split()]
+    )
+    audience = {uid: (course, year) for uid, _, _, _, course, year in users}
+    # Snapshots older than message_store have no blob_hash column.
+    has_blobs = any(row[1] == "blob_hash" for row in conn.execute("PRAGMA table_info(chat_history)"))
+    rows = conn.execute(
+        f"SELECT user_id, message, {'blob_hash' if has_blobs else 'NULL'} FROM chat_history"
+        " WHERE role = 'user' ORDER BY id"
+        + (f" LIMIT {int(limit)}" if limit else "")
+    ).fetchall()
+    rows = resolve_messages(conn, rows, 1, 2)
+    conn.close()
+
+    seen_users = set()
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for user_id, message in rows:
+            question = anonymize(message or "", names)
+            if not question:
+                continue
+            course, year = audience.get(user_id, ("ALL", "ALL"))
+            out.write(json.dumps({
+                "id": count,
+                "question": question,
+                "course": course,
+                "year": year,
+                # The user had asked something before, so recent chat was sent with it.
+                "follow_up": user_id in seen_users,
+            }, ensure_ascii=False) + "\n")
+            seen_users.add(user_id)
+            count += 1
+    return count
+
+
+# ------------------ RUN ------------------
+def _load_questions(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _prepare_snapshot(db_path):
+    """Copy the snapshot into a temp dir, migrate the copy and make it the app's DB."""
+    workdir = tempfile.mkdtemp(prefix="svu_replay_")
+    shutil.copyfile(db_path, os.path.join(workdir, "college_data.db"))
+    os.chdir(workdir)
+    os.environ.pop("SVU_DATA_SERVICE", None)  # always replay in-process, on the copy
+    os.environ.pop("SVU_DATABASE_URL", None)
+    sys.path.insert(0, APP_DIR)
+
+    import database
+
+    if database.get_schema_version() != database.SCHEMA_VERSION:
+        database.init_db()  # migrate only: never re-seed a snapshot
+    return workdir
+
+
+class _Verdicts:
+    """DB-only verdicts (True = answered from the DB) from the stub, the live model or a recording."""
+
+    def __init__(self, mode, recorded=None, record=None):
+        self.mode = mode
+        self.recorded = {}
+        if recorded:
+            with open(recorded, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self.recorded[(item["question"], item["audience"])] = item["answered"]
+        self.record = record
+        self.new = {}
+
+    def __call__(self, item, prompt, n_keywords, matches):
+        import assistant
+
+        key = (item["question"], item["audience"])
+        if self.mode == "stub":
+            return bool(matches) and n_keywords > 0 and matches[0].matched / n_keywords >= STUB_MIN_COVERAGE
+        if self.mode == "recorded":
+            return self.recorded.get(key)
+        response = assistant._get_client().models.generate_content(model=assistant.MODEL, contents=prompt)
+        answered = assistant.SEARCH_WEB_MARKER not in (response.text or "")
+        self.new[key] = answered
+        return answered
+
+    def save(self):
+        if self.record and self.new:
+            with open(self.record, "w", encoding="utf-8") as f:
+                for (question, audience), answered in sorted(self.new.items()):
+                    f.write(json.dumps({"question": question, "audience": audience, "answered": answered},
+                                       ensure_ascii=False) + "\n")
+
+
+def _replay_one(item, verdicts, kb_version):
+    import assistant
+    import model_router
+    import web_cache
+
+    question, course, year = item["question"], item["course"], item["year"]
+    recent_context = "(earlier turns)" if item.get("follow_up") else ""
+    result = {"id": item["id"], "audience": item["audience"]}
+
+    cached = web_cache.get_cached_answer(question, item["audience"])
+    result["web_cache"] = bool(cached and cached["knowledge_version"] == kb_version)
+
+    start = time.perf_counter()
+    n_keywords, matches = assistant.rank_knowledge(question, course, year)
+    entries = assistant.get_relevant_knowledge(question, course, year)
+    retrieval_ms = (time.perf_counter() - start) * 1000
+    knowledge_text = assistant._knowledge_text(entries)
+
+    route = model_router.choose_route(question, n_keywords, matches, recent_context)
+    prompt = assistant.DB_ONLY_PROMPT + knowledge_text + "\n\n---\n\nQuestion: " + question
+    result.update({
+        "route": route.name,
+        "keywords": n_keywords,
+        "matched_entries": len(matches),
+        "top": [f"{m.entry.table[0]}{m.entry.id} {m.entry.title}" for m in matches[:3]],
+        "prompt_chars": len(prompt),
+        "db_only": True if route.name == model_router.FAQ else verdicts(item, prompt, n_keywords, matches),
+    })
+    return result, retrieval_ms
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def _summary(results, latencies, verdicts, workers, elapsed):
+    n = len(results)
+    prompts = [r["prompt_chars"] for r in results]
+    buckets = Counter()
+    for size in prompts:
+        label = next((f"<{b // 1000}k" for b in PROMPT_BUCKETS if size < b), f">={PROMPT_BUCKETS[-1] // 1000}k")
+        buckets[label] += 1
+    known = [r for r in results if r["db_only"] is not None]
+    return {
+        "questions": n,
+        "llm": verdicts.mode,
+        "workers": workers,
+        "questions_per_s": round(n / elapsed, 1) if elapsed else 0.0,
+        "retrieval_ms": {p: round(_percentile(latencies, v), 3) for p, v in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "match_rate": round(sum(r["matched_entries"] > 0 for r in results) / n, 4) if n else 0.0,
+        "answer_cache_hit_rate": round(sum(r["answer_cache"] for r in results) / n, 4) if n else 0.0,
+        "web_cache_hit_rate": round(sum(r["web_cache"] for r in results) / n, 4) if n else 0.0,
+        "routes": dict(sorted(Counter(r["route"] for r in results).items())),
+        "prompt_chars": {
+            "p50": _percentile(prompts, 50), "p95": _percentile(prompts, 95), "max": max(prompts, default=0),
+            "mean": round(statistics.mean(prompts), 1) if prompts else 0.0,
+            "histogram": [[label, buckets[label]] for label in sorted(buckets, key=_bucket_order)],
+        },
+        "db_only_failure_rate": round(sum(not r["db_only"] for r in known) / len(known), 4) if known else None,
+        "db_only_unknown": n - len(known),
+    }
+
+
+def _bucket_order(label):
+    return int(re.sub(r"\D", "", label)) + (0.5 if label.startswith(">") else 0)
+
+
+def run(questions_path, db_path, out_path, workers=4, llm="stub", recorded=None, record=None):
+    questions = _load_questions(questions_path)
+    _prepare_snapshot(os.path.abspath(db_path))
+
+    import assistant
+    import web_cache
+    from db_utils import audience_partition
+
+    if llm == "live" and assistant._get_client() is None:
+        raise SystemExit("--llm live needs GOOGLE_API_KEY")
+    verdicts = _Verdicts(llm, recorded, record)
+    kb_version = web_cache.knowledge_version()
+
+    # An answer_cache hit: the same question for the same audience was asked before.
+    seen = set()
+    for item in questions:
+        item["audience"] = "/".join(audience_partition(item["course"], item["year"]))
+        key = (item["question"], item["audience"], bool(item.get("follow_up")))
+        item["answer_cache"] = key in seen and not item.get("follow_up")
+        seen.add(key)
+
+    def replay(item):
+        result, ms = _replay_one(item, verdicts, kb_version)
+        result["answer_cache"] = item["answer_cache"]
+        return result, ms
+
+    # Warm the per-partition caches once, so latencies are steady-state retrieval.
+    for audience in {(q["course"], q["year"]) for q in questions}:
+        assistant.get_relevant_knowledge("warm up", *audience)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        done = list(pool.map(replay, questions))
+    elapsed = time.perf_counter() - start
+    verdicts.save()
+
+    results = sorted((r for r, _ in done), key=lambda r: r["id"])
+    summary = _summary(results, [ms for _, ms in done], verdicts, workers, elapsed)
+    summary["knowledge_version"] = kb_version
+    with open(out_path, "w", encoding="utf-8") as out:
+        out.write("{\n")
+        out.write(f' "summary": {json.dumps(summary, sort_keys=True, ensure_ascii=False)},\n')
+        out.write(' "results": [\n')
+        out.write(",\n".join(f"  {json.dumps(r, sort_keys=True, ensure_ascii=False)}" for r in results))
+        out.write("\n ]\n}\n")
+    return summary
+
+
+# ------------------ DIFF ------------------
+# Summary fields that depend on the machine rather than the code or data.
+_TIMING_FIELDS = {"retrieval_ms", "questions_per_s", "workers"}
+
+
+def _flatten(summary, prefix=""):
+    """{'prompt_chars.p50': 3184, 'prompt_chars.histogram.<1k': 20, ...}"""
+    flat = {}
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif key == "histogram":
+            flat.update({f"{prefix}{key}.{label}": count for label, count in value})
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def diff(before_path, after_path, limit=20):
+    """Print summary changes and the questions whose route, matches or DB-only verdict changed."""
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+
+    old_summary, new_summary = _flatten(before["summary"]), _flatten(after["summary"])
+    print(f"{'':28} {'before':>12} {'after':>12}")
+    for key in sorted(set(old_summary) | set(new_summary)):
+        old, new = old_summary.get(key), new_summary.get(key)
+        if old != new or key.split(".")[0] in _TIMING_FIELDS:
+            print(f"{key:28} {json.dumps(old):>12} {json.dumps(new):>12}")
+
+    old_results = {r["id"]: r for r in before["results"]}
+    changed = Counter()
+    shown = 0
+    for new in after["results"]:
+        old = old_results.get(new["id"])
+        if old is None:
+            continue
+        fields = [f for f in ("route", "db_only", "top", "matched_entries") if old.get(f) != new.get(f)]
+        for field in fields:
+            changed[field] += 1
+        if fields and shown < limit:
+            shown += 1
+            print(f"\n#{new['id']} ({new['audience']})")
+            for field in fields:
+                print(f"  {field}: {json.dumps(old.get(field))} -> {json.dumps(new.get(field))}")
+    print(f"\nchanged questions by field: {dict(changed) or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("extract", help="anonymized user questions from a DB -> JSON Lines")
+    p.add_argument("--db", default="college_data.db")
+    p.add_argument("--out", default="questions.jsonl")
+    p.add_argument("--limit", type=int)
+
+    p = sub.add_parser("run", help="replay questions against a DB snapshot")
+    p.add_argument("--questions", default="questions.jsonl")
+    p.add_argument("--db", default="college_data.db")
+    p.add_argument("--out", default="replay.json")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--llm", choices=("stub", "live", "recorded"), default="stub")
+    p.add_argument("--recorded", help="verdicts saved by a live run (--llm recorded)")
+    p.add_argument("--record", help="save live verdicts here (--llm live)")
+
+    p = sub.add_parser("diff", help="compare two run results")
+    p.add_argument("before")
+    p.add_argument("after")
+    p.add_argument("--limit", type=int, default=20, help="changed questions to print")
+
+    args = parser.parse_args()
+    if args.command == "extract":
+        print(f"{extract(args.db, args.out, args.limit)} question(s) written to {args.out}")
+    elif args.command == "run":
+        if args.llm == "recorded" and not args.recorded:
+            parser.error("--llm recorded needs --recorded FILE")
+        out = os.path.abspath(args.out)
+        summary = run(os.path.abspath(args.questions), args.db, out, args.workers, args.llm,
+                      args.recorded and os.path.abspath(args.recorded), args.record and os.path.abspath(args.record))
+        print(json.dumps(summary, indent=1, sort_keys=True))
+        print(f"results written to {out}")
+    else:
+        diff(args.before, args.after, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the per-rerun identity restore paths.
+
+Old path: derive the cookie key + decrypt cookies, then look the user up in
+SQLite (what app.py and the Profile view did on every rerun).
+New path: resolve an opaque session token through session_store's LRU.
+
+Run from the project root:  python -m benchmarks.session_restore
+"""
+import os
+import sqlite3
+import tempfile
+import time
+
+import database
+import session_store
+import storage
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _cookie_key_derivation():
+    # streamlit-cookies-manager derives its Fernet key with PBKDF2 per manager instance.
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=b"0" * 16, iterations=390000)
+    kdf.derive(b"svu-mca-super-secret-key")
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    database.DB_FILE = session_store.DB_FILE = storage.DB_FILE = os.path.join(tmp, "bench.db")
+    database.init_db()
+    database.seed_default_users()
+
+    conn = sqlite3.connect(database.DB_FILE)
+    user_id = conn.execute("SELECT id FROM users WHERE username='student'").fetchone()[0]
+    conn.close()
+
+    def old_lookup():
+        c = sqlite3.connect(database.DB_FILE)
+        c.execute("SELECT * FROM users WHERE id=?", (user_id,)).fetchone()
+        c.close()
+
+    token = session_store.create_session(user_id)
+
+    def cold_resolve():
+        session_store.forget_user(user_id)
+        session_store.resolve_session(token)
+
+    print(f"cookie key derivation : {_timeit(_cookie_key_derivation, 5):8.3f} ms")
+    print(f"get_user_by_id        : {_timeit(old_lookup, 2000):8.3f} ms")
+    print(f"resolve_session (cold): {_timeit(cold_resolve, 2000):8.3f} ms")
+    session_store.resolve_session(token)
+    print(f"resolve_session (warm): {_timeit(lambda: session_store.resolve_session(token), 20000):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
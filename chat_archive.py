@@ -0,0 +1,206 @@
+"""
+Retention for chat_history: per user, the newest HOT_MESSAGES messages and
+everything younger than HOT_DAYS stay in the table. Older rows are moved,
+BATCH_SIZE at a time, into append-only gzip JSON Lines segments, one per month:
+
+    chat_archive/chat_history-2025-03.jsonl.gz
+
+Each batch is appended as its own gzip member, so `gzip -dc` of a segment
+still reads every row in order. chat_archive_index (in the local
+college_data.db) records where each member starts and how long it is for
+every user in it. Looking up one user's archive therefore only decompresses
+the members that user appears in.
+
+A batch is written and fsynced, then indexed, then deleted from
+chat_history. A crash in between leaves the rows hot and they are archived
+again later, replacing their earlier index rows; until then lookups
+deduplicate by id, so nothing is lost or shown twice.
+Runs nightly as the maintenance task "chat_archive" (maintenance.py).
+
+    SVU_CHAT_HOT_MESSAGES   newest messages kept per user (default 200)
+    SVU_CHAT_HOT_DAYS       days kept regardless of count (default 90)
+    SVU_CHAT_ARCHIVE_DIR    where segments are written (default chat_archive)
+"""
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import storage
+from data_service import remote
+from message_store import resolve_messages
+
+DB_FILE = "college_data.db"
+
+HOT_MESSAGES = int(os.getenv("SVU_CHAT_HOT_MESSAGES", "200"))
+HOT_DAYS = float(os.getenv("SVU_CHAT_HOT_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("SVU_CHAT_ARCHIVE_DIR", "chat_archive")
+BATCH_SIZE = 1000
+
+# Rows older than the cutoff that are not among their user's newest HOT_MESSAGES
+# (the correlated subquery walks idx_chat_history_user), after id ? in id order.
+_ELIGIBLE_SQL = """
+    SELECT c.id, c.user_id, c.role, c.message, c.timestamp, c.blob_hash
+    FROM chat_history c
+    WHERE c.id > ? AND c.timestamp < ?
+      AND c.id <= (SELECT h.id FROM chat_history h WHERE h.user_id = c.user_id
+                   ORDER BY h.id DESC LIMIT 1 OFFSET ?)
+    ORDER BY c.id
+    LIMIT ?
+"""
+
+
+def _segment_name(timestamp):
+    return f"chat_history-{timestamp[:7]}.jsonl.gz"
+
+
+def _append_members(rows):
+    """
+    Append rows of (id, user_id, role, message, timestamp) to their month's
+    segment, one gzip member per segment. Returns chat_archive_index rows.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    by_segment = {}
+    for row in rows:
+        by_segment.setdefault(_segment_name(row[4]), []).append(row)
+    entries = []
+    for segment, members in by_segment.items():
+        members.sort(key=lambda r: (r[1], r[0]))
+        payload = "".join(
+            json.dumps({"id": i, "user_id": u, "role": r, "message": m, "timestamp": t}, ensure_ascii=False) + "\n"
+            for i, u, r, m, t in members
+        )
+        data = gzip.compress(payload.encode("utf-8"), 6)
+        with open(os.path.join(ARCHIVE_DIR, segment), "ab") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        per_user = {}
+        for row in members:
+            per_user.setdefault(row[1], []).append(row)
+        for user_id, user_rows in per_user.items():
+            entries.append((user_id, segment, offset, len(data), user_rows[0][0], user_rows[-1][0],
+                            min(r[4] for r in user_rows), max(r[4] for r in user_rows), len(user_rows)))
+    return entries
+
+
+def archive_old_messages(conn, deadline):
+    """
+    Move chat rows past the retention policy into the archive until none are
+    left or the deadline passes. conn is the maintenance connection to the local
+    DB (autocommit), which holds chat_archive_index. Returns a detail string.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=HOT_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    archived, segments, last = 0, set(), 0
+    while time.monotonic() < deadline:
+        with storage.connect() as src:
+            rows = src.execute(_ELIGIBLE_SQL, (last, cutoff, HOT_MESSAGES, BATCH_SIZE)).fetchall()
+            rows = resolve_messages(src, rows, 3, 5)
+        if not rows:
+            break
+        last = rows[-1][0]
+        entries = _append_members(rows)
+        conn.execute("BEGIN IMMEDIATE")
+        # Rows a crash left hot after their batch was indexed: that index row is
+        # replaced by this batch's, so nothing is counted or read twice.
+        conn.executemany("DELETE FROM chat_archive_index WHERE user_id = ? AND first_id = ?",
+                         [(row[1], row[0]) for row in rows])
+        conn.executemany(
+            "INSERT INTO chat_archive_index (user_id, segment, byte_offset, byte_length, first_id, last_id,"
+            " first_at, last_at, row_count) VALUES (?,?,?,?,?,?,?,?,?)",
+            entries,
+        )
+        conn.execute("COMMIT")
+        ids = [row[0] for row in rows]
+        with storage.connect() as dst:
+            dst.execute(f"DELETE FROM chat_history WHERE id IN ({','.join('?' * len(ids))})", ids)
+        archived += len(rows)
+        segments.update(entry[1] for entry in entries)
+    return f"{archived} messages archived into {len(segments)} segments"
+
+
+def iter_archived(conn, user_id=None, start=None, end=None):
+    """
+    Yield archived rows (id, user_id, role, message, timestamp) of one user or
+    everyone, with start <= timestamp < end when given, one segment member at a
+    time (oldest month first, by user within a member). conn is a storage
+    connection to chat_history: rows re-archived after a crash are yielded
+    once, and rows still in chat_history not at all (the caller reads those).
+    """
+    where, params = [], []
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if start:
+        where.append("last_at >= ?")
+        params.append(start)
+    if end:
+        where.append("first_at < ?")
+        params.append(end)
+    local = sqlite3.connect(DB_FILE)
+    members = local.execute(
+        "SELECT DISTINCT segment, byte_offset, byte_length FROM chat_archive_index"
+        + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY segment, byte_offset",
+        params,
+    ).fetchall()
+    local.close()
+    seen, current = set(), None
+    for segment, offset, length in members:
+        if segment != current:
+            # A re-archived row lands in the same month's segment, so duplicates are found per segment.
+            seen, current = set(), segment
+        with open(os.path.join(ARCHIVE_DIR, segment), "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        rows = []
+        for line in data.decode("utf-8").splitlines():
+            item = json.loads(line)
+            if item["id"] in seen or (user_id is not None and item["user_id"] != user_id):
+                continue
+            if (start and item["timestamp"] < start) or (end and item["timestamp"] >= end):
+                continue
+            seen.add(item["id"])
+            rows.append((item["id"], item["user_id"], item["role"], item["message"], item["timestamp"]))
+        ids = [row[0] for row in rows]
+        hot = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            hot.update(r[0] for r in conn.execute(
+                f"SELECT id FROM chat_history WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        yield from (row for row in rows if row[0] not in hot)
+
+
+@remote
+def archived_count(user_id):
+    """Number of a user's messages in the archive (from the index, no files are read)."""
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute("SELECT COALESCE(SUM(row_count), 0) FROM chat_archive_index WHERE user_id = ?",
+                       (user_id,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+@remote
+def archived_chat_log(user_id):
+    """Returns [(role, message, timestamp), ...] of a user's archived messages, oldest first."""
+    conn = sqlite3.connect(DB_FILE)
+    members = conn.execute(
+        "SELECT DISTINCT segment, byte_offset, byte_length FROM chat_archive_index WHERE user_id = ?",
+        (user_id,),
+    ).fetchall()
+    conn.close()
+    found = {}
+    for segment, offset, length in members:
+        with open(os.path.join(ARCHIVE_DIR, segment), "rb") as f:
+            f.seek(offset)
+            data = gzip.decompress(f.read(length))
+        for line in data.decode("utf-8").splitlines():
+            item = json.loads(line)
+            if item["user_id"] == user_id:
+                found[item["id"]] = (item["role"], item["message"], item["timestamp"])
+    return [found[i] for i in sorted(found)]
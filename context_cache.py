@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+
+# Opt-in: SVU_CONTEXT_CACHE=1 registers the DB-only system prompt plus a
+# partition's knowledge once with Gemini (explicit context caching) and
+# references it by handle instead of re-sending it on every question.
+ENABLED = os.getenv("SVU_CONTEXT_CACHE", "0") == "1"
+# Lifetime requested for each provider-side cache.
+CACHE_TTL_SECONDS = int(os.getenv("SVU_CONTEXT_CACHE_TTL", "3600"))
+# Re-create this long before the provider would expire the handle.
+_EXPIRY_MARGIN_SECONDS = 60
+
+# (model, partition) -> {"version", "name", "expires_at"}; name None = creation failed
+_handles = {}
+# (model, partition) -> Event set once the thread creating that handle has published it.
+_creating = {}
+_lock = threading.Lock()
+_stats = {"created": 0, "failed": 0, "requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+
+def get_handle(client, model, partition, version, build_prefix):
+    """
+    Return the provider cache name for (model, partition) at knowledge `version`,
+    creating it from build_prefix() when missing, stale or about to expire.
+    Returns None when caching is off or the provider rejected the prefix
+    (e.g. below the minimum cacheable size); callers then send the full prompt.
+
+    The provider call runs outside _lock: one thread creates a given key while
+    others asking for it wait on its Event, and every other key, record_usage()
+    and cache_stats() carry on meanwhile.
+    """
+    if not ENABLED:
+        return None
+    key = (model, partition)
+    while True:
+        with _lock:
+            handle = _handles.get(key)
+            if handle and handle["version"] == version and handle["expires_at"] > time.time():
+                return handle["name"]
+            in_flight = _creating.get(key)
+            if in_flight is None:
+                in_flight = _creating[key] = threading.Event()
+                break
+        in_flight.wait()
+
+    name = None
+    try:
+        from google.genai import types
+
+        try:
+            cache = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"svu-{partition}-v{version}",
+                    system_instruction=build_prefix(),
+                    ttl=f"{CACHE_TTL_SECONDS}s",
+                ),
+            )
+            name = cache.name
+            created = True
+        except Exception:
+            # Don't retry on every question; try again when the version changes or TTL passes.
+            created = False
+        with _lock:
+            old = _handles.get(key)
+            _stats["created" if created else "failed"] += 1
+            _handles[key] = {
+                "version": version,
+                "name": name,
+                "expires_at": time.time() + CACHE_TTL_SECONDS - _EXPIRY_MARGIN_SECONDS,
+            }
+    finally:
+        with _lock:
+            _creating.pop(key, None)
+        in_flight.set()
+    if old and old["name"] and old["name"] != name:
+        _delete_quietly(client, old["name"])
+    return name
+
+
+def drop_handle(model, partition):
+    """Forget a handle the provider no longer accepts (expired or deleted remotely)."""
+    with _lock:
+        _handles.pop((model, partition), None)
+
+
+def _delete_quietly(client, name):
+    try:
+        client.caches.delete(name=name)
+    except Exception:
+        pass
+
+
+def record_usage(response):
+    """Add a response's prompt / cached token counts to the savings stats."""
+    usage = getattr(response, "usage_metadata", None)
+    with _lock:
+        _stats["requests"] += 1
+        _stats["prompt_tokens"] += getattr(usage, "prompt_token_count", None) or 0
+        _stats["cached_tokens"] += getattr(usage, "cached_content_token_count", None) or 0
+
+
+def cache_stats():
+    """Handles created/failed and prompt vs. cached token totals since start."""
+    with _lock:
+        return dict(_stats, enabled=ENABLED, handles=len(_handles))
@@ -0,0 +1,231 @@
+"""
+Optional local data service that owns college_data.db.
+
+Run one service per machine and point every Streamlit replica at it:
+
+    python data_service.py --socket /tmp/svu-data.sock
+    SVU_DATA_SERVICE=/tmp/svu-data.sock streamlit run app.py
+
+Functions in db_utils, auth, session_store, web_cache and model_router are
+decorated with @remote. Without SVU_DATA_SERVICE they run in-process as
+before. With it, each call is sent over a Unix socket and runs inside the
+service:
+
+- reads run on a small thread pool and hit the service's own Streamlit
+  caches, which are shared by all replicas;
+- writes run on a single writer thread, so replicas no longer fight over
+  SQLite's write lock. save_chat calls that arrive while a batch is being
+  written are grouped into the next transaction (db_utils.save_chats).
+
+Frames are length-prefixed pickles. The socket is created with mode 0600, so
+only the app's own user can connect.
+"""
+import argparse
+import asyncio
+import functools
+import importlib
+import os
+import pickle
+import socket
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SOCKET_PATH = os.getenv("SVU_DATA_SERVICE")
+# Reads served concurrently by the service.
+READ_THREADS = int(os.getenv("SVU_DATA_SERVICE_READ_THREADS", "4"))
+# Modules whose @remote functions the service exposes.
+SERVED_MODULES = ("db_utils", "auth", "session_store", "web_cache", "model_router", "maintenance",
+                  "chat_archive")
+
+_HEADER = struct.Struct("!I")
+
+# "module.function" -> True for writes, False for reads
+_REGISTRY = {}
+_STATS = "data_service.stats"
+_is_server = False
+_local = threading.local()
+
+
+def remote(fn=None, *, write=False, after=None):
+    """
+    Route calls to the data service when SVU_DATA_SERVICE is set.
+    write=True runs the call on the service's single writer thread; after is
+    called in the calling process once a remote write returns, to drop its
+    own local caches.
+    """
+    if fn is None:
+        return functools.partial(remote, write=write, after=after)
+
+    name = f"{fn.__module__}.{fn.__name__}"
+    _REGISTRY[name] = write
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not SOCKET_PATH or _is_server:
+            return fn(*args, **kwargs)
+        result = _call(name, args, kwargs)
+        if after is not None:
+            after()
+        return result
+
+    return wrapper
+
+
+# ------------------ CLIENT ------------------
+def _send(sock, payload):
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("data service closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _connection():
+    sock = getattr(_local, "sock", None)
+    if sock is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(SOCKET_PATH)
+        _local.sock = sock
+    return sock
+
+
+def _call(name, args, kwargs):
+    """One request/response round-trip on this thread's connection (reconnects once)."""
+    for attempt in (1, 2):
+        sock = _connection()
+        try:
+            _send(sock, (name, args, kwargs))
+            (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+            ok, value = pickle.loads(_recv_exact(sock, size))
+            break
+        except (ConnectionError, OSError):
+            sock.close()
+            _local.sock = None
+            if attempt == 2:
+                raise
+    if not ok:
+        raise value
+    return value
+
+
+def service_stats():
+    """Request counters of the running data service (reads, writes, chat batches)."""
+    return _call(_STATS, (), {})
+
+
+# ------------------ SERVER ------------------
+class _Service:
+    def __init__(self):
+        self.readers = ThreadPoolExecutor(READ_THREADS, thread_name_prefix="svu-read")
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="svu-write")
+        self.chat_queue = []
+        self.flushing = False
+        self.stats = {"reads": 0, "writes": 0, "chat_batches": 0, "chats": 0}
+
+    @staticmethod
+    def _resolve(name):
+        # Use the module attribute so the st.cache_* wrappers above @remote apply.
+        module, attr = name.rsplit(".", 1)
+        return getattr(sys.modules[module], attr)
+
+    async def dispatch(self, name, args, kwargs):
+        if name == _STATS:
+            return dict(self.stats)
+        if name not in _REGISTRY:
+            raise LookupError(f"{name} is not served by the data service")
+        loop = asyncio.get_running_loop()
+        if name == "db_utils.save_chat" and not kwargs:
+            return await self._queue_chat(args)
+        fn = functools.partial(self._resolve(name), *args, **kwargs)
+        if _REGISTRY[name]:
+            self.stats["writes"] += 1
+            return await loop.run_in_executor(self.writer, fn)
+        self.stats["reads"] += 1
+        return await loop.run_in_executor(self.readers, fn)
+
+    async def _queue_chat(self, args):
+        future = asyncio.get_running_loop().create_future()
+        self.chat_queue.append((args, future))
+        if not self.flushing:
+            self.flushing = True
+            asyncio.ensure_future(self._flush_chats())
+        return await future
+
+    async def _flush_chats(self):
+        # Whatever queues up while one batch is being written goes into the next.
+        save_chats = sys.modules["db_utils"].save_chats
+        loop = asyncio.get_running_loop()
+        while self.chat_queue:
+            batch, self.chat_queue = self.chat_queue, []
+            try:
+                await loop.run_in_executor(self.writer, save_chats, [args for args, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["chat_batches"] += 1
+            self.stats["chats"] += len(batch)
+            for _, future in batch:
+                future.set_result(None)
+        self.flushing = False
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                    name, args, kwargs = pickle.loads(await reader.readexactly(size))
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    reply = (True, await self.dispatch(name, args, kwargs))
+                except Exception as e:
+                    reply = (False, e)
+                data = pickle.dumps(reply, protocol=pickle.HIGHEST_PROTOCOL)
+                writer.write(_HEADER.pack(len(data)) + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(path):
+    global _is_server
+    _is_server = True
+    for module in SERVED_MODULES:
+        importlib.import_module(module)
+    from database import setup_database
+
+    setup_database()
+    if os.path.exists(path):
+        os.unlink(path)
+    service = _Service()
+    old_umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(service.handle, path=path)
+    finally:
+        os.umask(old_umask)
+    import maintenance
+
+    maintenance.start(in_service=True)
+    print(f"SVU data service listening on {path}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SVU-MCA local data service")
+    parser.add_argument("--socket", default=SOCKET_PATH or "/tmp/svu-data.sock")
+    # Run the importable module, not __main__, so it shares the registry and
+    # server flag with the @remote decorators in the served modules.
+    import data_service
+
+    asyncio.run(data_service.serve(parser.parse_args().socket))
@@ -2,14 +2,51 @@ import json
 import sqlite3
 from pathlib import Path
 
+import message_store
+import read_models
+import storage
+from passwords import hash_password
+
 DB_FILE = "college_data.db"
 SEED_JSON = Path(__file__).parent / "Data" / "seed_data.json"
 
+# Bump whenever init_db() or a migration changes the schema. Stored in
+# PRAGMA user_version so startup can skip setup on an up-to-date DB.
+SCHEMA_VERSION = 17
+
+# data_versions counters bumped by writes to each table. 'static' tells
+# read_replica.py its snapshot is stale; 'knowledge' changes whenever the AI
+# knowledge base (documents + notifications) does.
+VERSIONED_TABLES = {
+    "users": ("static",),
+    "documents": ("static", "knowledge"),
+    "notifications": ("static", "knowledge"),
+    "synonyms": ("static", "knowledge"),
+}
+
+# Every row written to these tables is logged in knowledge_changes, so each
+# process can drop just the cached knowledge and answers that depended on it
+# (db_utils.sync_knowledge_changes). Updates only count when these columns change.
+CHANGE_LOGGED_COLUMNS = "title, description, audience_course, audience_year, published_at, expires_at, priority"
+
+# login_names holds each user's username and mobile, normalized like this, so
+# auth.login() is one primary-key lookup. Kept in sync by triggers on users.
+LOGIN_NAME_SQL = "lower(trim({}))"
+
+# Documents and notices keep a short `preview` and the `body_length` of their
+# description for list views, and its distinct words in `keywords`
+# (read_models.body_keywords) for retrieval; the description itself is stored
+# as the last column (see _move_column_last).
+SPLIT_BODY_TABLES = ("documents", "notifications")
+PREVIEW_CHARS = 300
+
 
 def init_db():
     """Create all required tables if they do not exist."""
     conn = sqlite3.connect(DB_FILE)
     cur = conn.cursor()
+    # Only takes effect on a new, empty DB; older files are converted by maintenance.py.
+    cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
 
     cur.execute(
         """
@@ -31,6 +68,11 @@ def init_db():
         CREATE TABLE IF NOT EXISTS documents (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT,
+            audience_course TEXT DEFAULT 'ALL',
+            audience_year TEXT DEFAULT 'ALL',
+            preview TEXT,
+            body_length INTEGER,
+            keywords TEXT,
             description TEXT
         )
         """
@@ -41,11 +83,36 @@ def init_db():
         CREATE TABLE IF NOT EXISTS notifications (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT,
+            audience_course TEXT DEFAULT 'ALL',
+            audience_year TEXT DEFAULT 'ALL',
+            published_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            expires_at DATETIME,
+            priority INTEGER DEFAULT 0,
+            preview TEXT,
+            body_length INTEGER,
+            keywords TEXT,
             description TEXT
         )
         """
     )
 
+    # Expired notices are moved here so the live table stays small
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notifications_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT,
+            description TEXT,
+            audience_course TEXT,
+            audience_year TEXT,
+            published_at DATETIME,
+            expires_at DATETIME,
+            priority INTEGER,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS chat_history (
@@ -53,13 +120,197 @@ def init_db():
             user_id INTEGER,
             role TEXT,
             message TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            blob_hash TEXT
         )
         """
     )
 
+    # Long chat messages, stored once per distinct text (see message_store.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS message_blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT,
+            body BLOB,
+            size INTEGER
+        )
+        """
+    )
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_user ON chat_history(user_id, id)")
+
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            token TEXT PRIMARY KEY,
+            user_id INTEGER,
+            created_at REAL,
+            expires_at REAL,
+            revoked INTEGER DEFAULT 0
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)")
+
+    # Long-TTL cache of web-grounded answers (see web_cache.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS web_answers (
+            question_key TEXT,
+            question TEXT,
+            answer TEXT,
+            sources TEXT,
+            knowledge_version INTEGER,
+            audience TEXT,
+            created_at REAL,
+            PRIMARY KEY (question_key, audience)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS web_call_log (
+            day TEXT PRIMARY KEY,
+            calls INTEGER DEFAULT 0,
+            cache_hits INTEGER DEFAULT 0
+        )
+        """
+    )
+
+    # Admin-editable query synonyms: term -> space-separated expansions (see query_expansion.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS synonyms (
+            term TEXT PRIMARY KEY,
+            expansions TEXT
+        )
+        """
+    )
+
+    # Per-day answer latency / tokens / cost by route (see model_router.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS model_route_log (
+            day TEXT,
+            route TEXT,
+            model TEXT,
+            calls INTEGER DEFAULT 0,
+            total_ms REAL DEFAULT 0,
+            input_tokens INTEGER DEFAULT 0,
+            output_tokens INTEGER DEFAULT 0,
+            cost_usd REAL DEFAULT 0,
+            PRIMARY KEY (day, route, model)
+        )
+        """
+    )
+
+    # Last run of each background maintenance task (see maintenance.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            task TEXT PRIMARY KEY,
+            status TEXT,
+            started_at REAL,
+            finished_at REAL,
+            duration_ms REAL,
+            detail TEXT,
+            runner TEXT,
+            requested_at REAL
+        )
+        """
+    )
+    _add_missing_columns(conn, "maintenance_runs", {"requested_at": "REAL"})
+
+    # Where archived chat messages are: one row per user per gzip member (see chat_archive.py)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_archive_index (
+            user_id INTEGER,
+            segment TEXT,
+            byte_offset INTEGER,
+            byte_length INTEGER,
+            first_id INTEGER,
+            last_id INTEGER,
+            first_at DATETIME,
+            last_at DATETIME,
+            row_count INTEGER
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_archive_user ON chat_archive_index(user_id, first_id)")
+
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER DEFAULT 0
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT,
+            item_id INTEGER,
+            old_course TEXT,
+            old_year TEXT,
+            new_course TEXT,
+            new_year TEXT
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS login_names (
+            login TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_login_names_user ON login_names(user_id)")
+    cur.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('static', 0)")
+    cur.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('knowledge', 0)")
+
     _migrate_add_username(conn)
+    _migrate_web_answers_key(conn)
+    _add_missing_columns(conn, "chat_history", {"blob_hash": "TEXT"})
+    # Lets maintenance find message blobs no chat row uses without a scan per blob.
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_blob ON chat_history(blob_hash) WHERE blob_hash IS NOT NULL"
+    )
+    # ALTER TABLE can't add a CURRENT_TIMESTAMP default, so backfill instead.
+    _add_missing_columns(conn, "notifications", {
+        "published_at": "DATETIME",
+        "expires_at": "DATETIME",
+        "priority": "INTEGER DEFAULT 0",
+    })
+    cur.execute("UPDATE notifications SET published_at = CURRENT_TIMESTAMP WHERE published_at IS NULL")
+    for table in SPLIT_BODY_TABLES:
+        _add_missing_columns(conn, table, {
+            "audience_course": "TEXT DEFAULT 'ALL'",
+            "audience_year": "TEXT DEFAULT 'ALL'",
+            "preview": "TEXT",
+            "body_length": "INTEGER",
+            "keywords": "TEXT",
+        })
+        _move_column_last(conn, table, "description")
+        cur.execute(
+            f"UPDATE {table} SET preview = {_preview_sql('description')}, body_length = length(description)"
+            " WHERE body_length IS NULL"
+        )
+        _fill_keywords(conn, table)
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_audience ON {table}(audience_course, audience_year)"
+        )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_expiry ON notifications(expires_at)")
+    _create_preview_triggers(conn)
+    _create_version_triggers(conn)
+    _create_change_triggers(conn)
+    _create_login_name_triggers(conn)
     conn.commit()
+    message_store.migrate_chat_history(conn)
     conn.close()
 
 
@@ -73,6 +324,404 @@ def _migrate_add_username(conn):
         cur.execute("UPDATE users SET username = mobile WHERE username IS NULL")
 
 
+def _add_missing_columns(conn, table, columns):
+    """Add each {name: definition} column that table does not have yet (migration for existing DBs)."""
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cur.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+def _migrate_web_answers_key(conn):
+    """Re-key web_answers from question_key alone to (question_key, audience) (migration for existing DBs)."""
+    cur = conn.cursor()
+    pk = [row[1] for row in cur.execute("PRAGMA table_info(web_answers)") if row[5]]
+    if pk != ["question_key"]:
+        return
+    cur.execute("ALTER TABLE web_answers RENAME TO web_answers_old")
+    cur.execute(
+        """
+        CREATE TABLE web_answers (
+            question_key TEXT,
+            question TEXT,
+            answer TEXT,
+            sources TEXT,
+            knowledge_version INTEGER,
+            audience TEXT,
+            created_at REAL,
+            PRIMARY KEY (question_key, audience)
+        )
+        """
+    )
+    cur.execute("INSERT INTO web_answers SELECT question_key, question, answer, sources, knowledge_version,"
+                " audience, created_at FROM web_answers_old")
+    cur.execute("DROP TABLE web_answers_old")
+
+
+def _move_column_last(conn, table, column):
+    """
+    Rebuild table with `column` as its last column (migration for existing DBs).
+
+    SQLite stores a row's values in column order and spills a long value into
+    overflow pages, so reading any column declared after a long description
+    walks those pages. With the description last, ids, titles and previews are
+    read from the row's own page.
+    """
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table})")
+    info = cur.fetchall()
+    if info[-1][1] == column:
+        return
+    ordered = [row for row in info if row[1] != column] + [row for row in info if row[1] == column]
+    definitions = []
+    for _, name, col_type, _, default, pk in ordered:
+        if pk:
+            definitions.append(f"{name} {col_type} PRIMARY KEY AUTOINCREMENT")
+        else:
+            definitions.append(f"{name} {col_type}" + (f" DEFAULT {default}" if default is not None else ""))
+    names = ", ".join(row[1] for row in ordered)
+    # Keep AUTOINCREMENT from reusing ids of rows deleted before the rebuild.
+    seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+
+    cur.execute(f"DROP TABLE IF EXISTS {table}_rebuild")
+    cur.execute(f"CREATE TABLE {table}_rebuild ({', '.join(definitions)})")
+    cur.execute(f"INSERT INTO {table}_rebuild ({names}) SELECT {names} FROM {table}")
+    cur.execute(f"DROP TABLE {table}")
+    cur.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+    if seq:
+        cur.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], table))
+
+
+def _fill_keywords(conn, table):
+    """Fill keywords for rows that have none (migration for existing DBs)."""
+    cur = conn.cursor()
+    rows = cur.execute(
+        f"SELECT id, description FROM {table} WHERE keywords IS NULL AND description IS NOT NULL"
+    ).fetchall()
+    cur.executemany(
+        f"UPDATE {table} SET keywords = ? WHERE id = ?",
+        ((read_models.body_keywords(description), row_id) for row_id, description in rows),
+    )
+
+
+def _preview_sql(expr):
+    """SQL for the first PREVIEW_CHARS characters of expr, with '…' when cut."""
+    return (
+        f"CASE WHEN length({expr}) > {PREVIEW_CHARS}"
+        f" THEN rtrim(substr({expr}, 1, {PREVIEW_CHARS})) || '…' ELSE {expr} END"
+    )
+
+
+# keywords is computed in Python, so a description changed without it is marked
+# stale (NULL); retrieval then reads the description itself (db_utils._partition_bodies).
+_STALE_KEYWORDS_SQL = (
+    "CASE WHEN NEW.description IS NOT OLD.description AND NEW.keywords IS OLD.keywords"
+    " THEN NULL ELSE NEW.keywords END"
+)
+
+
+def _create_preview_triggers(conn):
+    """
+    Keep preview / body_length in step with description on every write path,
+    and mark keywords stale when the description changes without them (recreated on upgrade).
+    """
+    cur = conn.cursor()
+    for table in SPLIT_BODY_TABLES:
+        for event, suffix, keywords in (
+            ("INSERT", "insert", "NEW.keywords"),
+            ("UPDATE OF description", "update", _STALE_KEYWORDS_SQL),
+        ):
+            trigger = f"trg_{table}_{suffix}_preview"
+            cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cur.execute(
+                f"""
+                CREATE TRIGGER {trigger}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE {table}
+                    SET preview = {_preview_sql('NEW.description')}, body_length = length(NEW.description),
+                        keywords = {keywords}
+                    WHERE id = NEW.id;
+                END
+                """
+            )
+
+
+def _create_change_triggers(conn):
+    """Log writes to documents / notices (with old and new audience) and synonyms in knowledge_changes."""
+    cur = conn.cursor()
+    log = "INSERT INTO knowledge_changes (table_name, item_id, old_course, old_year, new_course, new_year) VALUES"
+    for table in SPLIT_BODY_TABLES:
+        for event, row in (
+            ("INSERT", "NEW.id, NULL, NULL, NEW.audience_course, NEW.audience_year"),
+            (f"UPDATE OF {CHANGE_LOGGED_COLUMNS}",
+             "NEW.id, OLD.audience_course, OLD.audience_year, NEW.audience_course, NEW.audience_year"),
+            ("DELETE", "OLD.id, OLD.audience_course, OLD.audience_year, NULL, NULL"),
+        ):
+            trigger = f"trg_{table}_{event.split()[0].lower()}_change"
+            cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cur.execute(f"CREATE TRIGGER {trigger} AFTER {event} ON {table} BEGIN {log} ('{table}', {row}); END")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        trigger = f"trg_synonyms_{event.lower()}_change"
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cur.execute(
+            f"CREATE TRIGGER {trigger} AFTER {event} ON synonyms BEGIN {log} ('synonyms', NULL, NULL, NULL, NULL, NULL); END"
+        )
+
+
+def _login_name_inserts(row, conflict=""):
+    """INSERTs of row's (NEW / users) username and mobile into login_names; the mobile is skipped when equal."""
+    username, mobile = LOGIN_NAME_SQL.format(f"{row}.username"), LOGIN_NAME_SQL.format(f"{row}.mobile")
+    source = "" if row == "NEW" else " FROM users"
+    return (
+        f"INSERT {conflict}INTO login_names (login, user_id) SELECT {username}, {row}.id{source}"
+        f" WHERE {username} <> ''",
+        f"INSERT {conflict}INTO login_names (login, user_id) SELECT {mobile}, {row}.id{source}"
+        f" WHERE {mobile} <> '' AND {mobile} IS NOT {username}",
+    )
+
+
+def _create_login_name_triggers(conn):
+    """
+    Keep login_names in step with users. A username or mobile another user
+    already signs in with makes the write fail (IntegrityError), case-insensitively.
+    Existing users are backfilled; on a clash the older account keeps the name.
+    """
+    cur = conn.cursor()
+    inserts = "; ".join(_login_name_inserts("NEW"))
+    for trigger, event, body in (
+        ("trg_users_login_insert", "INSERT", inserts),
+        ("trg_users_login_update", "UPDATE OF username, mobile",
+         f"DELETE FROM login_names WHERE user_id = OLD.id; {inserts}"),
+        ("trg_users_login_delete", "DELETE", "DELETE FROM login_names WHERE user_id = OLD.id"),
+    ):
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cur.execute(f"CREATE TRIGGER {trigger} AFTER {event} ON users BEGIN {body}; END")
+    for sql in _login_name_inserts("users", "OR IGNORE "):
+        cur.execute(sql + " ORDER BY users.id")
+
+
+def _create_version_triggers(conn):
+    """Bump the data_versions counters listed in VERSIONED_TABLES on any write (recreated on upgrade)."""
+    cur = conn.cursor()
+    for table, names in VERSIONED_TABLES.items():
+        in_names = ", ".join(f"'{name}'" for name in names)
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            trigger = f"trg_{table}_{event.lower()}_version"
+            cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cur.execute(
+                f"""
+                CREATE TRIGGER {trigger}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name IN ({in_names});
+                END
+                """
+            )
+
+
+POSTGRES_TABLES = """
+CREATE TABLE IF NOT EXISTS users (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name TEXT,
+    username TEXT UNIQUE,
+    mobile TEXT UNIQUE,
+    password TEXT,
+    role TEXT,
+    course TEXT,
+    year TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    title TEXT,
+    audience_course TEXT DEFAULT 'ALL',
+    audience_year TEXT DEFAULT 'ALL',
+    preview TEXT,
+    body_length INTEGER,
+    keywords TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS notifications (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    title TEXT,
+    audience_course TEXT DEFAULT 'ALL',
+    audience_year TEXT DEFAULT 'ALL',
+    published_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    expires_at TEXT,
+    priority INTEGER DEFAULT 0,
+    preview TEXT,
+    body_length INTEGER,
+    keywords TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    id BIGINT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    audience_course TEXT,
+    audience_year TEXT,
+    published_at TEXT,
+    expires_at TEXT,
+    priority INTEGER,
+    archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS synonyms (
+    term TEXT PRIMARY KEY,
+    expansions TEXT
+);
+CREATE TABLE IF NOT EXISTS message_blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT,
+    body BYTEA,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS chat_history (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id BIGINT REFERENCES users(id) ON DELETE CASCADE,
+    role TEXT,
+    message TEXT,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    blob_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version BIGINT DEFAULT 0
+);
+INSERT INTO data_versions (name, version) VALUES ('static', 0), ('knowledge', 0) ON CONFLICT DO NOTHING;
+CREATE TABLE IF NOT EXISTS login_names (
+    login TEXT PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_login_names_user ON login_names(user_id);
+CREATE TABLE IF NOT EXISTS knowledge_changes (
+    seq BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    table_name TEXT,
+    item_id BIGINT,
+    old_course TEXT,
+    old_year TEXT,
+    new_course TEXT,
+    new_year TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chat_history_user ON chat_history(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_chat_history_blob ON chat_history(blob_hash) WHERE blob_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_documents_audience ON documents(audience_course, audience_year);
+CREATE INDEX IF NOT EXISTS idx_notifications_audience ON notifications(audience_course, audience_year);
+CREATE INDEX IF NOT EXISTS idx_notifications_expiry ON notifications(expires_at);
+"""
+
+
+def init_postgres(conn):
+    """
+    PostgreSQL counterpart of init_db() for the tables in storage.STORAGE_TABLES
+    (plus data_versions), run through storage.py. Timestamps are the same UTC
+    'YYYY-MM-DD HH:MM:SS' text as in SQLite; the preview and version triggers
+    are plpgsql functions. Returns True if the schema was new.
+    """
+    cur = conn.cursor()
+    created = cur.execute("SELECT to_regclass('users') IS NULL").fetchone()[0]
+    cur.execute(POSTGRES_TABLES)
+    for table in SPLIT_BODY_TABLES:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS keywords TEXT")
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION svu_set_preview() RETURNS trigger AS $$
+        BEGIN
+            NEW.preview := {_preview_sql('NEW.description')};
+            NEW.body_length := length(NEW.description);
+            IF TG_OP = 'UPDATE' AND NEW.description IS DISTINCT FROM OLD.description
+                    AND NEW.keywords IS NOT DISTINCT FROM OLD.keywords THEN
+                NEW.keywords := NULL;
+            END IF;
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION svu_bump_versions() RETURNS trigger AS $$
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE name = ANY (TG_ARGV);
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute(
+        """
+        CREATE OR REPLACE FUNCTION svu_log_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'synonyms' THEN
+                INSERT INTO knowledge_changes (table_name) VALUES ('synonyms');
+            ELSIF TG_OP = 'INSERT' THEN
+                INSERT INTO knowledge_changes (table_name, item_id, new_course, new_year)
+                VALUES (TG_TABLE_NAME, NEW.id, NEW.audience_course, NEW.audience_year);
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO knowledge_changes (table_name, item_id, old_course, old_year, new_course, new_year)
+                VALUES (TG_TABLE_NAME, NEW.id, OLD.audience_course, OLD.audience_year,
+                        NEW.audience_course, NEW.audience_year);
+            ELSE
+                INSERT INTO knowledge_changes (table_name, item_id, old_course, old_year)
+                VALUES (TG_TABLE_NAME, OLD.id, OLD.audience_course, OLD.audience_year);
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+        """
+    )
+    username, mobile = LOGIN_NAME_SQL.format("NEW.username"), LOGIN_NAME_SQL.format("NEW.mobile")
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION svu_index_login() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                DELETE FROM login_names WHERE user_id = OLD.id;
+            END IF;
+            IF {username} <> '' THEN
+                INSERT INTO login_names (login, user_id) VALUES ({username}, NEW.id);
+            END IF;
+            IF {mobile} <> '' AND {mobile} IS DISTINCT FROM {username} THEN
+                INSERT INTO login_names (login, user_id) VALUES ({mobile}, NEW.id);
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute("DROP TRIGGER IF EXISTS trg_users_login ON users")
+    cur.execute(
+        "CREATE TRIGGER trg_users_login AFTER INSERT OR UPDATE OF username, mobile ON users"
+        " FOR EACH ROW EXECUTE FUNCTION svu_index_login()"
+    )
+    for column in ("username", "mobile"):
+        login = LOGIN_NAME_SQL.format(column)
+        cur.execute(
+            f"INSERT INTO login_names (login, user_id) SELECT {login}, id FROM users WHERE {login} <> ''"
+            " ORDER BY id ON CONFLICT (login) DO NOTHING"
+        )
+    cur.execute("DROP TRIGGER IF EXISTS trg_synonyms_change ON synonyms")
+    cur.execute(
+        "CREATE TRIGGER trg_synonyms_change AFTER INSERT OR UPDATE OR DELETE ON synonyms"
+        " FOR EACH STATEMENT EXECUTE FUNCTION svu_log_change()"
+    )
+    for table in SPLIT_BODY_TABLES:
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_change ON {table}")
+        cur.execute(
+            f"CREATE TRIGGER trg_{table}_change AFTER INSERT OR UPDATE OF {CHANGE_LOGGED_COLUMNS} OR DELETE"
+            f" ON {table} FOR EACH ROW EXECUTE FUNCTION svu_log_change()"
+        )
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_preview ON {table}")
+        cur.execute(
+            f"CREATE TRIGGER trg_{table}_preview BEFORE INSERT OR UPDATE OF description ON {table}"
+            " FOR EACH ROW EXECUTE FUNCTION svu_set_preview()"
+        )
+    for table, names in VERSIONED_TABLES.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_{table}_version ON {table}")
+        cur.execute(
+            f"CREATE TRIGGER trg_{table}_version AFTER INSERT OR UPDATE OR DELETE ON {table}"
+            f" FOR EACH STATEMENT EXECUTE FUNCTION svu_bump_versions({', '.join(repr(n) for n in names)})"
+        )
+    return created
+
+
 def seed_default_users():
     """
     Insert default admin and student users if they do not already exist.
@@ -84,9 +733,11 @@ def seed_default_users():
         username/mobile: student
         password: student123
     """
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
+    with storage.connect() as conn:
+        _seed_default_users(conn.cursor())
 
+
+def _seed_default_users(cur):
     # Admin user
     cur.execute("SELECT id FROM users WHERE username = ? OR mobile = ?", ("admin", "admin"))
     if cur.fetchone() is None:
@@ -95,7 +746,7 @@ def seed_default_users():
             INSERT INTO users (name, username, mobile, password, role, course, year)
             VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
-            ("Admin User", "admin", "9999999999", "admin123", "admin", "ALL", "N/A"),
+            ("Admin User", "admin", "9999999999", hash_password("admin123"), "admin", "ALL", "N/A"),
         )
 
     # Student user
@@ -106,18 +757,16 @@ def seed_default_users():
             INSERT INTO users (name, username, mobile, password, role, course, year)
             VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
-            ("Demo Student", "student", "8888888888", "student123", "student", "MCA", "1st"),
+            ("Demo Student", "student", "8888888888", hash_password("student123"), "student", "MCA", "1st"),
         )
 
-    conn.commit()
-    conn.close()
-
 
 def seed_from_json():
     """
     Load seed data from Data/seed_data.json and insert into DB.
     Users are inserted only if mobile does not already exist.
     Documents and notifications are appended (safe to run multiple times for testing).
+    Synonyms are inserted only if the term does not already exist.
     """
     if not SEED_JSON.exists():
         seed_default_users()
@@ -126,19 +775,42 @@ def seed_from_json():
     with open(SEED_JSON, encoding="utf-8") as f:
         data = json.load(f)
 
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
+    with storage.connect() as conn:
+        _seed(conn.cursor(), data)
 
+
+def _seed(cur, data):
+    # Optional "course" / "year" keys scope an entry to one audience; default is everyone.
     for doc in data.get("documents", []):
         cur.execute(
-            "INSERT INTO documents (title, description) VALUES (?, ?)",
-            (doc["title"], doc["description"]),
+            "INSERT INTO documents (title, description, keywords, audience_course, audience_year)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (doc["title"], doc["description"], read_models.body_keywords(doc["description"]),
+             doc.get("course", "ALL").upper(), doc.get("year", "ALL")),
         )
 
     for notif in data.get("notifications", []):
         cur.execute(
-            "INSERT INTO notifications (title, description) VALUES (?, ?)",
-            (notif["title"], notif["description"]),
+            """
+            INSERT INTO notifications
+                (title, description, keywords, audience_course, audience_year, expires_at, priority)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                notif["title"],
+                notif["description"],
+                read_models.body_keywords(notif["description"]),
+                notif.get("course", "ALL").upper(),
+                notif.get("year", "ALL"),
+                notif.get("expires_at"),
+                notif.get("priority", 0),
+            ),
+        )
+
+    for term, expansions in data.get("synonyms", {}).items():
+        cur.execute(
+            "INSERT INTO synonyms (term, expansions) VALUES (?, ?) ON CONFLICT (term) DO NOTHING",
+            (term.lower(), " ".join(expansions).lower()),
         )
 
     for user in data.get("users", []):
@@ -154,27 +826,45 @@ def seed_from_json():
                     user["name"],
                     username,
                     user["mobile"],
-                    user["password"],
+                    hash_password(user["password"]),
                     user["role"],
                     user["course"],
                     user["year"],
                 ),
             )
 
-    conn.commit()
+
+def get_schema_version():
+    """Return the schema version recorded in the DB file (0 for a new DB)."""
+    conn = sqlite3.connect(DB_FILE)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
     conn.close()
+    return version
 
 
-def setup_database():
+def setup_database(force=False):
     """
     Public helper to initialize DB and seed data.
     Uses Data/seed_data.json if present, otherwise falls back to default users.
-    Safe to call multiple times (idempotent).
+    Skipped when the DB already has the current schema version, unless force=True;
+    an older DB is only migrated, not re-seeded.
     """
+    version = get_schema_version()
+    if not force and version == SCHEMA_VERSION:
+        return False
     init_db()
-    seed_from_json()
+    fresh = version == 0
+    if storage.DIALECT == "postgres":
+        # The local file only holds sessions / caches; seed when the shared schema is new.
+        fresh = storage.init_postgres()
+    if force or fresh:
+        seed_from_json()
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.close()
+    return True
 
 
 if __name__ == "__main__":
-    setup_database()
+    setup_database(force=True)
     print("✅ Database initialized and seeded from Data/seed_data.json")
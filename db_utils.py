@@ -1,202 +1,471 @@
-import sqlite3
+import threading
+from contextlib import contextmanager
 
 import streamlit as st
 
-DB_FILE = "college_data.db"
+import answer_cache
+import read_models
+import storage
+from data_service import remote
+from message_store import put_message, resolve_messages
+from passwords import hash_password
+from read_replica import invalidate as invalidate_replica
+from session_store import forget_user, revoke_user_sessions
+from storage import read_connection
+
+# Audience value meaning "every course" / "every year" for documents and notices.
+ALL_AUDIENCE = "ALL"
+# Notices that are published and not yet expired.
+ACTIVE_NOTICE_SQL = "published_at <= CURRENT_TIMESTAMP AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)"
+# knowledge_changes rows kept; a process that falls further behind drops all its knowledge caches.
+KEEP_CHANGES = 10_000
+# Tables whose rows are knowledge entries (knowledge_changes.table_name besides "synonyms").
+SPLIT_TABLES = ("documents", "notifications")
 
 # ------------------ CHAT ------------------
+@remote(write=True)
 def save_chat(user_id, role, message):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            role TEXT,
-            message TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    cur.execute("INSERT INTO chat_history (user_id, role, message) VALUES (?,?,?)",
-                (user_id, role, message))
-    conn.commit()
-    conn.close()
+    save_chats([(user_id, role, message)])
+
+def save_chats(rows):
+    """Insert many (user_id, role, message) rows in one transaction (data service batching)."""
+    with storage.connect() as conn:
+        cur = conn.cursor()
+        stored = [(user_id, role, *put_message(cur, message)) for user_id, role, message in rows]
+        cur.executemany("INSERT INTO chat_history (user_id, role, message, blob_hash) VALUES (?,?,?,?)", stored)
 
+@remote
 def load_chat_history(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            role TEXT,
-            message TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    """Returns [(role, message), ...] for a user, oldest first."""
+    with storage.connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT role, message, blob_hash FROM chat_history WHERE user_id=? ORDER BY id", (user_id,))
+        return resolve_messages(conn, cur.fetchall(), 1, 2)
+
+@remote
+def load_chat_log(user_id):
+    """Returns [(role, message, timestamp), ...] for a user, oldest first (history views)."""
+    with storage.connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT role, message, timestamp, blob_hash FROM chat_history WHERE user_id=? ORDER BY id ASC",
+            (user_id,),
         )
-    """)
-    cur.execute("SELECT role, message FROM chat_history WHERE user_id=? ORDER BY id", (user_id,))
-    data = cur.fetchall()
-    conn.close()
-    return data
+        return resolve_messages(conn, cur.fetchall(), 1, 3)
 
 # ------------------ USERS ------------------
-@st.cache_data(ttl=30)
+@st.cache_resource(ttl=30)
+@remote
 def get_all_users():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            username TEXT UNIQUE,
-            mobile TEXT UNIQUE,
-            password TEXT,
-            role TEXT DEFAULT 'student',
-            course TEXT,
-            year TEXT
-        )
-    """)
-    cur.execute("SELECT * FROM users")
-    data = cur.fetchall()
-    conn.close()
-    return data
+    """Shared, read-only tuple of read_models.UserRow (no passwords)."""
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {read_models.USER_COLUMNS} FROM users")
+        return read_models.users(cur.fetchall())
 
+@remote
 def get_user_by_id(user_id):
     """Fetch a single user by id. Returns (id, name, username, mobile, password, role, course, year) or None."""
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE id=?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM users WHERE id=?", (user_id,))
+        return cur.fetchone()
 
+@remote(write=True, after=get_all_users.clear)
 def update_user(user_id, name, username, mobile, course, year):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
     try:
-        cur.execute("UPDATE users SET name=?, username=?, mobile=?, course=?, year=? WHERE id=?",
-                    (name, username, mobile, course, year, user_id))
-        conn.commit()
-        get_all_users.clear()
-        return True
-    except sqlite3.IntegrityError:
+        with storage.connect() as conn:
+            conn.execute("UPDATE users SET name=?, username=?, mobile=?, course=?, year=? WHERE id=?",
+                         (name, username, mobile, course, year, user_id))
+    except storage.IntegrityError:
         return False
-    finally:
-        conn.close()
-
-def update_password(user_id, new_password):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("UPDATE users SET password=? WHERE id=?", (new_password, user_id))
-    conn.commit()
-    conn.close()
     get_all_users.clear()
+    invalidate_replica()
+    forget_user(user_id)
+    return True
+
+def update_password(user_id, new_password, keep_session=None):
+    """
+    Set a new password and sign the user out everywhere except the session
+    token keep_session. Hashed in the caller, like auth.register_user().
+    """
+    _store_password(user_id, hash_password(new_password), keep_session)
+
+@remote(write=True, after=get_all_users.clear)
+def _store_password(user_id, password, keep_session):
+    with storage.connect() as conn:
+        conn.execute("UPDATE users SET password=? WHERE id=?", (password, user_id))
+    get_all_users.clear()
+    invalidate_replica()
+    revoke_user_sessions(user_id, keep=keep_session)
 
+@remote(write=True, after=get_all_users.clear)
 def delete_user(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM users WHERE id=?", (user_id,))
-    conn.commit()
-    conn.close()
+    with storage.connect() as conn:
+        conn.execute("DELETE FROM users WHERE id=?", (user_id,))
     get_all_users.clear()
+    invalidate_replica()
+    revoke_user_sessions(user_id)
 
 # ------------------ DOCUMENTS / NOTICES ------------------
-@st.cache_data(ttl=30)
+# Every write below takes an optional cursor. Without one it commits and
+# invalidates on its own; inside `with knowledge_batch() as cur:` all changes
+# share one transaction and one cache invalidation.
+
+@contextmanager
+def knowledge_batch():
+    """One transaction + one cache invalidation for many document/notice changes."""
+    with storage.connect() as conn:
+        cur = conn.cursor()
+        yield cur
+        _prune_changes(cur)
+    _knowledge_changed()
+
+def _prune_changes(cur):
+    cur.execute("DELETE FROM knowledge_changes WHERE seq <= (SELECT MAX(seq) FROM knowledge_changes) - ?",
+                (KEEP_CHANGES,))
+
+@contextmanager
+def _knowledge_write(cur):
+    if cur is not None:
+        yield cur
+    else:
+        with knowledge_batch() as own_cur:
+            yield own_cur
+
+@st.cache_resource(ttl=30)
+@remote
 def get_all_documents():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            description TEXT
-        )
-    """)
-    cur.execute("SELECT * FROM documents")
-    data = cur.fetchall()
-    conn.close()
-    return data
-
-def add_document(title, description):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO documents (title, description) VALUES (?,?)",
-                (title, description))
-    conn.commit()
-    conn.close()
-    get_all_documents.clear()
-    load_knowledge.clear()
-
-def update_document(doc_id, title, description):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("UPDATE documents SET title=?, description=? WHERE id=?",
-                (title, description, doc_id))
-    conn.commit()
-    conn.close()
-    get_all_documents.clear()
-    load_knowledge.clear()
-
-def delete_document(doc_id):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM documents WHERE id=?", (doc_id,))
-    conn.commit()
-    conn.close()
-    get_all_documents.clear()
-    load_knowledge.clear()
+    """Shared, read-only tuple of read_models.DocumentRow."""
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {read_models.DOCUMENT_COLUMNS} FROM documents")
+        return read_models.documents(cur.fetchall())
 
-@st.cache_data(ttl=30)
+@remote(write=True, after=lambda: _knowledge_changed())
+def add_document(title, description, course=ALL_AUDIENCE, year=ALL_AUDIENCE, cur=None):
+    course, year = entry_audience(course, year)
+    with _knowledge_write(cur) as cur:
+        cur.execute("INSERT INTO documents (title, description, keywords, audience_course, audience_year)"
+                    " VALUES (?,?,?,?,?)", (title, description, read_models.body_keywords(description), course, year))
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def update_document(doc_id, title, description, course=ALL_AUDIENCE, year=ALL_AUDIENCE, cur=None):
+    course, year = entry_audience(course, year)
+    with _knowledge_write(cur) as cur:
+        cur.execute("UPDATE documents SET title=?, description=?, keywords=?, audience_course=?, audience_year=?"
+                    " WHERE id=?", (title, description, read_models.body_keywords(description), course, year, doc_id))
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def delete_document(doc_id, cur=None):
+    with _knowledge_write(cur) as cur:
+        cur.execute("DELETE FROM documents WHERE id=?", (doc_id,))
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def replace_documents(rows):
+    """
+    Replace every document with rows of (title, description[, course[, year]])
+    in a single transaction (CSV import).
+    """
+    with knowledge_batch() as cur:
+        cur.execute("DELETE FROM documents")
+        for row in rows:
+            add_document(*row, cur=cur)
+
+@st.cache_resource(ttl=30)
+@remote
 def get_all_notifications():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM notifications")
-    data = cur.fetchall()
-    conn.close()
-    return data
-
-def delete_notification(notif_id):
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM notifications WHERE id=?", (notif_id,))
-    conn.commit()
-    conn.close()
-    get_all_notifications.clear()
-    load_knowledge.clear()
+    """Shared, read-only tuple of read_models.NoticeRow, most important first."""
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {read_models.NOTICE_COLUMNS} FROM notifications ORDER BY priority DESC, id")
+        return read_models.notices(cur.fetchall())
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def add_notification(title, description, course=ALL_AUDIENCE, year=ALL_AUDIENCE,
+                     expires_at=None, priority=0, published_at=None, cur=None):
+    """expires_at / published_at are 'YYYY-MM-DD HH:MM:SS' (UTC) or None (never / now)."""
+    course, year = entry_audience(course, year)
+    with _knowledge_write(cur) as cur:
+        cur.execute("""
+            INSERT INTO notifications
+                (title, description, keywords, audience_course, audience_year, published_at, expires_at, priority)
+            VALUES (?,?,?,?,?,COALESCE(?, CURRENT_TIMESTAMP),?,?)
+        """, (title, description, read_models.body_keywords(description), course, year, published_at, expires_at,
+              priority))
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def update_notification(notif_id, title, description, course=ALL_AUDIENCE, year=ALL_AUDIENCE,
+                        expires_at=None, priority=0, cur=None):
+    course, year = entry_audience(course, year)
+    with _knowledge_write(cur) as cur:
+        cur.execute("""
+            UPDATE notifications
+            SET title=?, description=?, keywords=?, audience_course=?, audience_year=?, expires_at=?, priority=?
+            WHERE id=?
+        """, (title, description, read_models.body_keywords(description), course, year, expires_at, priority,
+              notif_id))
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def archive_expired_notifications():
+    """Move expired notices into notifications_archive. Returns how many were moved."""
+    with storage.connect() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO notifications_archive
+                (id, title, description, audience_course, audience_year, published_at, expires_at, priority)
+            SELECT id, title, description, audience_course, audience_year, published_at, expires_at, priority
+            FROM notifications WHERE expires_at <= CURRENT_TIMESTAMP
+            ON CONFLICT (id) DO UPDATE SET
+                title = excluded.title, description = excluded.description,
+                audience_course = excluded.audience_course, audience_year = excluded.audience_year,
+                published_at = excluded.published_at, expires_at = excluded.expires_at,
+                priority = excluded.priority, archived_at = CURRENT_TIMESTAMP
+        """)
+        cur.execute("DELETE FROM notifications WHERE expires_at <= CURRENT_TIMESTAMP")
+        moved = cur.rowcount
+        _prune_changes(cur)
+    if moved:
+        _knowledge_changed()
+    return moved
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def delete_notification(notif_id, cur=None):
+    with _knowledge_write(cur) as cur:
+        cur.execute("DELETE FROM notifications WHERE id=?", (notif_id,))
+
+_BATCHABLE_WRITES = ("add_document", "update_document", "delete_document",
+                     "add_notification", "update_notification", "delete_notification")
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def apply_knowledge_changes(changes):
+    """
+    Run [(function name, args, kwargs), ...] of the writes above inside one
+    knowledge_batch(). Use this instead of knowledge_batch() from the app so
+    the batch also goes through the data service when one is configured.
+    """
+    with knowledge_batch() as cur:
+        for name, args, kwargs in changes:
+            if name not in _BATCHABLE_WRITES:
+                raise ValueError(f"{name} cannot be batched")
+            globals()[name](*args, cur=cur, **kwargs)
+
+# ------------------ SYNONYMS ------------------
+@st.cache_resource(ttl=60)
+@remote
+def get_synonyms():
+    """Shared ((term, (expansion, ...)), ...) pairs used by query_expansion, sorted by term."""
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT term, expansions FROM synonyms ORDER BY term")
+        return tuple((term, tuple((expansions or "").split())) for term, expansions in cur.fetchall())
+
+@remote(write=True, after=lambda: _knowledge_changed())
+def replace_synonyms(pairs):
+    """
+    Replace the whole synonym map with (term, expansions) pairs in one
+    transaction. Terms are single words; terms and expansions are lowercased,
+    and expansions may be separated by spaces or commas. Other rows are skipped.
+    """
+    rows = {}
+    for term, expansions in pairs:
+        term = (term or "").strip().lower()
+        words = (expansions or "").replace(",", " ").lower().split()
+        if term and len(term.split()) == 1 and words:
+            rows[term] = " ".join(words)
+    with knowledge_batch() as cur:
+        cur.execute("DELETE FROM synonyms")
+        cur.executemany("INSERT INTO synonyms (term, expansions) VALUES (?, ?)", rows.items())
 
 # ------------------ LOAD KNOWLEDGE FOR AI ------------------
-@st.cache_data(ttl=60)
-def load_knowledge():
-    """
-    Returns all documents and notifications as a list of dicts
-    [{'title': ..., 'description': ...}, ...]
-    """
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    # Ensure tables exist
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            description TEXT
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS notifications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            description TEXT
+def audience_partition(course, year):
+    """
+    Normalize a student's (course, year) into the partition key used to scope
+    documents and notices. Staff (course 'ALL' or empty) see every partition.
+    """
+    course, year = entry_audience(course, year)
+    if course == ALL_AUDIENCE:
+        return ALL_AUDIENCE, ALL_AUDIENCE
+    return course, year
+
+def entry_audience(course, year):
+    """
+    Normalize the (course, year) a document or notice is written for. Unlike
+    audience_partition(), a year-only entry (ALL, '1st') keeps its year.
+    """
+    return (course or "").strip().upper() or ALL_AUDIENCE, (year or "").strip() or ALL_AUDIENCE
+
+def _knowledge_changed():
+    """Drop the admin lists and, via the change log, exactly the cached knowledge / answers a write affected."""
+    get_all_documents.clear()
+    get_all_notifications.clear()
+    invalidate_replica()
+    sync_knowledge_changes()
+
+def _visible_to(partition, course, year):
+    """Whether an entry for (course, year) is in partition's knowledge (see load_knowledge)."""
+    p_course, p_year = partition
+    return p_course == ALL_AUDIENCE or (course in (ALL_AUDIENCE, p_course) and year in (ALL_AUDIENCE, p_year))
+
+@remote
+def knowledge_changes_since(seq):
+    """
+    (oldest kept seq, latest seq, changes) where changes are the knowledge_changes
+    rows after seq: (table, id, old course, old year, new course, new year, text),
+    text being the entry's lowercased title + body keywords now (None if deleted).
+    """
+    with storage.connect() as conn:
+        oldest, latest = conn.execute("SELECT MIN(seq), MAX(seq) FROM knowledge_changes").fetchone()
+        if seq is None or latest is None or latest <= seq:
+            return oldest, latest or 0, []
+        rows = conn.execute(
+            "SELECT table_name, item_id, old_course, old_year, new_course, new_year"
+            " FROM knowledge_changes WHERE seq > ? ORDER BY seq",
+            (seq,),
+        ).fetchall()
+        texts = {}
+        for table in SPLIT_TABLES:
+            ids = list({row[1] for row in rows if row[0] == table and row[4] is not None})
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                for item_id, title, body in conn.execute(
+                    f"SELECT id, title, COALESCE(keywords, description) FROM {table}"
+                    f" WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ):
+                    texts[(table, item_id)] = f"{title or ''} {body or ''}".lower()
+    return oldest, latest, [row + (texts.get((row[0], row[1])),) for row in rows]
+
+_changes_lock = threading.Lock()
+_changes_seen = {"seq": None}
+# Partitions whose knowledge index this process has built -> that index's postings (see _partition_index).
+_cached_partitions = {}
+
+def _forget_partitions(partitions):
+    for partition in partitions:
+        _partition_knowledge.clear(*partition)
+        _partition_index.clear(*partition)
+        _cached_partitions.pop(partition, None)
+
+def sync_knowledge_changes():
+    """
+    Apply the document / notice / synonym changes any process made since the
+    last call: drop the cached knowledge of the partitions that can see a
+    changed entry, and (answer_cache.invalidate) the answers that depended on it.
+    Synonym changes, the first call in a process and falling behind the kept
+    log drop everything. Returns the number of changes applied.
+    """
+    with _changes_lock:
+        seen = _changes_seen["seq"]
+        oldest, latest, changes = knowledge_changes_since(seen)
+        _changes_seen["seq"] = latest
+        if seen is not None and not changes and (oldest is None or oldest <= seen + 1):
+            return 0
+        invalidate_replica()
+        if seen is None or oldest > seen + 1 or any(change[0] == "synonyms" for change in changes):
+            _forget_partitions(set(_cached_partitions))
+            _partition_knowledge.clear()
+            _partition_index.clear()
+            get_synonyms.clear()
+            answer_cache.clear()
+            return len(changes)
+        for table, item_id, old_course, old_year, new_course, new_year, text in changes:
+            audiences = [(c, y) for c, y in ((old_course, old_year), (new_course, new_year)) if c is not None]
+            known = _cached_partitions.keys() | answer_cache.partitions()
+            affected = {p for p in known if any(_visible_to(p, c, y) for c, y in audiences)}
+            _forget_partitions(affected & _cached_partitions.keys())
+            answer_cache.invalidate((table, item_id), affected, text)
+        return len(changes)
+
+def knowledge_seq():
+    """Last knowledge_changes seq this process has applied (None before the first sync)."""
+    return _changes_seen["seq"]
+
+def load_knowledge(course=ALL_AUDIENCE, year=ALL_AUDIENCE):
+    """
+    Returns the documents and currently active notifications visible to one
+    course/year partition (its own entries plus those for everyone) as a shared,
+    read-only tuple of read_models.KnowledgeEntry(table, id, title, preview,
+    body_length); fetch full descriptions with get_descriptions().
+    The default returns everything.
+    """
+    return _partition_knowledge(*audience_partition(course, year))
+
+def _partition_where(course, year):
+    """(WHERE clause, params) selecting the documents / notices visible to a normalized partition."""
+    if course == ALL_AUDIENCE:
+        return " WHERE 1 = 1", ()
+    return " WHERE audience_course IN ('ALL', ?) AND (audience_year = 'ALL' OR audience_year = ?)", (course, year)
+
+@st.cache_resource(ttl=60)
+@remote
+def _partition_knowledge(course, year):
+    """load_knowledge() for a normalized partition, cached per partition so changes can drop just that one."""
+    where, params = _partition_where(course, year)
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 'documents', id, title, preview, body_length FROM documents" + where, params)
+        rows = cur.fetchall()
+
+        # Only active notices, most important first
+        cur.execute(
+            "SELECT 'notifications', id, title, preview, body_length FROM notifications" + where
+            + " AND " + ACTIVE_NOTICE_SQL + " ORDER BY priority DESC, published_at DESC",
+            params,
         )
-    """)
-    knowledge = []
+        rows += cur.fetchall()
+
+    return read_models.knowledge(rows)
 
-    cur.execute("SELECT title, description FROM documents")
-    for row in cur.fetchall():
-        knowledge.append({"title": row[0], "description": row[1]})
+@remote
+def get_descriptions(table, ids):
+    """{id: full description} for the given documents / notifications ids (missing ids are left out)."""
+    if table not in ("documents", "notifications"):
+        raise ValueError(f"not a knowledge table: {table}")
+    ids = list(ids)
+    found = {}
+    with read_connection() as conn:
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            found.update(conn.execute(
+                f"SELECT id, description FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+    return found
 
-    cur.execute("SELECT title, description FROM notifications")
-    for row in cur.fetchall():
-        knowledge.append({"title": row[0], "description": row[1]})
+@remote
+def _partition_bodies(course, year):
+    """
+    {(table, id): keywords} for a partition's documents and active notices, to
+    index and drop; the description stands in where keywords is stale (NULL).
+    """
+    where, params = _partition_where(course, year)
+    with read_connection() as conn:
+        rows = conn.execute(
+            "SELECT 'documents', id, COALESCE(keywords, description) FROM documents" + where, params
+        ).fetchall()
+        rows += conn.execute(
+            "SELECT 'notifications', id, COALESCE(keywords, description) FROM notifications" + where
+            + " AND " + ACTIVE_NOTICE_SQL, params
+        ).fetchall()
+    return {(table, item_id): body for table, item_id, body in rows}
+
+def load_knowledge_index(course=ALL_AUDIENCE, year=ALL_AUDIENCE):
+    """
+    Keyword index for one partition, built on first use in each process from
+    load_knowledge(course, year) and the entries' keywords columns (title and
+    every word of the body, not just the preview): read_models.KnowledgeIndex(entries,
+    postings), where postings maps word -> (entry position, ...).
+    """
+    return _partition_index(*audience_partition(course, year))
+
+def loaded_postings():
+    """
+    Postings (word -> entry positions) of every partition index this process
+    has built, in build order; query_expansion takes its vocabulary from these.
+    """
+    return tuple(_cached_partitions.values())
 
-    conn.close()
-    return knowledge
+@st.cache_resource(ttl=60)
+def _partition_index(course, year):
+    index = read_models.knowledge_index(_partition_knowledge(course, year), _partition_bodies(course, year))
+    _cached_partitions[(course, year)] = index.postings
+    return index
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from datetime import date, timedelta
+
+import chat_archive
+import storage
+from message_store import resolve_messages
+
+# Rows pulled from the cursor per step; memory stays bounded by this batch.
+BATCH_SIZE = 1000
+# The admin page's Download button holds the whole file in memory (Streamlit
+# reads it to serve it), so larger exports are left to the command line.
+UI_MAX_ROWS = int(os.getenv("SVU_EXPORT_UI_MAX_ROWS", "200000"))
+
+# table -> (columns, SELECT ... FROM). Users never export the password column.
+EXPORTS = {
+    "chat_history": (
+        ("id", "user_id", "role", "message", "timestamp"),
+        "SELECT id, user_id, role, message, timestamp, blob_hash FROM chat_history",
+    ),
+    "users": (
+        ("id", "name", "username", "mobile", "role", "course", "year"),
+        "SELECT id, name, username, mobile, role, course, year FROM users",
+    ),
+    "documents": (
+        ("id", "title", "description", "audience_course", "audience_year"),
+        "SELECT id, title, description, audience_course, audience_year FROM documents",
+    ),
+}
+
+
+def _date_bounds(start_date=None, end_date=None):
+    """('YYYY-MM-DD' start or None, exclusive end or None) for an inclusive date range."""
+    end = str(date.fromisoformat(str(end_date)) + timedelta(days=1)) if end_date else None
+    return (str(start_date) if start_date else None), end
+
+
+def _hot_query(table, user_id=None, start_date=None, end_date=None):
+    """(SELECT, params) for the rows of an export table still in the database."""
+    sql = EXPORTS[table][1]
+    where, params = [], []
+    if table == "chat_history":
+        start, end = _date_bounds(start_date, end_date)
+        if user_id is not None:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if start:
+            where.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            where.append("timestamp < ?")
+            params.append(end)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, params
+
+
+def count_rows(table, **filters):
+    """
+    Rows an export would contain; for chat_history the archived part is read
+    from chat_archive_index, so rows a crashed archive run left both archived
+    and hot are counted twice until the next run re-archives them.
+    """
+    sql, params = _hot_query(table, **filters)
+    with storage.connect() as conn:
+        count = conn.execute(f"SELECT COUNT(*) FROM ({sql}) AS export", params).fetchone()[0]
+    if table == "chat_history":
+        start, end = _date_bounds(filters.get("start_date"), filters.get("end_date"))
+        where, params = [], []
+        for clause, value in (("user_id = ?", filters.get("user_id")), ("last_at >= ?", start), ("first_at < ?", end)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        local = sqlite3.connect(chat_archive.DB_FILE)
+        count += local.execute(
+            "SELECT COALESCE(SUM(row_count), 0) FROM chat_archive_index"
+            + (" WHERE " + " AND ".join(where) if where else ""), params
+        ).fetchone()[0]
+        local.close()
+    return count
+
+
+def iter_rows(table, user_id=None, start_date=None, end_date=None):
+    """
+    Yield rows of an export table one at a time straight from the cursor.
+    chat_history can be filtered by user_id and an inclusive 'YYYY-MM-DD' date
+    range; its archived rows (chat_archive.py) come first, then the rows still
+    in the table in id order.
+    """
+    sql, params = _hot_query(table, user_id, start_date, end_date)
+    sql += " ORDER BY id"
+
+    with storage.connect() as conn:
+        if table == "chat_history":
+            yield from chat_archive.iter_archived(conn, user_id, *_date_bounds(start_date, end_date))
+        cur = storage.streaming_cursor(conn)
+        cur.execute(sql, params)
+        while True:
+            batch = cur.fetchmany(BATCH_SIZE)
+            if not batch:
+                break
+            if table == "chat_history":
+                batch = resolve_messages(conn, batch, 3, 5)
+            yield from batch
+
+
+def _encode_batches(rows, columns, fmt):
+    """Turn rows into UTF-8 chunks of CSV (with header) or JSON Lines."""
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    count = 0
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buf.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            buf.write("\n")
+        count += 1
+        if count % BATCH_SIZE == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def iter_export(table, fmt="csv", compress=False, **filters):
+    """Yield the export file as byte chunks (fmt 'csv' or 'jsonl', optionally gzip)."""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    columns = EXPORTS[table][0]
+    chunks = _encode_batches(iter_rows(table, **filters), columns, fmt)
+    if not compress:
+        yield from chunks
+        return
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = gz.compress(chunk)
+        if data:
+            yield data
+    yield gz.flush()
+
+
+def export_filename(table, fmt="csv", compress=False):
+    return f"{table}.{fmt}" + (".gz" if compress else "")
+
+
+def write_export(out, table, fmt="csv", compress=False, **filters):
+    """Stream an export into a binary file object. Returns the number of bytes written."""
+    written = 0
+    for chunk in iter_export(table, fmt, compress, **filters):
+        out.write(chunk)
+        written += len(chunk)
+    return written
+
+
+if __name__ == "__main__":
+    # python exports.py <table> [csv|jsonl] [--gzip] [--user-id N] [--from YYYY-MM-DD] [--to YYYY-MM-DD] > file
+    parser = argparse.ArgumentParser(description="Stream an export to stdout.")
+    parser.add_argument("table", choices=list(EXPORTS))
+    parser.add_argument("format", nargs="?", default="csv", choices=("csv", "jsonl"))
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--from", dest="start_date")
+    parser.add_argument("--to", dest="end_date")
+    args = parser.parse_args()
+    filters = {}
+    if args.table == "chat_history":
+        filters = {"user_id": args.user_id, "start_date": args.start_date, "end_date": args.end_date}
+    write_export(sys.stdout.buffer, args.table, args.format, compress=args.gzip, **filters)
@@ -0,0 +1,394 @@
+"""
+Background maintenance of college_data.db in a low-traffic window.
+
+Tasks, each run at most once per interval and stopped when its time budget
+is spent (a SQLite progress handler interrupts a long statement):
+
+- vacuum:     PRAGMA incremental_vacuum until the free pages are gone. A DB
+              created before auto_vacuum=INCREMENTAL is converted with one
+              full VACUUM if it is at most FULL_VACUUM_MAX_MB, otherwise by
+              `python maintenance.py --convert-vacuum`.
+- analyze:    ANALYZE (sampled, PRAGMA analysis_limit) + PRAGMA optimize, so
+              query plans follow the data.
+- chat_archive: chat rows past the retention policy moved to compressed
+              monthly archive files (chat_archive.py); runs before orphans
+              so the message blobs they used are freed the same night.
+- orphans:    expired/revoked sessions, sessions and chat rows of deleted
+              users, message blobs no chat row uses, expired web answers;
+              deleted in short keyset batches. With PostgreSQL storage
+              (storage.py) only the local sessions and web answers.
+- checkpoint: PRAGMA wal_checkpoint(TRUNCATE) when the DB is in WAL mode.
+
+Runs are claimed in maintenance_runs, so with several app processes (or a
+companion process) each task still runs once per interval; the admin
+Maintenance page shows that table. Its Run buttons only set requested_at
+(run_now); the scheduler runs requested tasks at its next check, at once
+when it runs in the same process. After startup and after any task ran,
+the process also warms its shared caches (user/document/notice lists and
+each student partition's knowledge index).
+
+    SVU_MAINTENANCE=app   (default) a daemon thread in each app process, or
+                          in the data service when SVU_DATA_SERVICE is set
+    SVU_MAINTENANCE=off   never from the app, e.g. when a companion runs:
+    python maintenance.py [--once [TASK ...]] [--convert-vacuum] [--status]
+"""
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+import storage
+from data_service import SOCKET_PATH, remote
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = "college_data.db"
+
+MODE = os.getenv("SVU_MAINTENANCE", "app")
+# Local time "HH:MM-HH:MM" (may wrap midnight), or "always".
+WINDOW = os.getenv("SVU_MAINTENANCE_WINDOW", "02:00-05:00")
+CHECK_SECONDS = 60
+# Larger DBs are not converted to incremental auto_vacuum automatically (a full VACUUM copies the file).
+FULL_VACUUM_MAX_MB = float(os.getenv("SVU_MAINTENANCE_FULL_VACUUM_MB", "64"))
+VACUUM_STEP_PAGES = 256
+ANALYSIS_LIMIT = 1000
+BATCH_SIZE = 500
+# A claim older than this is assumed to belong to a crashed process.
+STALE_CLAIM_SECONDS = 3600
+
+_RUNNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Task(NamedTuple):
+    name: str
+    interval: float  # seconds between runs
+    budget: float  # seconds per run
+    run: Callable  # (conn, deadline) -> detail string
+
+
+def in_window(now=None):
+    if WINDOW == "always":
+        return True
+    start, end = (int(h) * 60 + int(m) for h, m in (part.split(":") for part in WINDOW.split("-")))
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    return start <= minute < end if start <= end else minute >= start or minute < end
+
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def _purge(conn, deadline, table, key, condition, params=()):
+    """
+    Delete rows of table matching condition, BATCH_SIZE keys at a time in key
+    order, each batch in its own short write transaction that re-checks the
+    condition. Stops at the deadline. Returns rows deleted.
+    """
+    deleted, last = 0, 0  # in SQLite 0 sorts before every id, rowid and text key
+    while time.monotonic() < deadline:
+        keys = [row[0] for row in conn.execute(
+            f"SELECT {key} FROM {table} WHERE {key} > ? AND ({condition}) ORDER BY {key} LIMIT {BATCH_SIZE}",
+            (last, *params),
+        )]
+        if not keys:
+            break
+        last = keys[-1]
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute(
+            f"DELETE FROM {table} WHERE {key} IN ({','.join('?' * len(keys))}) AND ({condition})",
+            (*keys, *params),
+        )
+        conn.execute("COMMIT")
+        deleted += cur.rowcount
+    return deleted
+
+
+# ------------------ TASKS ------------------
+def _vacuum(conn, deadline):
+    free = _pragma(conn, "freelist_count")
+    if _pragma(conn, "auto_vacuum") != 2:  # 2 = INCREMENTAL
+        size_mb = _pragma(conn, "page_count") * _pragma(conn, "page_size") / 1e6
+        if size_mb > FULL_VACUUM_MAX_MB:
+            return (f"auto_vacuum is off ({free} free pages, {size_mb:.0f} MB); "
+                    "run `python maintenance.py --convert-vacuum` in a quiet period")
+        convert_vacuum(conn)
+        return f"converted to incremental auto_vacuum, {free} free pages reclaimed"
+    reclaimed = 0
+    while free and time.monotonic() < deadline:
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+        left = _pragma(conn, "freelist_count")
+        if left == free:
+            break
+        reclaimed, free = reclaimed + free - left, left
+    return f"{reclaimed} pages reclaimed, {free} free pages left"
+
+
+def convert_vacuum(conn=None):
+    """Switch to incremental auto_vacuum with one full VACUUM (rewrites the whole file)."""
+    own = conn is None
+    conn = conn or sqlite3.connect(DB_FILE, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        if own:
+            conn.close()
+
+
+def _analyze(conn, deadline):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    return f"{conn.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0]} sqlite_stat1 rows"
+
+
+def _orphans(conn, deadline):
+    from web_cache import WEB_CACHE_TTL_SECONDS
+
+    now = time.time()
+    removed = {}
+    if storage.DIALECT == "sqlite":
+        removed["sessions"] = _purge(conn, deadline, "sessions", "token",
+                                     "revoked = 1 OR expires_at <= ? OR user_id NOT IN (SELECT id FROM users)",
+                                     (now,))
+        removed["chat rows"] = _purge(conn, deadline, "chat_history", "id", "user_id NOT IN (SELECT id FROM users)")
+        removed["blobs"] = _purge(conn, deadline, "message_blobs", "hash",
+                                  "NOT EXISTS (SELECT 1 FROM chat_history c WHERE c.blob_hash = message_blobs.hash)")
+    else:
+        # Users and chat rows live in PostgreSQL (chat rows cascade when a user is deleted).
+        removed["sessions"] = _purge(conn, deadline, "sessions", "token", "revoked = 1 OR expires_at <= ?", (now,))
+    removed["web answers"] = _purge(conn, deadline, "web_answers", "rowid", "created_at < ?",
+                                    (now - WEB_CACHE_TTL_SECONDS,))
+    return ", ".join(f"{n} {what}" for what, n in removed.items())
+
+
+def _chat_archive(conn, deadline):
+    from chat_archive import archive_old_messages
+
+    return archive_old_messages(conn, deadline)
+
+
+def _checkpoint(conn, deadline):
+    mode = _pragma(conn, "journal_mode")
+    if mode != "wal":
+        return f"journal_mode={mode}, nothing to checkpoint"
+    busy, frames, done = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return f"{done} of {frames} WAL frames checkpointed" + (" (readers busy)" if busy else "")
+
+
+DAY = 24 * 60 * 60
+TASKS = (
+    Task("chat_archive", DAY, 60.0, _chat_archive),
+    Task("orphans", DAY, 20.0, _orphans),
+    Task("vacuum", DAY, 30.0, _vacuum),
+    Task("analyze", DAY, 10.0, _analyze),
+    Task("checkpoint", 60 * 60, 5.0, _checkpoint),
+)
+_BY_NAME = {task.name: task for task in TASKS}
+
+
+# ------------------ RUNNER ------------------
+def _claim(conn, task, now, force):
+    conn.execute(
+        "INSERT OR IGNORE INTO maintenance_runs (task, status, finished_at) VALUES (?, 'never', 0)", (task.name,)
+    )
+    cur = conn.execute(
+        "UPDATE maintenance_runs SET status = 'running', started_at = ?, runner = ?, requested_at = NULL"
+        " WHERE task = ? AND (status != 'running' OR started_at < ?)"
+        + ("" if force else " AND finished_at <= ?"),
+        (now, _RUNNER, task.name, now - STALE_CLAIM_SECONDS) + (() if force else (now - task.interval,)),
+    )
+    return cur.rowcount == 1
+
+
+def run_task(task, force=False):
+    """
+    Claim and run one task within its budget. Returns (status, detail), or
+    None if it is not due or another process is running it.
+    """
+    conn = sqlite3.connect(DB_FILE, isolation_level=None, timeout=30)
+    try:
+        if not _claim(conn, task, time.time(), force):
+            return None
+        deadline = time.monotonic() + task.budget
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+        start = time.perf_counter()
+        try:
+            detail = task.run(conn, deadline)
+            status = "budget" if time.monotonic() > deadline else "ok"
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            status = "budget" if "interrupted" in str(e) else "error"
+            detail = f"{type(e).__name__}: {e}"
+        conn.set_progress_handler(None, 0)
+        conn.execute(
+            "UPDATE maintenance_runs SET status = ?, finished_at = ?, duration_ms = ?, detail = ? WHERE task = ?",
+            (status, time.time(), (time.perf_counter() - start) * 1000, detail, task.name),
+        )
+        return status, detail
+    finally:
+        conn.close()
+
+
+_warmed = {"at": None, "ms": None, "detail": ""}
+
+
+def warm_caches():
+    """Fill this process's shared caches: user/document/notice lists and each student partition's index."""
+    from db_utils import (
+        ALL_AUDIENCE, audience_partition, get_all_documents, get_all_notifications, get_all_users,
+        load_knowledge_index,
+    )
+
+    start = time.perf_counter()
+    users = get_all_users()
+    get_all_documents()
+    get_all_notifications()
+    partitions = {audience_partition(u.course, u.year) for u in users if u.role == "student"}
+    partitions.add((ALL_AUDIENCE, ALL_AUDIENCE))
+    for course, year in partitions:
+        load_knowledge_index(course, year)
+    _warmed.update(at=time.time(), ms=(time.perf_counter() - start) * 1000,
+                   detail=f"{len(users)} users, {len(partitions)} knowledge partitions")
+
+
+def _requested_tasks():
+    """Tasks an admin asked to run now (run_now), oldest request first."""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        names = [row[0] for row in conn.execute(
+            "SELECT task FROM maintenance_runs WHERE requested_at IS NOT NULL ORDER BY requested_at"
+        )]
+    finally:
+        conn.close()
+    return [_BY_NAME[name] for name in names if name in _BY_NAME]
+
+
+# Set by run_now() so a scheduler in this process runs the request without waiting for the next check.
+_wake = threading.Event()
+
+
+def _loop(warm=True):
+    # An error (e.g. "database is locked" while claiming a task, or a failed
+    # read while warming) is logged and only skips that step this round; the
+    # scheduler thread keeps running for the next one.
+    pending_warm = warm
+    while True:
+        _wake.clear()
+        try:
+            requested = _requested_tasks()
+        except Exception:
+            logger.exception("reading maintenance requests failed")
+            requested = []
+        for task in requested:
+            try:
+                if run_task(task, force=True):
+                    pending_warm = warm
+            except Exception:
+                logger.exception("maintenance task %s failed", task.name)
+        if in_window():
+            for task in TASKS:
+                try:
+                    if run_task(task):
+                        pending_warm = warm
+                except Exception:
+                    logger.exception("maintenance task %s failed", task.name)
+        if pending_warm:
+            try:
+                warm_caches()
+                pending_warm = False
+            except Exception:
+                logger.exception("warming caches failed; retrying in %s s", CHECK_SECONDS)
+        _wake.wait(CHECK_SECONDS)
+
+
+_thread = None
+_start_lock = threading.Lock()
+
+
+def start(in_service=False):
+    """
+    Start the scheduler thread once per process when SVU_MAINTENANCE=app.
+    App processes leave it to the data service when one is configured.
+    Returns whether the scheduler runs in this process.
+    """
+    global _thread
+    if MODE != "app" or (SOCKET_PATH and not in_service):
+        return False
+    with _start_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_loop, name="svu-maintenance", daemon=True)
+            _thread.start()
+    return True
+
+
+# ------------------ STATUS ------------------
+@remote
+def maintenance_status():
+    """
+    {'window', 'scheduler', 'tasks': [(task, status, finished_at, duration ms, detail, runner), ...],
+     'warm': {'at', 'ms', 'detail'}} for the admin page. status is 'requested'
+    while a run_now() request waits for the scheduler.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    rows = dict(
+        (row[0], row) for row in conn.execute(
+            "SELECT task, CASE WHEN requested_at IS NOT NULL AND status != 'running' THEN 'requested'"
+            " ELSE status END, finished_at, duration_ms, detail, runner FROM maintenance_runs"
+        )
+    )
+    conn.close()
+    return {
+        "window": WINDOW,
+        "scheduler": _thread is not None and _thread.is_alive(),
+        "tasks": [rows.get(task.name, (task.name, "never", None, None, "", None)) for task in TASKS],
+        "warm": dict(_warmed),
+    }
+
+
+# A read for the data service (where the scheduler then runs): it must not hold up the writer thread.
+@remote
+def run_now(name):
+    """
+    Ask the scheduler to run one task outside the window and interval (admin
+    button). Returns at once; maintenance_status() shows 'requested', then the result.
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO maintenance_runs (task, status, finished_at) VALUES (?, 'never', 0)",
+                (_BY_NAME[name].name,),
+            )
+            conn.execute("UPDATE maintenance_runs SET requested_at = ? WHERE task = ?", (time.time(), name))
+    finally:
+        conn.close()
+    _wake.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SVU-MCA database maintenance")
+    parser.add_argument("--once", nargs="*", metavar="TASK", help="run these tasks (default all) now and exit")
+    parser.add_argument("--convert-vacuum", action="store_true", help="switch to incremental auto_vacuum (full VACUUM)")
+    parser.add_argument("--status", action="store_true", help="print the last run of each task")
+    args = parser.parse_args()
+    if args.convert_vacuum:
+        convert_vacuum()
+        print("auto_vacuum is now INCREMENTAL")
+    elif args.status:
+        for task, status, finished_at, ms, detail, runner in maintenance_status()["tasks"]:
+            when = datetime.fromtimestamp(finished_at).strftime("%Y-%m-%d %H:%M") if finished_at else "-"
+            print(f"{task:12} {status:7} {when:16} {(ms or 0):9.1f} ms  {detail}")
+    elif args.once is not None:
+        for name in args.once or [task.name for task in TASKS]:
+            print(name, *(run_task(_BY_NAME[name], force=True) or ("running elsewhere",)), sep="  ")
+    else:
+        print(f"SVU maintenance running in window {WINDOW}", flush=True)
+        _loop(warm=False)  # caches belong to the app processes
@@ -0,0 +1,141 @@
+import hashlib
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
+DB_FILE = "college_data.db"
+
+# Messages shorter than this stay inline in chat_history.message; longer ones
+# (mostly assistant answers) go to message_blobs, deduplicated by SHA-256.
+BLOB_MIN_CHARS = 200
+# Blobs at least this long are zlib-compressed, shorter ones stored raw.
+COMPRESS_MIN_CHARS = 512
+# Decoded blobs kept in memory; popular answers repeat across many users.
+DECODED_CACHE_SIZE = 512
+
+_decoded: "OrderedDict[str, str]" = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def put_message(cur, text):
+    """
+    Store text for a chat_history row using cursor cur (caller commits).
+    Returns (message, blob_hash): one of them is None.
+    """
+    if text is None or len(text) < BLOB_MIN_CHARS:
+        return text, None
+    raw = text.encode("utf-8")
+    blob_hash = hashlib.sha256(raw).hexdigest()
+    if len(text) >= COMPRESS_MIN_CHARS:
+        codec, body = "zlib", zlib.compress(raw, 6)
+    else:
+        codec, body = "raw", raw
+    cur.execute(
+        "INSERT INTO message_blobs (hash, codec, body, size) VALUES (?, ?, ?, ?) ON CONFLICT (hash) DO NOTHING",
+        (blob_hash, codec, body, len(raw)),
+    )
+    return None, blob_hash
+
+
+def _decode(codec, body):
+    if codec == "zlib":
+        body = zlib.decompress(body)
+    return body.decode("utf-8")
+
+
+def resolve_messages(conn, rows, message_col, hash_col):
+    """
+    Return rows (tuples) with row[message_col] filled in from message_blobs
+    wherever row[hash_col] is set, and the hash column dropped.
+    """
+    wanted = {row[hash_col] for row in rows if row[hash_col]}
+    texts = {}
+    with _decoded_lock:
+        for h in list(wanted):
+            if h in _decoded:
+                _decoded.move_to_end(h)
+                texts[h] = _decoded[h]
+                wanted.discard(h)
+
+    if wanted:
+        missing = list(wanted)
+        cur = conn.cursor()
+        # Stay well under SQLite's bound-parameter limit.
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            cur.execute(
+                f"SELECT hash, codec, body FROM message_blobs WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for h, codec, body in cur.fetchall():
+                texts[h] = _decode(codec, body)
+        with _decoded_lock:
+            for h in missing:
+                if h in texts:
+                    _decoded[h] = texts[h]
+            while len(_decoded) > DECODED_CACHE_SIZE:
+                _decoded.popitem(last=False)
+
+    resolved = []
+    for row in rows:
+        row = list(row)
+        blob_hash = row.pop(hash_col)
+        if blob_hash:
+            row[message_col] = texts.get(blob_hash)
+        resolved.append(tuple(row))
+    return resolved
+
+
+def migrate_chat_history(conn, batch_size=5000):
+    """
+    Move existing long inline messages into message_blobs, committing per batch.
+    Returns the number of rows migrated. Safe to re-run.
+    """
+    cur = conn.cursor()
+    migrated = 0
+    while True:
+        cur.execute(
+            "SELECT id, message FROM chat_history WHERE blob_hash IS NULL AND length(message) >= ? LIMIT ?",
+            (BLOB_MIN_CHARS, batch_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        for row_id, message in rows:
+            _, blob_hash = put_message(cur, message)
+            cur.execute(
+                "UPDATE chat_history SET message = NULL, blob_hash = ? WHERE id = ?",
+                (blob_hash, row_id),
+            )
+        conn.commit()
+        migrated += len(rows)
+    return migrated
+
+
+def storage_report():
+    """Bytes of chat text as written by users/assistant vs. bytes actually stored."""
+    conn = sqlite3.connect(DB_FILE)
+    cur = conn.cursor()
+    inline = cur.execute(
+        "SELECT COALESCE(SUM(length(CAST(message AS BLOB))), 0) FROM chat_history WHERE blob_hash IS NULL"
+    ).fetchone()[0]
+    logical_blob = cur.execute(
+        "SELECT COALESCE(SUM(b.size), 0) FROM chat_history c JOIN message_blobs b ON b.hash = c.blob_hash"
+    ).fetchone()[0]
+    stored_blob, blob_count = cur.execute(
+        "SELECT COALESCE(SUM(length(body)), 0), COUNT(*) FROM message_blobs"
+    ).fetchone()
+    conn.close()
+    return {
+        "logical_bytes": inline + logical_blob,
+        "stored_bytes": inline + stored_blob,
+        "blobs": blob_count,
+    }
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(DB_FILE)
+    print(f"Migrated {migrate_chat_history(conn)} chat_history rows")
+    conn.close()
+    print(storage_report())
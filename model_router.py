@@ -0,0 +1,133 @@
+"""
+Latency-aware model routing for ask_ai().
+
+Each DB-side question gets one of three routes, picked from retrieval
+confidence, question length and chat history:
+
+- "faq":  every keyword of the question is in the title of exactly one
+          document/notice; its text is returned from a template, no model call.
+- "fast": the best entry matches most keywords, the question is short and not
+          a follow-up to the recent chat; FAST_MODEL answers.
+- "full": everything else; FULL_MODEL answers (with the context cache, if on).
+
+Web-grounded answers are logged as route "web". Latency, tokens and an
+estimated cost of every answer are summed per day, route and model in
+model_route_log, so the thresholds can be tuned from the admin Home page.
+"""
+import os
+import re
+import sqlite3
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from data_service import remote
+
+DB_FILE = "college_data.db"
+
+FULL_MODEL = os.getenv("SVU_MODEL_FULL", "gemini-2.5-flash")
+FAST_MODEL = os.getenv("SVU_MODEL_FAST", "gemini-2.5-flash-lite")
+# SVU_MODEL_ROUTING=0 sends every question to FULL_MODEL, as before.
+ROUTING_ENABLED = os.getenv("SVU_MODEL_ROUTING", "1") != "0"
+# Share of the question's keywords the best entry must match for the fast tier.
+FAST_MIN_CONFIDENCE = float(os.getenv("SVU_FAST_MIN_CONFIDENCE", "0.6"))
+FAST_MAX_WORDS = int(os.getenv("SVU_FAST_MAX_WORDS", "20"))
+
+# USD per 1M tokens (input, output); list prices, used for estimates only.
+PRICES_PER_MTOK = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+# Words that make a question depend on the previous turns ("what about its fee?").
+_FOLLOW_UP_WORDS = {"it", "its", "that", "this", "they", "them", "those", "these", "he", "she", "above", "previous"}
+
+FAQ, FAST, FULL, WEB = "faq", "fast", "full", "web"
+
+
+class Match(NamedTuple):
+    """How well one knowledge entry matches the question's keywords."""
+    entry: object  # read_models.KnowledgeEntry
+    matched: int  # keywords found anywhere in the entry
+    title_matched: int  # keywords found in the title
+
+
+class Route(NamedTuple):
+    name: str
+    model: str | None
+    faq_entry: object = None
+
+
+def is_follow_up(question, recent_context):
+    return bool(recent_context) and bool(_FOLLOW_UP_WORDS & set(re.findall(r"\w+", question.lower())))
+
+
+def choose_route(question, n_keywords, matches, recent_context=""):
+    """matches: [Match, ...] best first (see assistant.rank_knowledge)."""
+    if not ROUTING_ENABLED or not matches or n_keywords == 0 or is_follow_up(question, recent_context):
+        return Route(FULL, FULL_MODEL)
+
+    title_hits = [m for m in matches if m.title_matched == n_keywords]
+    if n_keywords >= 2 and len(title_hits) == 1:
+        return Route(FAQ, None, title_hits[0].entry)
+
+    confidence = matches[0].matched / n_keywords
+    if confidence >= FAST_MIN_CONFIDENCE and len(question.split()) <= FAST_MAX_WORDS:
+        return Route(FAST, FAST_MODEL)
+    return Route(FULL, FULL_MODEL)
+
+
+def faq_answer(entry, description):
+    """Template answer for an exact FAQ hit, given its entry's full description."""
+    return f"**{entry.title}**\n\n{description}"
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    price_in, price_out = PRICES_PER_MTOK.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+def record(route, model, elapsed_ms, response=None):
+    """Add one answer's latency, tokens and estimated cost to today's totals."""
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None) or 0
+    output_tokens = getattr(usage, "candidates_token_count", None) or 0
+    _log_route(route, model or "-", elapsed_ms, input_tokens, output_tokens,
+               estimate_cost(model, input_tokens, output_tokens))
+
+
+@remote(write=True)
+def _log_route(route, model, elapsed_ms, input_tokens, output_tokens, cost):
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute(
+        """
+        INSERT INTO model_route_log (day, route, model, calls, total_ms, input_tokens, output_tokens, cost_usd)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT(day, route, model) DO UPDATE SET
+            calls = calls + 1,
+            total_ms = total_ms + excluded.total_ms,
+            input_tokens = input_tokens + excluded.input_tokens,
+            output_tokens = output_tokens + excluded.output_tokens,
+            cost_usd = cost_usd + excluded.cost_usd
+        """,
+        (date.today().isoformat(), route, model, elapsed_ms, input_tokens, output_tokens, cost),
+    )
+    conn.commit()
+    conn.close()
+
+
+@remote
+def route_report(days=14):
+    """[(route, model, calls, avg ms, input tokens, output tokens, est. cost USD), ...] for the last `days` days."""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    conn = sqlite3.connect(DB_FILE)
+    rows = conn.execute(
+        """
+        SELECT route, model, SUM(calls), SUM(total_ms) / SUM(calls),
+               SUM(input_tokens), SUM(output_tokens), SUM(cost_usd)
+        FROM model_route_log WHERE day >= ?
+        GROUP BY route, model ORDER BY SUM(calls) DESC
+        """,
+        (since,),
+    ).fetchall()
+    conn.close()
+    return rows
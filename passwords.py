@@ -0,0 +1,116 @@
+"""
+Password hashing for users.password.
+
+New and changed passwords are stored as
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>           (salt / hash base64)
+    pbkdf2_sha256$<iterations>$<salt>$<hash>   (Pythons built without scrypt)
+
+Rows from before hashing still hold the plain password. verify_password() accepts
+them and reports that they need a rehash, which auth.login() writes back
+after a successful login, so accounts are converted as their owners sign in.
+The same happens when SVU_SCRYPT_N is raised.
+
+Hashing and verifying are CPU-heavy (about 50-100 ms each), so they run on a
+pool of SVU_AUTH_WORKERS threads (hashlib releases the GIL while it works)
+instead of on every Streamlit script thread at once. At most SVU_AUTH_MAX_PENDING calls may be
+queued or running; further callers wait up to SVU_AUTH_WAIT seconds for a
+slot and then get LoginBusy instead of piling up behind a login burst.
+
+    SVU_SCRYPT_N            scrypt cost (default 16384; r=8, p=1)
+    SVU_AUTH_WORKERS        hashing threads (default: CPU count, at most 4)
+    SVU_AUTH_MAX_PENDING    queued + running hashes (default 64)
+    SVU_AUTH_WAIT           seconds to wait for a slot (default 5)
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SCRYPT_N = int(os.getenv("SVU_SCRYPT_N", "16384"))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+ALGORITHM = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"
+
+WORKERS = int(os.getenv("SVU_AUTH_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+MAX_PENDING = int(os.getenv("SVU_AUTH_MAX_PENDING", "64"))
+WAIT_SECONDS = float(os.getenv("SVU_AUTH_WAIT", "5"))
+
+
+class LoginBusy(RuntimeError):
+    """Too many password hashes are already queued; try again shortly."""
+
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="svu-auth")
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+
+
+def _hash(password):
+    salt = os.urandom(16)
+    if ALGORITHM == "scrypt":
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+
+
+def _verify(password, stored):
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        n, r, p = (int(x) for x in parts[1:4])
+        digest = _scrypt(password, base64.b64decode(parts[4]), n, r, p)
+        current = ALGORITHM == "scrypt" and (n, r, p) == (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return hmac.compare_digest(digest, base64.b64decode(parts[5])), not current
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        iterations = int(parts[1])
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(parts[2]), iterations)
+        current = ALGORITHM == "pbkdf2_sha256" and iterations == PBKDF2_ITERATIONS
+        return hmac.compare_digest(digest, base64.b64decode(parts[3])), not current
+    # A password stored before hashing.
+    return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")), True
+
+
+def _run(fn, *args, wait=True):
+    if not _slots.acquire(timeout=WAIT_SECONDS if wait else 0):
+        raise LoginBusy("too many sign-ins at once")
+    try:
+        return _pool.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password, wait=True):
+    """
+    The string to store in users.password for password. wait=False raises
+    LoginBusy at once instead of waiting for a free slot.
+    """
+    return _run(_hash, password, wait=wait)
+
+
+# Unknown usernames are checked against this, so they take as long as a wrong password.
+_dummy = None
+
+
+def verify_password(password, stored):
+    """
+    (matches, needs_rehash) for password against a users.password value
+    (None when there is no such user: always (False, False)).
+    """
+    global _dummy
+    if stored is None:
+        if _dummy is None:
+            _dummy = hash_password("svu-no-such-user")
+        _run(_verify, password or "", _dummy)
+        return False, False
+    return _run(_verify, password or "", stored)
@@ -0,0 +1,107 @@
+"""
+Opt-in, sampled cProfile capture of app.py page sections.
+
+    with profile_section("admin/Users"):
+        ...render the page...
+
+A section is profiled with probability sample_rate() (SVU_PROFILE_RATE,
+default 0 = off; admins can change it at runtime on the Profiler page). Each
+capture is written to PROFILE_DIR as <epoch ms>_<section>_<duration ms>.prof
+and only the newest PROFILE_KEEP files are kept. Only one capture runs at a
+time per process, so concurrent sessions never stack profiler overhead.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_DIR = os.getenv("SVU_PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("SVU_PROFILE_KEEP", "200"))
+
+_rate = float(os.getenv("SVU_PROFILE_RATE", "0"))
+_capture_lock = threading.Lock()
+_FILE_RE = re.compile(r"^(\d+)_(.+)_(\d+)ms\.prof$")
+
+
+def sample_rate():
+    """Fraction of section runs that are profiled (0 = off, 1 = every run)."""
+    return _rate
+
+
+def set_sample_rate(rate):
+    """Change the sampling rate for this process (admin toggle)."""
+    global _rate
+    _rate = min(max(float(rate), 0.0), 1.0)
+
+
+@contextmanager
+def profile_section(name):
+    """Profile the enclosed block if this run is sampled; save it even if it ends in st.rerun()."""
+    if _rate <= 0 or random.random() >= _rate or not _capture_lock.acquire(blocking=False):
+        yield
+        return
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+        yield
+    finally:
+        profile.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _capture_lock.release()
+        _save(profile, name, elapsed_ms)
+
+
+def _save(profile, name, elapsed_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-") or "run"
+    filename = f"{int(time.time() * 1000)}_{slug}_{int(elapsed_ms)}ms.prof"
+    profile.dump_stats(os.path.join(PROFILE_DIR, filename))
+    _rotate()
+
+
+def _rotate():
+    files = sorted(f for f in os.listdir(PROFILE_DIR) if _FILE_RE.match(f))
+    for old in files[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else files:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles(limit=50):
+    """Saved captures, slowest first: [{'file', 'section', 'captured_at', 'ms'}, ...]."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    runs = []
+    for filename in os.listdir(PROFILE_DIR):
+        match = _FILE_RE.match(filename)
+        if match:
+            runs.append({
+                "file": filename,
+                "section": match.group(2),
+                "captured_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(match.group(1)) / 1000)),
+                "ms": int(match.group(3)),
+            })
+    runs.sort(key=lambda r: r["ms"], reverse=True)
+    return runs[:limit]
+
+
+def top_functions(filename, limit=25):
+    """
+    Top functions of one capture by cumulative time:
+    [(function, calls, total s, cumulative s), ...].
+    """
+    if not _FILE_RE.match(filename):
+        raise ValueError(f"not a profile file: {filename}")
+    stats = pstats.Stats(os.path.join(PROFILE_DIR, filename))
+    rows = []
+    for (path, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+        where = f"{os.path.basename(path)}:{line}" if line else path
+        rows.append((f"{func} ({where})", calls, round(total, 4), round(cumulative, 4)))
+    rows.sort(key=lambda r: r[3], reverse=True)
+    return rows[:limit]
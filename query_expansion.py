@@ -0,0 +1,178 @@
+"""
+Query expansion for knowledge retrieval: spelling correction + synonyms.
+
+expand_keywords({"examinaton", "finals"}) ->
+    {"examinaton": ("examinaton", "examination"), "finals": ("finals", "exam", "examination")}
+
+Each question keyword becomes a group of alternatives; an entry matches the
+keyword if it matches any alternative.
+
+- Spelling: a symmetric-delete corrector over the words of the knowledge
+  indexes this process has built (db_utils.loaded_postings(), i.e. the
+  partitions its users asked about), weighted by how many entries use them.
+  Words shorter than 4 letters are never corrected; up to 1 edit for words
+  under 8 letters, 2 for longer ones. When an index is rebuilt or a new
+  partition is loaded, only added and removed words are re-indexed.
+- Synonyms: the admin-editable `synonyms` table (term -> expansions), see
+  db_utils.get_synonyms().
+
+Both are re-synced at most once per REFRESH_SECONDS, and only when a cached
+knowledge index / the synonym list was rebuilt. Corrections are memoized until
+the vocabulary changes, so a lookup is usually a few dict probes.
+"""
+import os
+import threading
+import time
+
+from db_utils import get_synonyms, loaded_postings
+
+# SVU_QUERY_EXPANSION=0 matches keywords literally, as before.
+ENABLED = os.getenv("SVU_QUERY_EXPANSION", "1") != "0"
+MIN_CORRECTABLE_LENGTH = 4
+# How often expand_keywords() checks whether documents or synonyms changed.
+REFRESH_SECONDS = 1.0
+# Memoized corrections kept per vocabulary version.
+MEMO_MAX_ENTRIES = 10_000
+
+
+def max_edits(word):
+    if len(word) < MIN_CORRECTABLE_LENGTH:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def _deletes(word, distance):
+    """word plus every string made by deleting up to `distance` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps count as one edit), or limit + 1 if larger."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellingCorrector:
+    """Symmetric-delete spelling corrector over a {word: frequency} vocabulary."""
+
+    def __init__(self):
+        self._words = {}
+        self._deletes = {}  # delete variant -> set of vocabulary words
+        self._memo = {}  # word -> correction (or None) for the current vocabulary
+        self._lock = threading.Lock()
+
+    def update(self, vocabulary):
+        """Replace the vocabulary, re-indexing only added and removed words. Returns (added, removed)."""
+        with self._lock:
+            added = vocabulary.keys() - self._words.keys()
+            removed = self._words.keys() - vocabulary.keys()
+            for word in removed:
+                for variant in _deletes(word, max_edits(word)):
+                    words = self._deletes.get(variant)
+                    if words is not None:
+                        words.discard(word)
+                        if not words:
+                            del self._deletes[variant]
+            for word in added:
+                for variant in _deletes(word, max_edits(word)):
+                    self._deletes.setdefault(variant, set()).add(word)
+            self._words = dict(vocabulary)
+            self._memo = {}
+            return len(added), len(removed)
+
+    def correct(self, word):
+        """Closest vocabulary word (fewest edits, then most used), the word itself if known, or None."""
+        memo = self._memo
+        if word in memo:
+            return memo[word]
+        limit = max_edits(word)
+        with self._lock:
+            if word in self._words:
+                return word
+            if limit == 0:
+                return None
+            candidates = set()
+            for variant in _deletes(word, limit):
+                candidates |= self._deletes.get(variant, set())
+            best = None
+            for candidate in candidates:
+                distance = edit_distance(word, candidate, limit)
+                if distance <= limit:
+                    key = (distance, -self._words[candidate], candidate)
+                    if best is None or key < best:
+                        best = key
+            if len(self._memo) >= MEMO_MAX_ENTRIES:
+                self._memo = {}
+            self._memo[word] = best[2] if best else None
+        return best[2] if best else None
+
+
+_speller = SpellingCorrector()
+_state_lock = threading.Lock()
+_source = {"postings": (), "synonyms": None, "checked_at": 0.0}
+_synonyms = {}
+
+
+def _refresh():
+    """Re-sync the corrector / synonym map when their cached sources were rebuilt."""
+    global _synonyms
+    now = time.monotonic()
+    if now - _source["checked_at"] < REFRESH_SECONDS:
+        return
+    _source["checked_at"] = now
+    postings = loaded_postings()
+    rebuilt = len(postings) != len(_source["postings"]) or any(
+        new is not old for new, old in zip(postings, _source["postings"])
+    )
+    synonyms = get_synonyms()
+    if not rebuilt and synonyms is _source["synonyms"]:
+        return
+    with _state_lock:
+        if rebuilt:
+            # Entries for everyone are in every partition, so take the largest count, not the sum.
+            vocabulary = {}
+            for partition in postings:
+                for word, ids in partition.items():
+                    if len(ids) > vocabulary.get(word, 0):
+                        vocabulary[word] = len(ids)
+            _speller.update(vocabulary)
+            _source["postings"] = postings
+        if synonyms is not _source["synonyms"]:
+            _synonyms = dict(synonyms)
+            _source["synonyms"] = synonyms
+
+
+def expand_keywords(keywords):
+    """{keyword: (keyword, correction?, synonyms...)} for retrieval; identity groups when disabled."""
+    if not ENABLED:
+        return {kw: (kw,) for kw in keywords}
+    _refresh()
+    groups = {}
+    for kw in keywords:
+        alternatives = [kw]
+        if kw not in _synonyms:
+            corrected = _speller.correct(kw)
+            if corrected and corrected != kw:
+                alternatives.append(corrected)
+        for alt in list(alternatives):
+            alternatives.extend(s for s in _synonyms.get(alt, ()) if s not in alternatives)
+        groups[kw] = tuple(alternatives)
+    return groups
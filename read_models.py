@@ -0,0 +1,124 @@
+"""
+Immutable read models for the cached lists in db_utils.
+
+The lists are cached with st.cache_resource, so every session shares one
+object instead of unpickling its own copy on each hit. They are therefore
+tuples of NamedTuples (no per-row dict, nothing to mutate by accident), and
+the few distinct course / year / role strings are interned so 100k rows
+point at a handful of string objects.
+
+Documents and notices carry only their preview and body_length; the full
+description is fetched per item with db_utils.get_descriptions(). Their
+`keywords` column (body_keywords(), written with the description) feeds the
+keyword index, so words deep in a long body are still found.
+"""
+import re
+import sys
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+
+class UserRow(NamedTuple):
+    id: int
+    name: str
+    username: str
+    mobile: str
+    role: str
+    course: str
+    year: str
+
+
+class DocumentRow(NamedTuple):
+    id: int
+    title: str
+    preview: str
+    body_length: int
+    course: str
+    year: str
+
+
+class NoticeRow(NamedTuple):
+    id: int
+    title: str
+    preview: str
+    body_length: int
+    course: str
+    year: str
+    published_at: Optional[str]
+    expires_at: Optional[str]
+    priority: int
+
+
+class KnowledgeEntry(NamedTuple):
+    table: str  # 'documents' or 'notifications'
+    id: int
+    title: str
+    preview: str
+    body_length: int
+
+
+class KnowledgeIndex(NamedTuple):
+    entries: tuple  # of KnowledgeEntry
+    postings: MappingProxyType  # word -> tuple of entry positions
+
+
+# Explicit column lists, so rows don't depend on the column order of migrated tables.
+USER_COLUMNS = "id, name, username, mobile, role, course, year"
+DOCUMENT_COLUMNS = "id, title, preview, body_length, audience_course, audience_year"
+NOTICE_COLUMNS = DOCUMENT_COLUMNS + ", published_at, expires_at, priority"
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def users(rows):
+    return tuple(
+        UserRow(uid, name, username, mobile, _intern(role), _intern(course), _intern(year))
+        for uid, name, username, mobile, role, course, year in rows
+    )
+
+
+def documents(rows):
+    return tuple(
+        DocumentRow(doc_id, title, preview, length, _intern(course), _intern(year))
+        for doc_id, title, preview, length, course, year in rows
+    )
+
+
+def notices(rows):
+    return tuple(
+        NoticeRow(n_id, title, preview, length, _intern(course), _intern(year), published_at, expires_at, priority)
+        for n_id, title, preview, length, course, year, published_at, expires_at, priority in rows
+    )
+
+
+def knowledge(rows):
+    """rows of (table, id, title, preview, body_length)."""
+    return tuple(KnowledgeEntry(_intern(table), *rest) for table, *rest in rows)
+
+
+def words(text):
+    """Lowercase words of 2+ characters in text, as retrieval matches them."""
+    return re.findall(r"\b\w{2,}\b", (text or "").lower())
+
+
+def body_keywords(description):
+    """Value of a documents / notifications `keywords` column: its description's distinct words, space-separated."""
+    return " ".join(dict.fromkeys(words(description)))
+
+
+def knowledge_index(entries, bodies):
+    """
+    Read-only keyword index over knowledge entries: the words of each title
+    plus bodies[(table, id)] (its keywords column, or the description where
+    that is not filled in yet; the preview if the entry is missing).
+    """
+    postings = {}
+    for i, k in enumerate(entries):
+        body = bodies.get((k.table, k.id), k.preview)
+        for word in set(words(k.title + " " + (body or ""))):
+            postings.setdefault(word, []).append(i)
+    return KnowledgeIndex(
+        entries, MappingProxyType({_intern(word): tuple(ids) for word, ids in postings.items()})
+    )
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_FILE = "college_data.db"
+
+# Opt-in: SVU_READ_REPLICA=1 serves reads of the mostly-static tables from
+# an in-memory copy of them, rebuilt when their data_versions counter moves.
+ENABLED = os.getenv("SVU_READ_REPLICA", "0") == "1"
+# Max seconds a read may lag behind a write made by another process.
+MAX_STALENESS_SECONDS = float(os.getenv("SVU_READ_REPLICA_STALENESS", "2"))
+
+# The only tables copied (with their indexes); everything served through
+# read_connection() reads just these. Chat history, blobs, sessions and caches
+# stay on disk, so a refresh costs the size of these tables only.
+STATIC_TABLES = ("users", "login_names", "documents", "notifications", "synonyms", "data_versions")
+
+_lock = threading.Lock()
+# Each snapshot is a named shared-cache in-memory DB; _keeper holds it open and
+# readers open their own connection to _snapshot_uri, so reads run in parallel.
+# An old snapshot is freed once its last reader closes.
+_keeper = None
+_snapshot_uri = None
+_snapshot_version = None
+_generation = 0
+_checked_at = 0.0
+_stats = {
+    "refreshes": 0,
+    "last_refresh_ms": 0.0,
+    "total_refresh_ms": 0.0,
+    "last_refresh_at": None,
+    "reads": 0,
+}
+
+
+def _current_version():
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute("SELECT version FROM data_versions WHERE name = 'static'").fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+def _refresh():
+    """Copy STATIC_TABLES into a new in-memory snapshot and swap it in (caller holds _lock)."""
+    global _keeper, _snapshot_uri, _snapshot_version, _generation
+    start = time.perf_counter()
+    _generation += 1
+    uri = f"file:svu_replica_{os.getpid()}_{_generation}?mode=memory&cache=shared"
+    snapshot = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+    snapshot.execute("ATTACH DATABASE ? AS src", (DB_FILE,))
+    # One read transaction, so all tables come from the same point in time.
+    snapshot.execute("BEGIN")
+    schema = snapshot.execute(
+        f"SELECT type, sql FROM src.sqlite_master WHERE tbl_name IN ({','.join('?' * len(STATIC_TABLES))})"
+        " AND type IN ('table', 'index') AND sql IS NOT NULL ORDER BY type DESC",
+        STATIC_TABLES,
+    ).fetchall()
+    for _, sql in schema:
+        snapshot.execute(sql)
+    for table in STATIC_TABLES:
+        snapshot.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table}")
+    version = snapshot.execute("SELECT version FROM data_versions WHERE name = 'static'").fetchone()
+    snapshot.execute("COMMIT")
+    snapshot.execute("DETACH DATABASE src")
+    if _keeper is not None:
+        _keeper.close()
+    _keeper, _snapshot_uri = snapshot, uri
+    _snapshot_version = version[0] if version else 0
+
+    elapsed = (time.perf_counter() - start) * 1000
+    _stats["refreshes"] += 1
+    _stats["last_refresh_ms"] = elapsed
+    _stats["total_refresh_ms"] += elapsed
+    _stats["last_refresh_at"] = time.time()
+
+
+@contextmanager
+def read_connection():
+    """
+    Yield a connection for reading users/documents/notifications.
+    Uses the in-memory snapshot when enabled, otherwise the on-disk DB.
+    """
+    global _checked_at
+    if not ENABLED:
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    with _lock:
+        now = time.monotonic()
+        if _snapshot_uri is None:
+            _refresh()
+            _checked_at = now
+        elif now - _checked_at >= MAX_STALENESS_SECONDS:
+            if _current_version() != _snapshot_version:
+                _refresh()
+            _checked_at = now
+        _stats["reads"] += 1
+        # Opened while the keeper is certainly alive; the lock is not held while reading.
+        conn = sqlite3.connect(_snapshot_uri, uri=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def invalidate():
+    """Force a version check on the next read (call after writes in this process)."""
+    global _checked_at
+    _checked_at = 0.0
+
+
+def replica_stats():
+    """Refresh counters and timings for the snapshot."""
+    with _lock:
+        return dict(_stats, enabled=ENABLED, version=_snapshot_version)
@@ -0,0 +1,145 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import storage
+from data_service import remote
+
+DB_FILE = "college_data.db"
+
+# Sessions stay valid for a week unless revoked (logout, user deleted).
+SESSION_TTL_SECONDS = 7 * 24 * 60 * 60
+# Max number of session -> profile entries kept in memory per process.
+CACHE_MAX_ENTRIES = 2048
+# A cached session is re-read from the DB after this many seconds, so a
+# revocation made by another process takes effect within this delay.
+REVALIDATE_SECONDS = float(os.getenv("SVU_SESSION_REVALIDATE", "30"))
+
+# token -> (expires_at, checked_at, profile dict); most recently used entries at the end.
+_cache: "OrderedDict[str, tuple[float, float, dict]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _load_profile(token):
+    """Read a live session and its user's profile from the DB (no password)."""
+    conn = sqlite3.connect(DB_FILE)
+    session = conn.execute(
+        "SELECT expires_at, user_id FROM sessions WHERE token = ? AND revoked = 0", (token,)
+    ).fetchone()
+    conn.close()
+    if session is None:
+        return None
+    # Users may live in another backend (storage.py), so no join with sessions.
+    expires_at, user_id = session
+    with storage.connect() as conn:
+        fields = conn.execute(
+            "SELECT id, name, username, mobile, role, course, year FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+    if fields is None:
+        return None
+    keys = ("id", "name", "username", "mobile", "role", "course", "year")
+    return expires_at, dict(zip(keys, fields))
+
+
+def _remember(token, expires_at, profile):
+    with _lock:
+        _cache[token] = (expires_at, time.monotonic(), profile)
+        _cache.move_to_end(token)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+@remote(write=True)
+def create_session(user_id):
+    """Create a new opaque session token for user_id and return it."""
+    token = secrets.token_urlsafe(32)
+    now = time.time()
+    conn = sqlite3.connect(DB_FILE)
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO sessions (token, user_id, created_at, expires_at) VALUES (?,?,?,?)",
+        (token, user_id, now, now + SESSION_TTL_SECONDS),
+    )
+    conn.commit()
+    conn.close()
+    return token
+
+
+@remote
+def resolve_session(token):
+    """
+    Return the profile dict for a session token, or None if the token is
+    unknown, expired or revoked. Served from memory after the first lookup,
+    and re-read from the DB every REVALIDATE_SECONDS.
+    """
+    if not token:
+        return None
+    now = time.time()
+    with _lock:
+        entry = _cache.get(token)
+        if entry is not None:
+            if entry[0] > now and time.monotonic() - entry[1] < REVALIDATE_SECONDS:
+                _cache.move_to_end(token)
+                return entry[2]
+            del _cache[token]
+
+    loaded = _load_profile(token)
+    if loaded is None:
+        return None
+    expires_at, profile = loaded
+    if expires_at <= now:
+        return None
+    _remember(token, expires_at, profile)
+    return profile
+
+
+@remote(write=True)
+def revoke_session(token):
+    """Revoke a single session (logout)."""
+    with _lock:
+        _cache.pop(token, None)
+    conn = sqlite3.connect(DB_FILE)
+    cur = conn.cursor()
+    cur.execute("UPDATE sessions SET revoked = 1 WHERE token = ?", (token,))
+    conn.commit()
+    conn.close()
+
+
+@remote(write=True)
+def revoke_user_sessions(user_id, keep=None):
+    """
+    Revoke every session of a user (e.g. when the user is deleted), except the
+    session token `keep` (the one changing the password stays signed in).
+    """
+    forget_user(user_id)
+    conn = sqlite3.connect(DB_FILE)
+    cur = conn.cursor()
+    cur.execute("UPDATE sessions SET revoked = 1 WHERE user_id = ? AND token IS NOT ?", (user_id, keep))
+    conn.commit()
+    conn.close()
+
+
+def forget_user(user_id):
+    """Drop cached profiles of a user so the next lookup re-reads the DB."""
+    with _lock:
+        stale = [t for t, (_, _, p) in _cache.items() if p["id"] == user_id]
+        for token in stale:
+            del _cache[token]
+
+
+@remote(write=True)
+def purge_expired_sessions():
+    """Delete expired and revoked sessions from the DB. Returns rows removed."""
+    conn = sqlite3.connect(DB_FILE)
+    cur = conn.cursor()
+    cur.execute(
+        "DELETE FROM sessions WHERE revoked = 1 OR expires_at <= ?",
+        (time.time(),),
+    )
+    removed = cur.rowcount
+    conn.commit()
+    conn.close()
+    return removed
@@ -0,0 +1,267 @@
+"""
+Storage backend for users, documents, notifications (+ archive), synonyms,
+chat_history and message_blobs: the tables db_utils, auth, exports and the
+seeding code read and write. Everything else (sessions, web cache, route log,
+maintenance runs) always stays in the local college_data.db.
+
+    SVU_DATABASE_URL unset                          SQLite, college_data.db (default)
+    SVU_DATABASE_URL=postgresql://user:pw@host/db   PostgreSQL, needs psycopg + psycopg-pool
+
+Queries are written once, in SQLite syntax with ? placeholders. On PostgreSQL
+connections and cursors translate ? to %s and CURRENT_TIMESTAMP to the same
+'YYYY-MM-DD HH:MM:SS' UTC text SQLite stores, and executemany() is sent as
+one pipelined batch. Each server process (the Streamlit app, or the data
+service when SVU_DATA_SERVICE is set) keeps one pool of SVU_DB_POOL_MIN to
+SVU_DB_POOL_MAX connections shared by all sessions; server-side prepared
+statements are off, so a PgBouncer in transaction mode may sit in front.
+
+Create the PostgreSQL schema and copy an existing SQLite DB into it:
+
+    python storage.py init [--to URL]
+    python storage.py copy [--from college_data.db] [--to URL] [--replace]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import read_replica
+
+DB_FILE = "college_data.db"
+DATABASE_URL = os.getenv("SVU_DATABASE_URL", "")
+DIALECT = "postgres" if DATABASE_URL.startswith(("postgres://", "postgresql://")) else "sqlite"
+
+POOL_MIN = int(os.getenv("SVU_DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("SVU_DB_POOL_MAX", "10"))
+# Rows per fetchmany()/executemany() round trip in the copy tool.
+BATCH_SIZE = 1000
+
+# Copied in this order (parents first); tables with an identity id get their
+# sequence moved past the copied ids.
+STORAGE_TABLES = ("users", "documents", "notifications", "notifications_archive",
+                  "synonyms", "message_blobs", "chat_history")
+_IDENTITY_TABLES = ("users", "documents", "notifications", "chat_history")
+
+_PG_NOW = "to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+
+def _psycopg():
+    try:
+        import psycopg
+        import psycopg_pool
+    except ImportError as exc:
+        raise ImportError(
+            "PostgreSQL storage needs psycopg and psycopg-pool: pip install 'psycopg[binary]' psycopg-pool"
+        ) from exc
+    return psycopg, psycopg_pool
+
+
+if DIALECT == "postgres":
+    IntegrityError = _psycopg()[0].IntegrityError
+else:
+    IntegrityError = sqlite3.IntegrityError
+
+
+# A quoted string or identifier (kept as is), or a ? placeholder.
+_PLACEHOLDER = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|\?""")
+
+
+def _postgres_sql(sql, params):
+    """
+    SQLite-style query -> psycopg query. ? placeholders outside quoted strings
+    and identifiers become %s; a literal % is doubled, as psycopg expects
+    whenever there are params. CURRENT_TIMESTAMP is replaced everywhere, so
+    keep that word out of string literals.
+    """
+    sql = sql.replace("CURRENT_TIMESTAMP", _PG_NOW)
+    if params is not None:
+        sql = _PLACEHOLDER.sub(lambda m: "%s" if m.group() == "?" else m.group(), sql.replace("%", "%%"))
+    return sql
+
+
+class _PostgresCursor:
+    """psycopg cursor that accepts the SQLite-style queries used across the app."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, sql, params=None):
+        self._cur.execute(_postgres_sql(sql, params), params)
+        return self
+
+    def executemany(self, sql, rows):
+        self._cur.executemany(_postgres_sql(sql, ()), list(rows))
+        return self
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class _PostgresConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, name=None):
+        return _PostgresCursor(self._conn.cursor(name=name) if name else self._conn.cursor())
+
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.cursor().executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _psycopg()[1].ConnectionPool(
+                DATABASE_URL, min_size=POOL_MIN, max_size=POOL_MAX,
+                kwargs={"prepare_threshold": None}, name="svu-storage", open=True,
+            )
+    return _pool
+
+
+@contextmanager
+def connect():
+    """A connection to the storage backend: commits when the block ends, rolls back on error."""
+    if DIALECT == "sqlite":
+        conn = sqlite3.connect(DB_FILE)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return
+    with _get_pool().connection() as conn:
+        yield _PostgresConnection(conn)
+
+
+@contextmanager
+def read_connection():
+    """Connection for reading users/documents/notifications (the read replica when enabled on SQLite)."""
+    if DIALECT == "sqlite":
+        with read_replica.read_connection() as conn:
+            yield conn
+        return
+    with connect() as conn:
+        yield conn
+
+
+def streaming_cursor(conn):
+    """Cursor whose fetchmany() pulls rows from the server as it goes (a named cursor on PostgreSQL)."""
+    return conn.cursor(name="svu_stream") if DIALECT == "postgres" else conn.cursor()
+
+
+# ------------------ SCHEMA / COPY TOOL ------------------
+def _connect_postgres(url):
+    psycopg = _psycopg()[0]
+    return _PostgresConnection(psycopg.connect(url, prepare_threshold=None))
+
+
+def init_postgres(url=None):
+    """Create or upgrade the PostgreSQL schema. Returns True if it was new (nothing there yet)."""
+    import database
+
+    conn = _connect_postgres(url or DATABASE_URL)
+    try:
+        created = database.init_postgres(conn)
+        conn.commit()
+        return created
+    finally:
+        conn.close()
+
+
+def copy_sqlite_to_postgres(source, url, replace=False):
+    """
+    Copy the storage tables of the SQLite DB at source (migrated to the current
+    schema first) into PostgreSQL at url, keeping ids, in one transaction.
+    The target must be empty unless replace=True. Returns {table: rows}.
+    """
+    import database
+
+    database.DB_FILE = source
+    database.init_db()
+    init_postgres(url)
+
+    src = sqlite3.connect(source)
+    dst = _connect_postgres(url)
+    copied = {}
+    try:
+        cur = dst.cursor()
+        if replace:
+            cur.execute(f"TRUNCATE {', '.join(STORAGE_TABLES)} RESTART IDENTITY CASCADE")
+        else:
+            for table in STORAGE_TABLES:
+                if cur.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                    raise SystemExit(f"{table} already has rows in the target; use --replace to overwrite")
+        for table in STORAGE_TABLES:
+            columns = ", ".join(row[1] for row in src.execute(f"PRAGMA table_info({table})"))
+            select = f"SELECT {columns} FROM {table}"
+            if table == "chat_history":
+                # PostgreSQL enforces chat_history.user_id -> users; rows of deleted users are dropped.
+                select += " WHERE user_id IN (SELECT id FROM users)"
+            insert = f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(columns.split(', ')))})"
+            rows = src.execute(select)
+            count = 0
+            while True:
+                batch = rows.fetchmany(BATCH_SIZE)
+                if not batch:
+                    break
+                cur.executemany(insert, batch)
+                count += len(batch)
+            if table in _IDENTITY_TABLES:
+                cur.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false)"
+                    f" FROM {table}"
+                )
+            copied[table] = count
+        dst.commit()
+    except BaseException:
+        dst.rollback()
+        raise
+    finally:
+        src.close()
+        dst.close()
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostgreSQL storage schema and SQLite -> PostgreSQL copy.")
+    parser.add_argument("command", choices=("init", "copy"))
+    parser.add_argument("--from", dest="source", default=DB_FILE, help="SQLite DB to copy (default: %(default)s)")
+    parser.add_argument("--to", dest="url", default=DATABASE_URL if DIALECT == "postgres" else None,
+                        help="postgresql:// URL (default: SVU_DATABASE_URL)")
+    parser.add_argument("--replace", action="store_true", help="empty the target tables first")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("no PostgreSQL URL: pass --to or set SVU_DATABASE_URL")
+
+    if args.command == "init":
+        print("created" if init_postgres(args.url) else "schema is up to date")
+        return
+    start = time.perf_counter()
+    copied = copy_sqlite_to_postgres(args.source, args.url, replace=args.replace)
+    for table, count in copied.items():
+        print(f"{table:24} {count:>10,} rows")
+    print(f"copied in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Shared setup for the SQLite-backed tests: every test gets a fresh
+college_data.db (and chat archive directory) in a temp directory, and the
+per-process caches are emptied so nothing leaks between tests.
+"""
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st  # noqa: E402
+
+# Modules with their own DB_FILE setting.
+DB_MODULES = ("database", "storage", "read_replica", "session_store", "message_store",
+              "web_cache", "chat_archive", "maintenance", "model_router")
+
+
+class SqliteTestCase(unittest.TestCase):
+    def setUp(self):
+        import answer_cache
+        import chat_archive
+        import database
+        import db_utils
+        import session_store
+
+        tmp = tempfile.mkdtemp(prefix="svu_test_")
+        self.addCleanup(shutil.rmtree, tmp, True)
+        self.db_file = os.path.join(tmp, "college_data.db")
+        for name in DB_MODULES:
+            module = importlib.import_module(name)
+            self.addCleanup(setattr, module, "DB_FILE", module.DB_FILE)
+            module.DB_FILE = self.db_file
+        self.addCleanup(setattr, chat_archive, "ARCHIVE_DIR", chat_archive.ARCHIVE_DIR)
+        chat_archive.ARCHIVE_DIR = os.path.join(tmp, "chat_archive")
+
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        db_utils._cached_partitions.clear()
+        db_utils._changes_seen["seq"] = None
+        answer_cache.clear()
+        session_store._cache.clear()
+        database.init_db()
@@ -0,0 +1,57 @@
+"""Cached answers dropped through the knowledge_changes log (db_utils.sync_knowledge_changes)."""
+from support import SqliteTestCase
+
+
+class AnswerInvalidationTest(SqliteTestCase):
+    def _cache(self, question, partition, sources=(), words=(), whole_partition=False):
+        import answer_cache
+
+        key = (question, "", partition)
+        answer_cache.put(key, f"answer to {question}",
+                         answer_cache.Dependencies(frozenset(sources), tuple(words), whole_partition))
+        return key
+
+    def _cached(self, *keys):
+        import answer_cache
+
+        return {key[0] for key in keys if answer_cache.get(key) is not None}
+
+    def test_changes_drop_only_the_answers_they_affect(self):
+        import db_utils
+        import storage
+
+        db_utils.add_document("Library", "Open 9 to 5.")
+        db_utils.add_document("Hostel", "Rooms for first years.", "MCA", "1st")
+        ids = {d.title: d.id for d in db_utils.get_all_documents()}
+        db_utils.sync_knowledge_changes()
+
+        library = self._cache("library hours", ("MCA", "1st"), [("documents", ids["Library"])], ["library"])
+        whole = self._cache("anything new", ("MCA", "1st"), whole_partition=True)
+        fees = self._cache("fee dates", ("MBA", "2nd"), words=["fees"])
+        hostel = self._cache("hostel rooms", ("MCA", "1st"), [("documents", ids["Hostel"])], ["hostel"])
+
+        # An entry in the prompt changed: its answers and whole-partition answers go.
+        db_utils.update_document(ids["Library"], "Library", "Open 9 to 8.")
+        self.assertEqual(self._cached(library, whole, fees, hostel), {"fee dates", "hostel rooms"})
+
+        # A write by another process is picked up from the log on the next sync; a new
+        # MBA entry whose keywords match drops that answer but not MCA's.
+        with storage.connect() as conn:
+            conn.execute(
+                "INSERT INTO documents (title, description, keywords, audience_course, audience_year)"
+                " VALUES ('Fees', 'Semester fees due in June.', 'semester fees due june', 'MBA', 'ALL')"
+            )
+        self.assertEqual(db_utils.sync_knowledge_changes(), 1)
+        self.assertEqual(self._cached(fees, hostel), {"hostel rooms"})
+
+        db_utils.delete_document(ids["Hostel"])
+        self.assertEqual(self._cached(hostel), set())
+
+    def test_synonym_change_clears_everything(self):
+        import answer_cache
+        import db_utils
+
+        db_utils.sync_knowledge_changes()
+        key = self._cache("library hours", ("ALL", "ALL"), words=["library"])
+        db_utils.replace_synonyms([("lib", "library")])
+        self.assertIsNone(answer_cache.get(key))
@@ -0,0 +1,37 @@
+"""Course / year scoping of documents and notices (db_utils)."""
+from support import SqliteTestCase
+
+
+class AudienceTest(SqliteTestCase):
+    def _titles(self, course, year):
+        import db_utils
+
+        return {k.title for k in db_utils.load_knowledge(course, year)}
+
+    def test_year_only_entry_keeps_its_year(self):
+        import db_utils
+
+        db_utils.add_document("First-year orientation", "Orientation week.", "all", " 1st ")
+        db_utils.add_notification("Second-year notice", "Lab schedule.", "ALL", "2nd")
+        self.assertEqual(
+            {(d.title, d.course, d.year) for d in db_utils.get_all_documents()},
+            {("First-year orientation", "ALL", "1st")},
+        )
+        self.assertIn("First-year orientation", self._titles("MCA", "1st"))
+        self.assertNotIn("First-year orientation", self._titles("MCA", "2nd"))
+        self.assertEqual(self._titles("MBA", "2nd"), {"Second-year notice"})
+        # Staff see every entry.
+        self.assertEqual(self._titles("ALL", "ALL"), {"First-year orientation", "Second-year notice"})
+
+    def test_course_entries_and_updates(self):
+        import db_utils
+
+        db_utils.add_document("MCA syllabus", "Data structures.", "mca", "")
+        db_utils.add_document("For everyone", "Library hours.")
+        self.assertEqual(self._titles("MCA", "2nd"), {"MCA syllabus", "For everyone"})
+        self.assertEqual(self._titles("MBA", "1st"), {"For everyone"})
+
+        doc_id = next(d.id for d in db_utils.get_all_documents() if d.title == "MCA syllabus")
+        db_utils.update_document(doc_id, "MCA syllabus", "Data structures.", "ALL", "2nd")
+        self.assertEqual(self._titles("MBA", "2nd"), {"MCA syllabus", "For everyone"})
+        self.assertEqual(self._titles("MCA", "1st"), {"For everyone"})
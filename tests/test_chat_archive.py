@@ -0,0 +1,68 @@
+"""Chat retention (chat_archive.py): messages moved to segments read back unchanged."""
+import sqlite3
+import time
+
+from support import SqliteTestCase
+
+
+class ArchiveRoundTripTest(SqliteTestCase):
+    def setUp(self):
+        super().setUp()
+        import chat_archive
+
+        self.addCleanup(setattr, chat_archive, "HOT_MESSAGES", chat_archive.HOT_MESSAGES)
+        chat_archive.HOT_MESSAGES = 2
+
+    def _archive(self):
+        import chat_archive
+
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        detail = chat_archive.archive_old_messages(conn, time.monotonic() + 30)
+        conn.close()
+        return detail
+
+    def test_archived_messages_read_back(self):
+        import chat_archive
+        import db_utils
+
+        long_answer = "A long answer kept in message_blobs. " * 20
+        db_utils.save_chats([(1, "user", "hello"), (1, "assistant", long_answer), (1, "user", "fees?"),
+                             (1, "assistant", "June."), (2, "user", "other user")])
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("UPDATE chat_history SET timestamp = '2024-0' || (3 + id % 2) || '-10 10:00:00'")
+        conn.commit()
+        conn.close()
+        before = db_utils.load_chat_log(1)
+
+        self.assertEqual(self._archive(), "2 messages archived into 2 segments")
+        self.assertEqual(db_utils.load_chat_log(1), before[2:])
+        self.assertEqual(chat_archive.archived_chat_log(1), before[:2])
+        self.assertEqual(chat_archive.archived_count(1), 2)
+        self.assertEqual(chat_archive.archived_chat_log(2), [])
+        self.assertEqual(chat_archive.archived_count(2), 0)
+
+    def test_rearchived_rows_are_counted_once(self):
+        # A crash between indexing a batch and deleting it leaves the rows hot;
+        # the next run archives them again and replaces that index row.
+        import chat_archive
+        import db_utils
+
+        db_utils.save_chats([(1, "user", f"message {i}") for i in range(5)])
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("UPDATE chat_history SET timestamp = '2024-03-10 10:00:00'")
+        rows = conn.execute("SELECT id, user_id, role, message, timestamp FROM chat_history"
+                            " ORDER BY id LIMIT 3").fetchall()
+        conn.executemany(
+            "INSERT INTO chat_archive_index (user_id, segment, byte_offset, byte_length, first_id, last_id,"
+            " first_at, last_at, row_count) VALUES (?,?,?,?,?,?,?,?,?)",
+            chat_archive._append_members(rows),
+        )
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self._archive(), "3 messages archived into 1 segments")
+        self.assertEqual(chat_archive.archived_count(1), 3)
+        self.assertEqual([m for _, m, _ in chat_archive.archived_chat_log(1)],
+                         ["message 0", "message 1", "message 2"])
+        index_rows = sqlite3.connect(self.db_file).execute("SELECT COUNT(*) FROM chat_archive_index").fetchone()[0]
+        self.assertEqual(index_rows, 1)
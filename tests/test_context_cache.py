@@ -0,0 +1,68 @@
+"""Provider cache creation in context_cache.get_handle runs outside the module lock."""
+import threading
+import unittest
+from types import SimpleNamespace
+
+import support  # noqa: F401  (puts the project root on sys.path)
+
+
+class _SlowCaches:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.created = 0
+
+    def create(self, model, config):
+        self.created += 1
+        self.started.set()
+        self.release.wait(5)
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+    def delete(self, name):
+        pass
+
+
+class GetHandleTest(unittest.TestCase):
+    def setUp(self):
+        import context_cache
+
+        self.cc = context_cache
+        saved = (context_cache.ENABLED, dict(context_cache._handles), dict(context_cache._stats))
+        context_cache.ENABLED = True
+        context_cache._handles.clear()
+
+        def restore():
+            context_cache.ENABLED = saved[0]
+            context_cache._handles.clear()
+            context_cache._handles.update(saved[1])
+            context_cache._stats.update(saved[2])
+
+        self.addCleanup(restore)
+
+    def test_one_creation_per_key_and_stats_stay_available(self):
+        caches = _SlowCaches()
+        client = SimpleNamespace(caches=caches)
+        names = []
+
+        def ask():
+            names.append(self.cc.get_handle(client, "m", "BCA|1", 3, lambda: "prefix"))
+
+        threads = [threading.Thread(target=ask) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(caches.started.wait(5))
+
+        # The create call is in flight: the lock is free for stats and usage.
+        self.cc.record_usage(SimpleNamespace(usage_metadata=None))
+        self.assertEqual(self.cc.cache_stats()["handles"], 0)
+
+        caches.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(caches.created, 1)
+        self.assertEqual(names, ["cachedContents/1"] * 4)
+        self.assertEqual(self.cc._creating, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Streamed exports (exports.py), including chat messages moved to the archive."""
+import io
+import json
+import sqlite3
+import time
+
+from support import SqliteTestCase
+
+
+class ExportTest(SqliteTestCase):
+    def setUp(self):
+        super().setUp()
+        import chat_archive
+
+        conn = sqlite3.connect(self.db_file)
+        conn.executemany(
+            "INSERT INTO chat_history (user_id, role, message, timestamp) VALUES (?, ?, ?, ?)",
+            [(1, "user", f"old {i}", f"2024-01-{i + 1:02d} 10:00:00") for i in range(5)]
+            + [(2, "user", "other user", "2024-01-03 10:00:00"), (1, "user", "recent", "2099-01-01 10:00:00")],
+        )
+        conn.commit()
+        conn.close()
+        self.addCleanup(setattr, chat_archive, "HOT_MESSAGES", chat_archive.HOT_MESSAGES)
+        chat_archive.HOT_MESSAGES = 1
+
+    def _archive(self):
+        import chat_archive
+
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        detail = chat_archive.archive_old_messages(conn, time.monotonic() + 30)
+        conn.close()
+        return detail
+
+    def _export(self, **filters):
+        import exports
+
+        out = io.BytesIO()
+        exports.write_export(out, "chat_history", "jsonl", **filters)
+        return [json.loads(line)["message"] for line in out.getvalue().decode("utf-8").splitlines()]
+
+    def test_archived_rows_are_exported_once(self):
+        import exports
+
+        self.assertEqual(self._archive(), "5 messages archived into 1 segments")
+        self.assertEqual(self._export(user_id=1), ["old 0", "old 1", "old 2", "old 3", "old 4", "recent"])
+        self.assertEqual(self._export(user_id=1, start_date="2024-01-02", end_date="2024-01-03"), ["old 1", "old 2"])
+        self.assertEqual(len(self._export()), 7)
+        self.assertEqual(exports.count_rows("chat_history"), 7)
+
+    def test_row_archived_but_not_deleted_is_exported_once(self):
+        # A crash between indexing and deleting leaves the rows in chat_history too.
+        import chat_archive
+
+        rows = sqlite3.connect(self.db_file).execute(
+            "SELECT id, user_id, role, message, timestamp FROM chat_history WHERE message LIKE 'old%'"
+        ).fetchall()
+        conn = sqlite3.connect(self.db_file)
+        conn.executemany(
+            "INSERT INTO chat_archive_index (user_id, segment, byte_offset, byte_length, first_id, last_id,"
+            " first_at, last_at, row_count) VALUES (?,?,?,?,?,?,?,?,?)",
+            chat_archive._append_members(rows),
+        )
+        conn.commit()
+        conn.close()
+        self.assertEqual(self._export(user_id=1), ["old 0", "old 1", "old 2", "old 3", "old 4", "recent"])
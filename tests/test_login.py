@@ -0,0 +1,52 @@
+"""Sign-in against hashed and legacy plain-text passwords (auth.login, passwords.py)."""
+import threading
+from unittest import mock
+
+from support import SqliteTestCase
+
+
+class LoginTest(SqliteTestCase):
+    def _stored(self, username):
+        import storage
+
+        with storage.connect() as conn:
+            return conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()[0]
+
+    def test_register_and_login(self):
+        import auth
+
+        self.assertTrue(auth.register_user("Asha", "asha", "9000000001", "s3cret", "MCA", "1st"))
+        self.assertFalse(auth.register_user("Other", "ASHA", "9000000002", "x", "MCA", "1st"))
+        self.assertTrue(self._stored("asha").startswith(("scrypt$", "pbkdf2_sha256$")))
+        self.assertEqual(auth.login(" Asha ", "s3cret")[1:], ("Asha", "student", "MCA", "1st"))
+        self.assertEqual(auth.login("9000000001", "s3cret")[1], "Asha")
+        self.assertIsNone(auth.login("asha", "wrong"))
+        self.assertIsNone(auth.login("nobody", "s3cret"))
+
+    def test_plain_text_password_is_rehashed_on_login(self):
+        import auth
+        import storage
+
+        with storage.connect() as conn:
+            conn.execute("INSERT INTO users (name, username, mobile, password, role, course, year)"
+                         " VALUES ('Ravi', 'ravi', '9000000003', 'legacy', 'student', 'MBA', '2nd')")
+        self.assertIsNone(auth.login("ravi", "wrong"))
+        self.assertEqual(self._stored("ravi"), "legacy")
+        self.assertEqual(auth.login("ravi", "legacy")[1], "Ravi")
+        stored = self._stored("ravi")
+        self.assertNotEqual(stored, "legacy")
+        self.assertEqual(auth.login("ravi", "legacy")[1], "Ravi")
+        self.assertEqual(self._stored("ravi"), stored)
+
+    def test_login_busy_when_hashing_pool_is_full(self):
+        import auth
+        import passwords
+
+        auth.register_user("Asha", "asha", "9000000001", "s3cret", "MCA", "1st")
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()  # every slot taken by other sign-ins
+        with mock.patch.object(passwords, "_slots", slots), mock.patch.object(passwords, "WAIT_SECONDS", 0.05):
+            with self.assertRaises(passwords.LoginBusy):
+                auth.login("asha", "s3cret")
+            with self.assertRaises(passwords.LoginBusy):
+                auth.register_user("Ravi", "ravi", "9000000003", "pw", "MBA", "2nd")
@@ -0,0 +1,22 @@
+"""Maintenance runs requested from the admin page (maintenance.run_now)."""
+from support import SqliteTestCase
+
+
+class RunNowTest(SqliteTestCase):
+    def _status(self, name):
+        import maintenance
+
+        return next(row for row in maintenance.maintenance_status()["tasks"] if row[0] == name)
+
+    def test_request_is_left_to_the_scheduler(self):
+        import maintenance
+
+        maintenance.run_now("analyze")
+        self.assertEqual(self._status("analyze")[1], "requested")
+        self.assertEqual([task.name for task in maintenance._requested_tasks()], ["analyze"])
+
+        # What the scheduler loop does with a request.
+        for task in maintenance._requested_tasks():
+            maintenance.run_task(task, force=True)
+        self.assertEqual(self._status("analyze")[1], "ok")
+        self.assertEqual(maintenance._requested_tasks(), [])
@@ -0,0 +1,183 @@
+"""
+PostgreSQL storage backend (storage.py) against a real server.
+
+Needs a throw-away database; its tables are dropped first:
+
+    SVU_TEST_DATABASE_URL=postgresql://user:pw@localhost/svu_test python -m pytest tests
+
+Skipped when SVU_TEST_DATABASE_URL is unset. The query translation test
+needs no server and always runs.
+"""
+import gzip
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+TEST_URL = os.getenv("SVU_TEST_DATABASE_URL", "")
+
+_PG_TABLES = storage.STORAGE_TABLES + ("login_names", "knowledge_changes", "data_versions")
+LONG_ANSWER = "The exam timetable for all MCA semesters is published on the notice board. " * 20
+
+
+class PostgresSqlTranslationTest(unittest.TestCase):
+    def test_placeholders_outside_quotes_only(self):
+        sql = storage._postgres_sql(
+            "SELECT a FROM t WHERE b = ? AND c = 'why?' AND d LIKE '%x' AND \"odd?\" = ? AND e = 'it''s?'", ()
+        )
+        self.assertEqual(
+            sql, "SELECT a FROM t WHERE b = %s AND c = 'why?' AND d LIKE '%%x' AND \"odd?\" = %s AND e = 'it''s?'"
+        )
+
+    def test_no_params_is_left_alone(self):
+        self.assertEqual(storage._postgres_sql("SELECT '?', 1 % 2", None), "SELECT '?', 1 % 2")
+
+
+@unittest.skipUnless(TEST_URL, "set SVU_TEST_DATABASE_URL to run the PostgreSQL tests")
+class PostgresStorageTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import psycopg
+
+        import auth
+        import chat_archive
+        import database
+        import db_utils
+        import read_replica
+
+        cls.saved = (storage.DATABASE_URL, storage.DIALECT, storage.IntegrityError, storage._pool,
+                     storage.DB_FILE, database.DB_FILE, read_replica.DB_FILE, chat_archive.DB_FILE)
+        tmp = tempfile.mkdtemp(prefix="svu_pg_test_")
+        cls.source = os.path.join(tmp, "source.db")
+        storage.DB_FILE = database.DB_FILE = read_replica.DB_FILE = chat_archive.DB_FILE = cls.source
+
+        # A SQLite DB like a production one: seed data, a registered user, an id
+        # gap, chat rows (one stored as a blob) and a row of a deleted user.
+        database.init_db()
+        database.seed_from_json()
+        assert auth.register_user("Pat Kumar", "PatK", "9123456780", "secret-pass", "MCA", "2nd")
+        doc_ids = [row[0] for row in sqlite3.connect(cls.source).execute("SELECT id FROM documents ORDER BY id")]
+        db_utils.delete_document(doc_ids[1])
+        pat = sqlite3.connect(cls.source).execute("SELECT id FROM users WHERE username = 'PatK'").fetchone()[0]
+        db_utils.save_chats([(pat, "user", "when are exams?"), (pat, "assistant", LONG_ANSWER)])
+        conn = sqlite3.connect(cls.source)
+        conn.execute("INSERT INTO chat_history (user_id, role, message) VALUES (999999, 'user', 'orphan')")
+        conn.commit()
+        conn.close()
+        cls.pat = pat
+
+        with psycopg.connect(TEST_URL, autocommit=True) as pg:
+            pg.execute(f"DROP TABLE IF EXISTS {', '.join(_PG_TABLES)} CASCADE")
+
+        storage.DATABASE_URL, storage.DIALECT = TEST_URL, "postgres"
+        storage.IntegrityError, storage._pool = psycopg.IntegrityError, None
+        cls.copied = storage.copy_sqlite_to_postgres(cls.source, TEST_URL)
+
+    @classmethod
+    def tearDownClass(cls):
+        import chat_archive
+        import database
+        import read_replica
+
+        if storage._pool is not None:
+            storage._pool.close()
+        (storage.DATABASE_URL, storage.DIALECT, storage.IntegrityError, storage._pool,
+         storage.DB_FILE, database.DB_FILE, read_replica.DB_FILE, chat_archive.DB_FILE) = cls.saved
+
+    def _sqlite(self, sql):
+        conn = sqlite3.connect(self.source)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def _pg(self, sql, params=()):
+        with storage.connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def test_init_is_idempotent(self):
+        self.assertFalse(storage.init_postgres(TEST_URL))
+
+    def test_copy_keeps_ids_and_drops_orphans(self):
+        for table in ("users", "documents", "notifications", "synonyms", "message_blobs"):
+            self.assertEqual(self.copied[table], self._sqlite(f"SELECT COUNT(*) FROM {table}")[0][0], table)
+        for table, column in (("documents", "title"), ("users", "username")):
+            source = self._sqlite(f"SELECT id, {column} FROM {table} ORDER BY id")
+            copied = self._pg(f"SELECT id, {column} FROM {table} WHERE id <= ? ORDER BY id", (source[-1][0],))
+            self.assertEqual(copied, [tuple(r) for r in source], table)
+        self.assertEqual(self.copied["chat_history"], self._sqlite("SELECT COUNT(*) FROM chat_history")[0][0] - 1)
+        self.assertEqual(self._pg("SELECT COUNT(*) FROM chat_history WHERE user_id = 999999")[0][0], 0)
+
+    def test_sequences_continue_after_copied_ids(self):
+        import auth
+        import db_utils
+
+        db_utils.add_document("Sequence check", "Inserted after the copy.")
+        self.assertTrue(auth.register_user("Seq User", "sequser", "9000011111", "pw-123456", "MCA", "1st"))
+        for table, where in (("documents", "title = 'Sequence check'"), ("users", "username = 'sequser'")):
+            new_id = self._pg(f"SELECT id FROM {table} WHERE {where}")[0][0]
+            self.assertGreater(new_id, self._sqlite(f"SELECT MAX(id) FROM {table}")[0][0], table)
+
+    def test_register_and_login_through_login_names(self):
+        import auth
+
+        self.assertEqual(auth.login("  patk ", "secret-pass")[0], self.pat)
+        self.assertEqual(auth.login("9123456780", "secret-pass")[0], self.pat)
+        self.assertIsNone(auth.login("patk", "wrong"))
+        self.assertFalse(auth.register_user("Other Pat", "PATK", "9000000077", "secret-pass", "MCA", "1st"))
+        self.assertTrue(auth.register_user("New User", "newuser", "9000000088", "pw-123456", "MCA", "1st"))
+        self.assertIsNotNone(auth.login("NEWUSER", "pw-123456"))
+        self.assertEqual(self._pg("SELECT COUNT(*) FROM login_names WHERE login = 'newuser'")[0][0], 1)
+
+    def test_preview_version_and_change_triggers(self):
+        import database
+        import db_utils
+
+        knowledge = "SELECT version FROM data_versions WHERE name = 'knowledge'"
+        version = self._pg(knowledge)[0][0]
+        seq = self._pg("SELECT COALESCE(MAX(seq), 0) FROM knowledge_changes")[0][0]
+        body = "Hostel fees are due by the 10th. " * 40
+        db_utils.add_document("Hostel fees", body, "MCA", "1st")
+        doc_id, preview, length = self._pg(
+            "SELECT id, preview, body_length FROM documents WHERE title = 'Hostel fees'"
+        )[0]
+        self.assertEqual(length, len(body))
+        self.assertEqual(preview, body[:database.PREVIEW_CHARS].rstrip() + "…")
+        self.assertEqual(self._pg("SELECT keywords FROM documents WHERE id = ?", (doc_id,))[0][0],
+                         "hostel fees are due by the 10th")
+        self.assertGreater(self._pg(knowledge)[0][0], version)
+
+        db_utils.update_document(doc_id, "Hostel fees", body, "MCA", "2nd")
+        changes = self._pg(
+            "SELECT table_name, item_id, old_course, old_year, new_course, new_year FROM knowledge_changes"
+            " WHERE seq > ? ORDER BY seq", (seq,)
+        )
+        self.assertIn(("documents", doc_id, None, None, "MCA", "1st"), changes)
+        self.assertIn(("documents", doc_id, "MCA", "1st", "MCA", "2nd"), changes)
+        oldest, latest, rows = db_utils.knowledge_changes_since(seq)
+        self.assertEqual(latest, self._pg("SELECT MAX(seq) FROM knowledge_changes")[0][0])
+        self.assertTrue(any(r[1] == doc_id and r[6] and "hostel fees" in r[6] for r in rows))
+
+        # A description written without keywords marks them stale.
+        with storage.connect() as conn:
+            conn.execute("UPDATE documents SET description = 'Mess charges' WHERE id = ?", (doc_id,))
+        self.assertIsNone(self._pg("SELECT keywords FROM documents WHERE id = ?", (doc_id,))[0][0])
+
+    def test_streamed_export(self):
+        import exports
+
+        out = io.BytesIO()
+        exports.write_export(out, "chat_history", "jsonl", compress=True, user_id=self.pat)
+        rows = [json.loads(line) for line in gzip.decompress(out.getvalue()).decode("utf-8").splitlines()]
+        self.assertEqual([r["message"] for r in rows], ["when are exams?", LONG_ANSWER])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Server-side sessions (session_store.py): resolve, revoke and revalidation."""
+import sqlite3
+from unittest import mock
+
+from support import SqliteTestCase
+
+
+class SessionTest(SqliteTestCase):
+    def setUp(self):
+        super().setUp()
+        import auth
+
+        self.assertTrue(auth.register_user("Asha Rao", "asha", "9000000001", "secret-pass", "MCA", "1st"))
+        self.user_id = auth.login("asha", "secret-pass")[0]
+
+    def test_resolve_and_revoke(self):
+        import session_store
+
+        token = session_store.create_session(self.user_id)
+        self.assertEqual(session_store.resolve_session(token)["username"], "asha")
+        self.assertIsNone(session_store.resolve_session("no-such-token"))
+        self.assertIsNone(session_store.resolve_session(None))
+        session_store.revoke_session(token)
+        self.assertIsNone(session_store.resolve_session(token))
+
+    def test_expired_session(self):
+        import session_store
+
+        token = session_store.create_session(self.user_id)
+        with mock.patch.object(session_store.time, "time", return_value=2e10):
+            self.assertIsNone(session_store.resolve_session(token))
+
+    def test_password_change_keeps_only_the_current_session(self):
+        import db_utils
+        import session_store
+
+        current, other = session_store.create_session(self.user_id), session_store.create_session(self.user_id)
+        db_utils.update_password(self.user_id, "new-secret", keep_session=current)
+        self.assertIsNotNone(session_store.resolve_session(current))
+        self.assertIsNone(session_store.resolve_session(other))
+
+    def test_revocation_by_another_process_is_seen_after_revalidation(self):
+        import session_store
+
+        token = session_store.create_session(self.user_id)
+        self.assertIsNotNone(session_store.resolve_session(token))
+        # Another process revokes the token directly in the DB; this one still has it cached.
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("UPDATE sessions SET revoked = 1 WHERE token = ?", (token,))
+        conn.commit()
+        conn.close()
+        self.assertIsNotNone(session_store.resolve_session(token))
+        with mock.patch.object(session_store, "REVALIDATE_SECONDS", 0):
+            self.assertIsNone(session_store.resolve_session(token))
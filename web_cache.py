@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import storage
+from data_service import remote
+
+DB_FILE = "college_data.db"
+
+# Web-grounded answers are reused for this long (default 7 days).
+WEB_CACHE_TTL_SECONDS = float(os.getenv("SVU_WEB_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+_FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "do", "does", "did", "please",
+    "tell", "me", "i", "can", "could", "you", "what", "whats", "about",
+}
+
+
+def normalize_question(question):
+    """Cache key: lowercase words without punctuation or filler words, in order."""
+    words = re.findall(r"\w+", question.lower())
+    return " ".join(w for w in words if w not in _FILLER_WORDS)
+
+
+@remote
+def knowledge_version():
+    """Counter bumped by triggers whenever documents or notifications change."""
+    with storage.connect() as conn:
+        row = conn.execute("SELECT version FROM data_versions WHERE name = 'knowledge'").fetchone()
+    return row[0] if row else 0
+
+
+def _count(column):
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute(
+        f"""
+        INSERT INTO web_call_log (day, {column}) VALUES (?, 1)
+        ON CONFLICT(day) DO UPDATE SET {column} = {column} + 1
+        """,
+        (date.today().isoformat(),),
+    )
+    conn.commit()
+    conn.close()
+
+
+@remote(write=True)
+def record_web_call():
+    """Count one real (billed) web-grounded Gemini call for today."""
+    _count("calls")
+
+
+@remote
+def get_cached_answer(question, audience):
+    """
+    Return audience's fresh cached web answer as a dict (answer, sources,
+    knowledge_version, audience) or None. knowledge_version is the knowledge
+    base the DB-only path last failed on for this audience. Entries are kept
+    per audience, so partitions asking the same question don't evict each other.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    row = conn.execute(
+        """
+        SELECT answer, sources, knowledge_version, audience, created_at
+        FROM web_answers WHERE question_key = ? AND audience = ?
+        """,
+        (normalize_question(question), audience),
+    ).fetchone()
+    conn.close()
+    if row is None or time.time() - row[4] > WEB_CACHE_TTL_SECONDS:
+        return None
+    return {
+        "answer": row[0],
+        "sources": json.loads(row[1] or "[]"),
+        "knowledge_version": row[2],
+        "audience": row[3],
+    }
+
+
+@remote(write=True)
+def record_cache_hit():
+    """Count one web call avoided by the cache for today."""
+    _count("cache_hits")
+
+
+@remote(write=True)
+def store_answer(question, answer, sources, kb_version, audience):
+    """Persist a web-grounded answer and its sources ([{'title', 'uri'}, ...])."""
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO web_answers
+            (question_key, question, answer, sources, knowledge_version, audience, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (normalize_question(question), question, answer, json.dumps(sources), kb_version, audience, time.time()),
+    )
+    conn.commit()
+    conn.close()
+
+
+@remote(write=True)
+def confirm_still_needed(question, kb_version, audience):
+    """The DB path failed again for audience on this KB version; allow direct hits for it."""
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute(
+        "UPDATE web_answers SET knowledge_version = ? WHERE question_key = ? AND audience = ?",
+        (kb_version, normalize_question(question), audience),
+    )
+    conn.commit()
+    conn.close()
+
+
+@remote(write=True)
+def forget_answer(question, audience):
+    """Drop audience's cached web answer (its DB knowledge now covers the question)."""
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("DELETE FROM web_answers WHERE question_key = ? AND audience = ?",
+                 (normalize_question(question), audience))
+    conn.commit()
+    conn.close()
+
+
+def grounding_sources(response):
+    """Extract [{'title', 'uri'}, ...] from a Gemini grounded response, if present."""
+    sources = []
+    for candidate in getattr(response, "candidates", None) or []:
+        metadata = getattr(candidate, "grounding_metadata", None)
+        for chunk in getattr(metadata, "grounding_chunks", None) or []:
+            web = getattr(chunk, "web", None)
+            if web is not None and getattr(web, "uri", None):
+                sources.append({"title": getattr(web, "title", None) or web.uri, "uri": web.uri})
+    return sources
+
+
+@remote
+def web_call_report(days=14):
+    """[(day, real web calls, cache hits), ...] for the last `days` days, newest first."""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    conn = sqlite3.connect(DB_FILE)
+    rows = conn.execute(
+        "SELECT day, calls, cache_hits FROM web_call_log WHERE day >= ? ORDER BY day DESC",
+        (since,),
+    ).fetchall()
+    conn.close()
+    return rows